@@ -1,24 +1,21 @@
-import os
 import stat
 
-from exercise_utils.file import append_to_file, create_or_update_file
-from exercise_utils.git import add, commit
+from exercise_utils.file import append_to_file, materialize_tree
+from exercise_utils.git import commit
 from exercise_utils.gitmastery import create_start_tag
 
 
 def setup(verbose: bool = False):
-    for i in range(1, 101):
-        if i == 77:
-            continue
-        create_or_update_file(f"file{i}.txt")
-
-    add([f"file{i}.txt" for i in range(1, 101) if i != 77], verbose)
+    materialize_tree(
+        {f"file{i}.txt": None for i in range(1, 101) if i != 77},
+        stage=True,
+        verbose=verbose,
+    )
     commit("Change 1", verbose)
 
     append_to_file("file14.txt", "This is a change")
 
-    create_or_update_file("file77.txt")
-    for i in range(1, 101):
-        os.chmod(f"file{i}.txt", stat.S_IREAD)
+    # Creates the missing file77.txt, leaving the others as they are
+    materialize_tree({f"file{i}.txt": None for i in range(1, 101)}, mode=stat.S_IREAD)
 
     create_start_tag(verbose)
@@ -0,0 +1,164 @@
+"""Record/replay cassettes for the commands run through exercise_utils.cli.
+
+In record mode, every command is run as usual and its argv, explicitly passed
+environment variables, stdout, stderr and return code are saved to a cassette
+file. In replay mode, results are served from the cassette without spawning
+anything, so GitHub-backed flows can run offline.
+
+Replay only reproduces command results, not their side effects on disk: a
+replayed "gh repo clone" does not create the clone. Use programs to limit the
+cassette to commands without such side effects (e.g. only gh) when the rest of
+the flow needs to run for real.
+
+Cassettes can be enabled for a whole process with GITMASTERY_CASSETTE=<path>,
+GITMASTERY_CASSETTE_MODE=record|replay and optionally
+GITMASTERY_CASSETTE_PROGRAMS=gh,git, or scoped with use_cassette.
+"""
+
+import atexit
+import json
+import os
+import threading
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from subprocess import CompletedProcess
+from typing import Dict, Iterator, List, Literal, Optional, Set
+
+CASSETTE_ENV_VAR = "GITMASTERY_CASSETTE"
+CASSETTE_MODE_ENV_VAR = "GITMASTERY_CASSETTE_MODE"
+CASSETTE_PROGRAMS_ENV_VAR = "GITMASTERY_CASSETTE_PROGRAMS"
+
+CassetteMode = Literal["record", "replay"]
+
+
+class CassetteMissError(Exception):
+    """Raised when replaying a command that was not recorded in the cassette."""
+
+    def __init__(self, command: List[str], env: Dict[str, str]) -> None:
+        super().__init__(f"No recorded result for command {command} (env: {env})")
+        self.command = command
+        self.env = env
+
+
+@dataclass
+class Interaction:
+    argv: List[str]
+    env: Dict[str, str]
+    stdout: str
+    stderr: str
+    returncode: int
+
+
+class Cassette:
+    def __init__(
+        self,
+        path: str,
+        mode: CassetteMode,
+        programs: Optional[Set[str]] = None,
+    ) -> None:
+        self.path = os.path.abspath(path)
+        self.mode = mode
+        self.programs = programs
+        self.interactions: List[Interaction] = []
+        self.__replayed: Set[int] = set()
+        self.__lock = threading.Lock()
+        if mode == "replay":
+            self.load()
+
+    def handles(self, command: List[str]) -> bool:
+        """Returns if the command should go through the cassette."""
+        return self.programs is None or command[0] in self.programs
+
+    def record(
+        self, command: List[str], env: Dict[str, str], result: CompletedProcess[str]
+    ) -> None:
+        interaction = Interaction(
+            argv=list(command),
+            env=dict(env),
+            stdout=result.stdout,
+            stderr=result.stderr,
+            returncode=result.returncode,
+        )
+        with self.__lock:
+            self.interactions.append(interaction)
+
+    def replay(self, command: List[str], env: Dict[str, str]) -> CompletedProcess[str]:
+        """Returns the first unused recorded result of the same command.
+
+        Repeated commands are served in the order they were recorded, so a query
+        made before and after a mutation replays both answers.
+        """
+        with self.__lock:
+            for i, interaction in enumerate(self.interactions):
+                if (
+                    i not in self.__replayed
+                    and interaction.argv == command
+                    and interaction.env == env
+                ):
+                    self.__replayed.add(i)
+                    return CompletedProcess(
+                        command,
+                        returncode=interaction.returncode,
+                        stdout=interaction.stdout,
+                        stderr=interaction.stderr,
+                    )
+        raise CassetteMissError(command, env)
+
+    def load(self) -> None:
+        with open(self.path, "r") as cassette_file:
+            data = json.load(cassette_file)
+        self.interactions = [Interaction(**i) for i in data["interactions"]]
+        self.__replayed = set()
+
+    def save(self) -> None:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, "w") as cassette_file:
+            json.dump(
+                {"interactions": [asdict(i) for i in self.interactions]},
+                cassette_file,
+                indent=2,
+            )
+
+
+_cassette: Optional[Cassette] = None
+_cassette_checked = False
+
+
+def get_cassette() -> Optional[Cassette]:
+    """Returns the active cassette, loading one if GITMASTERY_CASSETTE is set."""
+    global _cassette, _cassette_checked
+    if not _cassette_checked:
+        _cassette_checked = True
+        path = os.environ.get(CASSETTE_ENV_VAR)
+        if path:
+            mode = os.environ.get(CASSETTE_MODE_ENV_VAR, "replay")
+            if mode not in ("record", "replay"):
+                raise ValueError(f"Invalid {CASSETTE_MODE_ENV_VAR}: {mode}")
+            programs = os.environ.get(CASSETTE_PROGRAMS_ENV_VAR)
+            _cassette = Cassette(
+                path,
+                "record" if mode == "record" else "replay",
+                set(programs.split(",")) if programs else None,
+            )
+            if _cassette.mode == "record":
+                atexit.register(_cassette.save)
+    return _cassette
+
+
+@contextmanager
+def use_cassette(
+    path: str,
+    mode: CassetteMode,
+    programs: Optional[Set[str]] = None,
+) -> Iterator[Cassette]:
+    """Records or replays the commands run within the context."""
+    global _cassette
+    previous = get_cassette()
+    cassette = Cassette(path, mode, programs)
+    _cassette = cassette
+    try:
+        yield cassette
+    finally:
+        _cassette = previous
+        if mode == "record":
+            cassette.save()
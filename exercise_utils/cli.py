@@ -1,11 +1,27 @@
 """General utility functions for running CLI commands."""
 
+import asyncio
 import os
+import shutil
+import signal
 import subprocess
+import tempfile
+import threading
+import time
+from contextvars import ContextVar, Token
 from dataclasses import dataclass
+from pathlib import Path
 from subprocess import CompletedProcess
 from sys import exit
-from typing import Dict, List, Optional
+from typing import Dict, Generator, Iterator, List, Mapping, Optional, Sequence
+
+from exercise_utils.cassette import get_cassette
+from exercise_utils.command_cache import get_command_cache
+from exercise_utils.deadline import CommandTimeoutError, command_timeout, timeout_error
+from exercise_utils.log import flush, log_command_output
+from exercise_utils.trace import get_tracer
+
+DEFAULT_MAX_CONCURRENCY = 8
 
 
 @dataclass
@@ -24,65 +40,507 @@ class CommandResult:
         return self.result.returncode
 
 
+class CommandSession:
+    """Shared execution context for a sequence of commands.
+
+    The environment is merged once when the session is created and executables are
+    resolved against its PATH only once, so every command issued while the session
+    is active (including those issued by the wrappers in exercise_utils.git and
+    exercise_utils.github_cli) skips that per-call work.
+
+    If cwd is not given, commands follow the current working directory of the
+    process, so setup scripts can still os.chdir between commands.
+    """
+
+    def __init__(
+        self,
+        cwd: Optional[str | Path] = None,
+        env: Dict[str, str] = {},
+    ) -> None:
+        self.cwd = os.path.abspath(cwd) if cwd is not None else None
+        self.env = dict(os.environ, **env)
+        self.__executables: Dict[str, str] = {}
+        self.__token: Optional[Token[Optional["CommandSession"]]] = None
+
+    def resolve(self, program: str) -> str:
+        """Returns the absolute path of the program, caching the PATH lookup."""
+        if program not in self.__executables:
+            path = shutil.which(program, path=self.env.get("PATH"))
+            if path is None:
+                # Leave the lookup to subprocess so it raises FileNotFoundError
+                return program
+            self.__executables[program] = path
+        return self.__executables[program]
+
+    def argv(self, command: List[str]) -> List[str]:
+        """Returns the command with its program resolved against the session's PATH."""
+        return [self.resolve(command[0]), *command[1:]]
+
+    def merged_env(self, env: Dict[str, str] = {}) -> Dict[str, str]:
+        """Returns the session's environment with env applied on top."""
+        return dict(self.env, **env) if env else self.env
+
+    def spawn(
+        self,
+        command: List[str],
+        env: Dict[str, str] = {},
+        input: Optional[str] = None,
+    ) -> CompletedProcess[str]:
+        """Runs the command within the session, capturing its output."""
+        result = _run_process(
+            command, self.argv(command), self.cwd, self.merged_env(env), input
+        )
+        # Report the command as it was given rather than the resolved executable
+        result.args = command
+        return result
+
+    def __enter__(self) -> "CommandSession":
+        self.__token = _active_session.set(self)
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type | None,
+        exc_val: BaseException | None,
+        exc_tb: object | None,
+    ) -> None:
+        if self.__token is not None:
+            _active_session.reset(self.__token)
+            self.__token = None
+
+
+_active_session: ContextVar[Optional[CommandSession]] = ContextVar(
+    "active_session", default=None
+)
+
+
+def current_session() -> Optional[CommandSession]:
+    """Returns the active CommandSession, if any."""
+    return _active_session.get()
+
+
+def _spawn(
+    command: List[str],
+    env: Dict[str, str] = {},
+    input: Optional[str] = None,
+) -> CompletedProcess[str]:
+    """Runs the command in the active session, or as a standalone process."""
+    session = _active_session.get()
+    cwd = session.cwd if session is not None else None
+    started = time.time()
+    cached = _cached(command, cwd, env)
+    if cached is not None:
+        _trace(command, cwd, started, cached)
+        return cached
+    try:
+        result = _replay(command, env)
+        if result is None:
+            if session is not None:
+                result = session.spawn(command, env, input)
+            else:
+                result = _run_process(
+                    command,
+                    command,
+                    None,
+                    dict(os.environ, **env) if env else None,
+                    input,
+                )
+            _record(command, env, result)
+    except OSError as e:
+        _trace(command, cwd, started, _error_result(command, e))
+        raise
+    except CommandTimeoutError:
+        _trace(command, cwd, started, _killed_result(command))
+        raise
+    _update_cache(command, cwd, env, result)
+    _trace(command, cwd, started, result)
+    return result
+
+
+def _cached(
+    command: List[str], cwd: Optional[str], env: Dict[str, str]
+) -> Optional[CompletedProcess[str]]:
+    cache = get_command_cache()
+    if cache is None:
+        return None
+    return cache.lookup(command, cwd or os.getcwd(), _effective_env(env))
+
+
+def _update_cache(
+    command: List[str],
+    cwd: Optional[str],
+    env: Dict[str, str],
+    result: CompletedProcess[str],
+) -> None:
+    cache = get_command_cache()
+    if cache is not None:
+        cache.update(command, cwd or os.getcwd(), _effective_env(env), result)
+
+
+def _effective_env(env: Dict[str, str]) -> Dict[str, str]:
+    session = _active_session.get()
+    return dict(session.env if session is not None else os.environ, **env)
+
+
+def _run_process(
+    command: List[str],
+    argv: List[str],
+    cwd: Optional[str],
+    env: Optional[Mapping[str, str]],
+    input: Optional[str] = None,
+) -> CompletedProcess[str]:
+    """Runs argv to completion, killing it if the active deadline passes.
+
+    Input is written as UTF-8 bytes so that it reaches the process unchanged,
+    without newline translation.
+    """
+    timeout = command_timeout(command)
+    # A separate session lets the whole process tree be killed on expiry
+    process = subprocess.Popen(
+        argv,
+        stdin=subprocess.PIPE if input is not None else None,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        cwd=cwd,
+        env=env,
+        start_new_session=timeout is not None,
+    )
+    try:
+        stdout, stderr = process.communicate(
+            input.encode("utf-8") if input is not None else None, timeout=timeout
+        )
+    except subprocess.TimeoutExpired:
+        _kill_process_tree(process.pid)
+        process.communicate()
+        raise timeout_error(command)
+    return CompletedProcess(argv, process.returncode, _decode(stdout), _decode(stderr))
+
+
+def _decode(output: bytes) -> str:
+    # Matches the universal newlines handling of text mode subprocesses
+    return output.decode("utf-8").replace("\r\n", "\n").replace("\r", "\n")
+
+
+def _kill_process_tree(pid: int) -> None:
+    if os.name == "nt":
+        subprocess.run(["taskkill", "/F", "/T", "/PID", str(pid)], capture_output=True)
+        return
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+def _killed_result(command: List[str]) -> CompletedProcess[str]:
+    return CompletedProcess(command, returncode=-signal.SIGKILL, stdout="", stderr="")
+
+
+def _replay(command: List[str], env: Dict[str, str]) -> Optional[CompletedProcess[str]]:
+    cassette = get_cassette()
+    if cassette is None or cassette.mode != "replay" or not cassette.handles(command):
+        return None
+    return cassette.replay(command, env)
+
+
+def _record(
+    command: List[str], env: Dict[str, str], result: CompletedProcess[str]
+) -> None:
+    if _is_recording(command):
+        cassette = get_cassette()
+        assert cassette is not None
+        cassette.record(command, env, result)
+
+
+def _is_recording(command: List[str]) -> bool:
+    cassette = get_cassette()
+    return (
+        cassette is not None and cassette.mode == "record" and cassette.handles(command)
+    )
+
+
+def _trace(
+    command: List[str],
+    cwd: Optional[str],
+    started: float,
+    result: CompletedProcess[str],
+) -> None:
+    tracer = get_tracer()
+    if tracer is not None:
+        output_size = len(result.stdout.encode()) + len(result.stderr.encode())
+        tracer.record(
+            command, cwd, started, time.time(), result.returncode, output_size
+        )
+
+
+def _error_result(command: List[str], error: OSError) -> CompletedProcess[str]:
+    """Converts a failure to start the command into a CompletedProcess."""
+    if isinstance(error, FileNotFoundError):
+        error_msg = f"Command not found: {command[0]}"
+        return CompletedProcess(command, returncode=127, stdout="", stderr=error_msg)
+    if isinstance(error, PermissionError):
+        error_msg = f"Permission denied: {command[0]}"
+        return CompletedProcess(command, returncode=126, stdout="", stderr=error_msg)
+    error_msg = f"OS error when running command {command}: {error}"
+    return CompletedProcess(command, returncode=1, stdout="", stderr=error_msg)
+
+
+def _log_result(result: CompletedProcess[str], verbose: bool) -> None:
+    output = result.stdout if result.returncode == 0 else result.stderr
+    log_command_output(result.args, result.returncode, "\t" + output, verbose)
+
+
 def run(
     command: List[str],
     verbose: bool,
     env: Dict[str, str] = {},
     exit_on_error: bool = False,
+    input: Optional[str] = None,
 ) -> CommandResult:
-    """Runs the given command, logging the output if verbose is True."""
+    """Runs the given command, logging the output if verbose is True.
+
+    input, if given, is written to the command's stdin.
+    """
     try:
-        result = subprocess.run(
-            command,
-            capture_output=True,
-            text=True,
-            env=dict(os.environ, **env),
-            encoding="utf-8",
-        )
-    except FileNotFoundError:
-        if exit_on_error:
-            exit(1)
-        error_msg = f"Command not found: {command[0]}"
-        result = CompletedProcess(command, returncode=127, stdout="", stderr=error_msg)
-    except PermissionError:
-        if exit_on_error:
-            exit(1)
-        error_msg = f"Permission denied: {command[0]}"
-        result = CompletedProcess(command, returncode=126, stdout="", stderr=error_msg)
+        result = _spawn(command, env, input)
     except OSError as e:
         if exit_on_error:
             exit(1)
-        error_msg = f"OS error when running command {command}: {e}"
-        result = CompletedProcess(command, returncode=1, stdout="", stderr=error_msg)
+        result = _error_result(command, e)
 
-    if verbose:
-        if result.returncode == 0:
-            print("\t" + result.stdout)
+    _log_result(result, verbose)
+    return CommandResult(result=result)
+
+
+async def run_async(
+    command: List[str],
+    verbose: bool,
+    env: Dict[str, str] = {},
+) -> CommandResult:
+    """Runs the given command without blocking the event loop.
+
+    Behaves like run, including the active CommandSession's working directory,
+    environment and resolved executables.
+    """
+    session = _active_session.get()
+    cwd = session.cwd if session is not None else None
+    if session is not None:
+        argv, process_env = session.argv(command), session.merged_env(env)
+    else:
+        argv, process_env = command, dict(os.environ, **env)
+    started = time.time()
+    cached = _cached(command, cwd, env)
+    if cached is not None:
+        _trace(command, cwd, started, cached)
+        _log_result(cached, verbose)
+        return CommandResult(result=cached)
+    try:
+        replayed = _replay(command, env)
+        if replayed is not None:
+            result = replayed
         else:
-            print("\t" + result.stderr)
+            timeout = command_timeout(command)
+            process = await asyncio.create_subprocess_exec(
+                *argv,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                cwd=cwd,
+                env=process_env,
+                start_new_session=timeout is not None,
+            )
+            try:
+                stdout, stderr = await asyncio.wait_for(process.communicate(), timeout)
+            except asyncio.TimeoutError:
+                _kill_process_tree(process.pid)
+                await process.wait()
+                _trace(command, cwd, started, _killed_result(command))
+                raise timeout_error(command)
+            assert process.returncode is not None
+            result = CompletedProcess(
+                command,
+                returncode=process.returncode,
+                stdout=_decode(stdout),
+                stderr=_decode(stderr),
+            )
+            _record(command, env, result)
+    except OSError as e:
+        result = _error_result(command, e)
 
+    _update_cache(command, cwd, env, result)
+    _trace(command, cwd, started, result)
+    _log_result(result, verbose)
     return CommandResult(result=result)
 
 
-def run_command(command: List[str], verbose: bool) -> Optional[str]:
+async def gather_commands(
+    commands: Sequence[List[str]],
+    verbose: bool,
+    env: Dict[str, str] = {},
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+) -> List[CommandResult]:
+    """Runs independent commands concurrently, at most max_concurrency at a time.
+
+    Results are returned in the same order as the given commands.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def run_bounded(command: List[str]) -> CommandResult:
+        async with semaphore:
+            return await run_async(command, verbose, env)
+
+    return list(await asyncio.gather(*(run_bounded(c) for c in commands)))
+
+
+class CommandStream:
+    """Iterates over the stdout lines of a command as they are produced.
+
+    Stopping early, by leaving the with block or calling close, kills the command.
+    returncode is set once the command has finished or been killed.
+    """
+
+    def __init__(
+        self, command: List[str], verbose: bool, env: Dict[str, str] = {}
+    ) -> None:
+        self.command = command
+        self.verbose = verbose
+        self.env = env
+        self.returncode: Optional[int] = None
+        self.__lines = self.__read()
+
+    def __iter__(self) -> Iterator[str]:
+        return self.__lines
+
+    def __enter__(self) -> "CommandStream":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type | None,
+        exc_val: BaseException | None,
+        exc_tb: object | None,
+    ) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Stops reading the output, killing the command if it is still running."""
+        self.__lines.close()
+
+    def is_success(self) -> bool:
+        return self.returncode == 0
+
+    def __read(self) -> Generator[str, None, None]:
+        session = _active_session.get()
+        cwd = session.cwd if session is not None else None
+        started = time.time()
+
+        replayed = _replay(self.command, self.env)
+        if replayed is not None:
+            self.returncode = replayed.returncode
+            _trace(self.command, cwd, started, replayed)
+            yield from replayed.stdout.splitlines()
+            return
+
+        base_env = session.env if session is not None else os.environ
+        program = session.resolve(self.command[0]) if session is not None else None
+        recording = _is_recording(self.command)
+        recorded: List[str] = []
+        output_size = 0
+        exhausted = False
+        timeout = command_timeout(self.command)
+        with tempfile.TemporaryFile() as stderr:
+            process = subprocess.Popen(
+                [program or self.command[0], *self.command[1:]],
+                stdout=subprocess.PIPE,
+                stderr=stderr,
+                text=True,
+                cwd=cwd,
+                env=dict(base_env, **self.env),
+                encoding="utf-8",
+                start_new_session=timeout is not None,
+            )
+            assert process.stdout is not None
+            timed_out = threading.Event()
+            timer = None
+            if timeout is not None:
+                # Built now as the deadline may have been left once the stream ends
+                expiry_error = timeout_error(self.command)
+
+                def expire() -> None:
+                    timed_out.set()
+                    _kill_process_tree(process.pid)
+
+                timer = threading.Timer(timeout, expire)
+                timer.start()
+            try:
+                for line in process.stdout:
+                    output_size += len(line)
+                    if recording:
+                        recorded.append(line)
+                    log_command_output(
+                        self.command, None, line.rstrip("\r\n"), self.verbose
+                    )
+                    yield line.rstrip("\r\n")
+                exhausted = not timed_out.is_set()
+            finally:
+                if timer is not None:
+                    timer.cancel()
+                if not exhausted:
+                    process.kill()
+                process.stdout.close()
+                self.returncode = process.wait()
+                stderr.seek(0)
+                result = CompletedProcess(
+                    self.command,
+                    returncode=self.returncode,
+                    stdout="".join(recorded),
+                    stderr=stderr.read().decode("utf-8"),
+                )
+                if exhausted and self.returncode != 0:
+                    log_command_output(
+                        self.command, self.returncode, result.stderr, self.verbose
+                    )
+                if exhausted:
+                    _record(self.command, self.env, result)
+                tracer = get_tracer()
+                if tracer is not None:
+                    tracer.record(
+                        self.command,
+                        cwd,
+                        started,
+                        time.time(),
+                        self.returncode,
+                        output_size,
+                    )
+            if timed_out.is_set():
+                raise expiry_error
+
+
+def stream_command(
+    command: List[str], verbose: bool, env: Dict[str, str] = {}
+) -> CommandStream:
+    """Runs the given command, yielding its stdout line by line.
+
+    Use this over run_command when only part of a large output is needed, e.g.
+
+        with stream_command(["git", "log", "--pretty=format:%H"], verbose) as shas:
+            head = next(iter(shas), None)
+    """
+    return CommandStream(command, verbose, env)
+
+
+def run_command(
+    command: List[str], verbose: bool, env: Dict[str, str] = {}
+) -> Optional[str]:
     """Runs the given command, logging the output if verbose is turned on.
 
     Exits if the command fails.
     """
-    try:
-        result = subprocess.run(
-            command,
-            capture_output=True,
-            text=True,
-            check=True,
-        )
-        if verbose:
-            print(result.stdout)
-        return result.stdout
-    except subprocess.CalledProcessError as e:
-        if verbose:
-            print(e.stderr)
+    result = _spawn(command, env)
+    if result.returncode != 0:
+        log_command_output(command, result.returncode, result.stderr, verbose)
+        flush()
         exit(1)
+    log_command_output(command, result.returncode, result.stdout, verbose)
+    return result.stdout
 
 
 def run_command_no_exit(command: List[str], verbose: bool) -> Optional[str]:
@@ -90,17 +548,9 @@ def run_command_no_exit(command: List[str], verbose: bool) -> Optional[str]:
 
     Does not exit if the command fails.
     """
-    try:
-        result = subprocess.run(
-            command,
-            capture_output=True,
-            text=True,
-            check=True,
-        )
-        if verbose:
-            print(result.stdout)
-        return result.stdout
-    except subprocess.CalledProcessError as e:
-        if verbose:
-            print(e.stderr)
+    result = _spawn(command)
+    if result.returncode != 0:
+        log_command_output(command, result.returncode, result.stderr, verbose)
         return None
+    log_command_output(command, result.returncode, result.stdout, verbose)
+    return result.stdout
@@ -0,0 +1,157 @@
+"""Clone profiles for the repositories exercises download.
+
+Exercises can declare how their repository is cloned under exercise_repo.clone
+in .gitmastery-exercise.json, either by name:
+
+    "clone": "blobless"
+
+or with the individual options, which can be combined:
+
+    "clone": {"depth": 1, "single_branch": true, "branch": "main"}
+
+The named profiles are full (the default), blobless (--filter=blob:none),
+shallow (--depth 1), single-branch and reference. A reference clone borrows
+objects from a local cache of the repository, kept under GITMASTERY_CLONE_CACHE
+(~/.cache/git-mastery/clones by default) and refreshed before every clone, so
+only new objects are downloaded. Unless dissociate is set, the clone keeps
+using the cache through its alternates and breaks if the cache is removed.
+
+Partial and shallow clones need their origin remote to fetch what is missing,
+so they do not suit setups that remove it or walk the full history.
+"""
+
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Union
+
+from exercise_utils.cli import run
+
+CLONE_CACHE_ENV_VAR = "GITMASTERY_CLONE_CACHE"
+DEFAULT_CLONE_CACHE = os.path.join("~", ".cache", "git-mastery", "clones")
+
+
+@dataclass(frozen=True)
+class CloneProfile:
+    filter: Optional[str] = None
+    depth: Optional[int] = None
+    single_branch: bool = False
+    branch: Optional[str] = None
+    reference: bool = False
+    dissociate: bool = False
+
+    def options(self, reference_path: Optional[str] = None) -> List[str]:
+        """Returns the git clone options, borrowing from reference_path if given."""
+        options = []
+        if self.filter is not None:
+            options.append(f"--filter={self.filter}")
+        if self.depth is not None:
+            options.append(f"--depth={self.depth}")
+        if self.single_branch:
+            options.append("--single-branch")
+        if self.branch is not None:
+            options.append(f"--branch={self.branch}")
+        if reference_path is not None:
+            options.append(f"--reference-if-able={reference_path}")
+            if self.dissociate:
+                options.append("--dissociate")
+        return options
+
+
+FULL = CloneProfile()
+
+PROFILES: Dict[str, CloneProfile] = {
+    "full": FULL,
+    "blobless": CloneProfile(filter="blob:none"),
+    "shallow": CloneProfile(depth=1),
+    "single-branch": CloneProfile(single_branch=True),
+    "reference": CloneProfile(reference=True),
+}
+
+PROFILE_OPTIONS = {
+    "filter": str,
+    "depth": int,
+    "single_branch": bool,
+    "branch": str,
+    "reference": bool,
+    "dissociate": bool,
+}
+
+
+def parse_clone_profile(config: Union[None, str, Dict[str, Any]]) -> CloneProfile:
+    """Parses the clone entry of an exercise config, raising ValueError if invalid."""
+    if config is None:
+        return FULL
+    if isinstance(config, str):
+        if config not in PROFILES:
+            raise ValueError(
+                f"Unknown clone profile {config}, expected one of {list(PROFILES)}"
+            )
+        return PROFILES[config]
+    if not isinstance(config, dict):
+        raise ValueError(f"Invalid clone profile {config}")
+
+    for key, value in config.items():
+        expected = PROFILE_OPTIONS.get(key)
+        if expected is None:
+            raise ValueError(f"Unknown clone option {key}")
+        # bool is a subclass of int, so check the exact type
+        if type(value) is not expected:
+            raise ValueError(f"Clone option {key} must be a {expected.__name__}")
+    if config.get("depth", 1) < 1:
+        raise ValueError("Clone option depth must be at least 1")
+    return CloneProfile(**config)
+
+
+def clone_cache_path(repository_url: str) -> str:
+    """Returns where the reference cache of the repository is kept."""
+    root = os.path.expanduser(os.environ.get(CLONE_CACHE_ENV_VAR, DEFAULT_CLONE_CACHE))
+    name = repository_url.rstrip("/").removesuffix(".git")
+    if "://" in name:
+        name = name.split("://", 1)[1].split("/", 1)[-1]
+    elif ":" in name:
+        name = name.split(":", 1)[1]
+    return os.path.join(root, *name.split("/")[-2:]) + ".git"
+
+
+def update_clone_cache(repository_url: str, verbose: bool) -> Optional[str]:
+    """Creates or refreshes the reference cache of the repository.
+
+    Returns its path, or None if it could not be updated, in which case clones
+    fall back to downloading everything.
+    """
+    path = clone_cache_path(repository_url)
+    if os.path.isdir(path):
+        result = run(
+            [
+                "git",
+                "-C",
+                path,
+                "fetch",
+                "--quiet",
+                "--prune",
+                repository_url,
+                "+refs/heads/*:refs/heads/*",
+                "+refs/tags/*:refs/tags/*",
+            ],
+            verbose,
+        )
+    else:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        result = run(
+            ["git", "clone", "--bare", "--quiet", repository_url, path], verbose
+        )
+    return path if result.is_success() else None
+
+
+def clone_options(
+    profile: CloneProfile, reference_url: Optional[str], verbose: bool
+) -> List[str]:
+    """Returns the git clone options of the profile, refreshing its cache first."""
+    reference_path = None
+    if profile.reference and reference_url is not None:
+        reference_path = update_clone_cache(reference_url, verbose)
+    return profile.options(reference_path)
+
+
+def github_url(repository_name: str) -> str:
+    return f"https://github.com/{repository_name}.git"
@@ -0,0 +1,200 @@
+"""Opt-in memoization of read-only commands run through exercise_utils.cli.
+
+Within a command_cache block, successful results of read-only git and gh queries
+are cached by argv, working directory and relevant environment. Any mutating git
+command invalidates the cached results for its repository, and any mutating gh
+command invalidates the cached GitHub queries other than the user lookup.
+
+Only commands run through exercise_utils.cli are seen, so changes made by other
+means (e.g. GitPython) within the block are not picked up.
+"""
+
+import os
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from subprocess import CompletedProcess
+from typing import Dict, FrozenSet, Iterator, List, Mapping, Optional, Tuple
+
+READ_ONLY_GIT_COMMANDS = {
+    "cat-file",
+    "describe",
+    "for-each-ref",
+    "log",
+    "ls-tree",
+    "merge-base",
+    "name-rev",
+    "rev-list",
+    "rev-parse",
+    "show",
+    "show-ref",
+}
+
+# Git options that take a separate value before the subcommand
+GIT_OPTIONS_WITH_VALUE = {"-C", "-c", "--git-dir", "--work-tree", "--namespace"}
+
+# Environment variables that change what a query returns
+RELEVANT_ENV_VARS = (
+    "GIT_DIR",
+    "GIT_WORK_TREE",
+    "GIT_INDEX_FILE",
+    "GH_HOST",
+    "GH_TOKEN",
+    "GITHUB_TOKEN",
+)
+
+Scope = Tuple[str, str]
+CacheKey = Tuple[Tuple[str, ...], str, FrozenSet[Tuple[str, str]]]
+
+
+@dataclass
+class CommandKind:
+    read_only: bool
+    mutating: bool
+    scope: Optional[Scope]
+
+
+def classify(command: List[str], cwd: str) -> CommandKind:
+    """Classifies a command as read-only, mutating or neither, with its scope."""
+    if command[0] == "git":
+        subcommand, repo = _git_subcommand(command, cwd)
+        if subcommand is None:
+            return CommandKind(read_only=False, mutating=False, scope=None)
+        read_only = subcommand in READ_ONLY_GIT_COMMANDS
+        return CommandKind(
+            read_only=read_only, mutating=not read_only, scope=("git", repo)
+        )
+
+    if command[0] == "gh":
+        if command[1:3] == ["api", "graphql"]:
+            # Fields carry the query and its variables, so only mutations write
+            writes = any(
+                arg.startswith("query=") and arg[6:].lstrip().startswith("mutation")
+                for arg in command[3:]
+            )
+            return CommandKind(
+                read_only=not writes, mutating=writes, scope=("gh", "repos")
+            )
+        if command[1:2] == ["api"]:
+            # Fields or an explicit method turn gh api into a write
+            writes = any(
+                arg in ("-X", "--method", "-f", "-F", "--field", "--raw-field")
+                for arg in command[2:]
+            )
+            # The authenticated user does not change with repository operations
+            target = "user" if command[2:3] == ["user"] else "repos"
+            return CommandKind(
+                read_only=not writes, mutating=writes, scope=("gh", target)
+            )
+        if command[1:3] == ["repo", "view"]:
+            return CommandKind(read_only=True, mutating=False, scope=("gh", "repos"))
+        if command[1:2] == ["repo"] and command[2:3] != ["clone"]:
+            return CommandKind(read_only=False, mutating=True, scope=("gh", "repos"))
+
+    return CommandKind(read_only=False, mutating=False, scope=None)
+
+
+def _git_subcommand(command: List[str], cwd: str) -> Tuple[Optional[str], str]:
+    repo = cwd
+    i = 1
+    while i < len(command) and command[i].startswith("-"):
+        if command[i] == "-C" and i + 1 < len(command):
+            repo = os.path.join(repo, command[i + 1])
+        if command[i] in GIT_OPTIONS_WITH_VALUE:
+            i += 1
+        i += 1
+    if i >= len(command):
+        return None, repo
+    return command[i], os.path.normpath(repo)
+
+
+def _overlaps(a: str, b: str) -> bool:
+    """Returns if either path contains the other, i.e. may be the same repo."""
+    return a == b or a.startswith(b + os.sep) or b.startswith(a + os.sep)
+
+
+class CommandCache:
+    def __init__(self) -> None:
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.__entries: Dict[CacheKey, Tuple[Scope, CompletedProcess[str]]] = {}
+        self.__lock = threading.Lock()
+
+    def lookup(
+        self, command: List[str], cwd: str, env: Mapping[str, str]
+    ) -> Optional[CompletedProcess[str]]:
+        """Returns the cached result of a read-only command, if any."""
+        if not classify(command, cwd).read_only:
+            return None
+        with self.__lock:
+            entry = self.__entries.get(_key(command, cwd, env))
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry[1]
+
+    def update(
+        self,
+        command: List[str],
+        cwd: str,
+        env: Mapping[str, str],
+        result: CompletedProcess[str],
+    ) -> None:
+        """Caches a read-only result, or invalidates the scope of a mutation."""
+        kind = classify(command, cwd)
+        if kind.scope is None:
+            return
+        with self.__lock:
+            if kind.read_only and result.returncode == 0:
+                self.__entries[_key(command, cwd, env)] = (kind.scope, result)
+            elif kind.mutating:
+                self.__invalidate(kind.scope)
+
+    def clear(self) -> None:
+        with self.__lock:
+            self.__entries.clear()
+
+    def __invalidate(self, scope: Scope) -> None:
+        program, target = scope
+        stale = [
+            key
+            for key, (entry_scope, _) in self.__entries.items()
+            if entry_scope[0] == program
+            and (
+                _overlaps(entry_scope[1], target)
+                if program == "git"
+                else entry_scope[1] == target
+            )
+        ]
+        for key in stale:
+            del self.__entries[key]
+        self.invalidations += len(stale)
+
+
+def _key(command: List[str], cwd: str, env: Mapping[str, str]) -> CacheKey:
+    relevant = frozenset((name, env[name]) for name in RELEVANT_ENV_VARS if name in env)
+    return (tuple(command), cwd, relevant)
+
+
+_active_cache: ContextVar[Optional[CommandCache]] = ContextVar(
+    "active_command_cache", default=None
+)
+
+
+def get_command_cache() -> Optional[CommandCache]:
+    """Returns the active command cache, if any."""
+    return _active_cache.get()
+
+
+@contextmanager
+def command_cache() -> Iterator[CommandCache]:
+    """Memoizes read-only commands run within the context."""
+    cache = CommandCache()
+    token = _active_cache.set(cache)
+    try:
+        yield cache
+    finally:
+        _active_cache.reset(token)
@@ -0,0 +1,26 @@
+from typing import Iterator
+
+import pytest
+
+from exercise_utils.github_backend import clear_repo_state_cache, set_github_username
+from exercise_utils.github_scheduler import set_rate_limit_tracker
+from exercise_utils.http_cache import reset_http_cache, set_http_cache
+from testing.fake_github import DEFAULT_VIEWER
+
+
+@pytest.fixture
+def github_state() -> Iterator[None]:
+    """Isolates the process-wide Github state for tests against the fake Github.
+
+    The HTTP cache is disabled, so every request reaches the fake, the rate limit
+    tracker starts fresh and the fake's viewer is the authenticated user.
+    """
+    set_http_cache(None)
+    set_rate_limit_tracker(None)
+    set_github_username(DEFAULT_VIEWER)
+    clear_repo_state_cache()
+    yield
+    reset_http_cache()
+    set_rate_limit_tracker(None)
+    set_github_username(None)
+    clear_repo_state_cache()
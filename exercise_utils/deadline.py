@@ -0,0 +1,152 @@
+"""Time budgets for the commands run through exercise_utils.cli.
+
+Commands run within a deadline block use the remaining budget as their timeout.
+When it runs out, the command and any processes it started are killed and
+CommandTimeoutError is raised. Deadlines can be nested to budget the phases of an
+operation, and each phase's elapsed versus budgeted time is kept on the outermost
+deadline:
+
+    with deadline("download", 300) as budget:
+        with deadline("fork", 60):
+            fork_repo(...)
+        with deadline("clone", 120):
+            clone_repo_with_gh(...)
+    print(budget.report())
+"""
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Iterator, List, Optional
+
+
+class CommandTimeoutError(Exception):
+    """Raised when a command does not finish within the active deadline."""
+
+    def __init__(self, command: List[str], phase: str, budget: float) -> None:
+        super().__init__(
+            f"Command {command} exceeded the {budget:.1f}s budget of phase '{phase}'"
+        )
+        self.command = command
+        self.phase = phase
+        self.budget = budget
+
+
+@dataclass
+class PhaseReport:
+    name: str
+    depth: int
+    budget: float
+    elapsed: float
+
+    @property
+    def exceeded(self) -> bool:
+        return self.elapsed > self.budget
+
+
+class Deadline:
+    def __init__(
+        self, name: str, budget: float, parent: Optional["Deadline"] = None
+    ) -> None:
+        self.name = name
+        self.budget = budget
+        self.parent = parent
+        self.started_at = time.monotonic()
+        self.expires_at = self.started_at + budget
+        self.phases: List[PhaseReport] = []
+
+    @property
+    def depth(self) -> int:
+        return 0 if self.parent is None else self.parent.depth + 1
+
+    @property
+    def root(self) -> "Deadline":
+        return self if self.parent is None else self.parent.root
+
+    def remaining(self) -> float:
+        """Returns the remaining time, bounded by every enclosing deadline."""
+        remaining = self.expires_at - time.monotonic()
+        if self.parent is not None:
+            remaining = min(remaining, self.parent.remaining())
+        return max(remaining, 0.0)
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def limiting(self) -> "Deadline":
+        """Returns the deadline, this one or an enclosing one, that expires first."""
+        if self.parent is None:
+            return self
+        parent = self.parent.limiting()
+        return parent if parent.expires_at < self.expires_at else self
+
+    def report(self) -> str:
+        """Returns the elapsed versus budgeted time of every finished phase."""
+        lines = [f"{'elapsed':>9}  {'budget':>9}  phase"]
+        for phase in self.phases:
+            marker = "  (exceeded)" if phase.exceeded else ""
+            lines.append(
+                f"{phase.elapsed:>8.2f}s  {phase.budget:>8.2f}s  "
+                f"{'  ' * phase.depth}{phase.name}{marker}"
+            )
+        return "\n".join(lines)
+
+
+_active_deadline: ContextVar[Optional[Deadline]] = ContextVar(
+    "active_deadline", default=None
+)
+
+
+@contextmanager
+def deadline(name: str, seconds: float) -> Iterator[Deadline]:
+    """Limits the commands run within the context to the given time budget."""
+    current = Deadline(name, seconds, _active_deadline.get())
+    token = _active_deadline.set(current)
+    try:
+        yield current
+    finally:
+        _active_deadline.reset(token)
+        elapsed = time.monotonic() - current.started_at
+        # Phases are reported in the order they started, parents before children
+        current.root.phases.insert(
+            len(current.root.phases) - _count_nested(current),
+            PhaseReport(current.name, current.depth, current.budget, elapsed),
+        )
+
+
+def _count_nested(current: Deadline) -> int:
+    """Returns how many reported phases were nested within the current one."""
+    count = 0
+    for phase in reversed(current.root.phases):
+        if phase.depth <= current.depth:
+            break
+        count += 1
+    return count
+
+
+def current_deadline() -> Optional[Deadline]:
+    """Returns the innermost active deadline, if any."""
+    return _active_deadline.get()
+
+
+def command_timeout(command: List[str]) -> Optional[float]:
+    """Returns the timeout for a command starting now, or None without a deadline.
+
+    Raises CommandTimeoutError if the deadline has already passed.
+    """
+    current = _active_deadline.get()
+    if current is None:
+        return None
+    remaining = current.remaining()
+    if remaining <= 0:
+        raise timeout_error(command)
+    return remaining
+
+
+def timeout_error(command: List[str]) -> CommandTimeoutError:
+    """Builds the error for a command that ran past the active deadline."""
+    current = _active_deadline.get()
+    assert current is not None
+    limiting = current.limiting()
+    return CommandTimeoutError(command, limiting.name, limiting.budget)
@@ -1,9 +1,18 @@
 """File-specific utility functions."""
 
+import json
 import os
 import pathlib
+import tempfile
 import textwrap
-from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Mapping, Optional, Tuple, Union
+
+from exercise_utils.cli import DEFAULT_MAX_CONCURRENCY
+from exercise_utils.git import add
+
+# The contents of a file, None to only create it, optionally with its mode
+FileSpec = Union[Optional[str], Tuple[Optional[str], int]]
 
 
 def create_or_update_file(
@@ -13,6 +22,62 @@ def create_or_update_file(
     if os.path.dirname(filepath) != "":
         os.makedirs(os.path.dirname(filepath), exist_ok=True)
 
+    _write_file(filepath, contents)
+
+
+def materialize_tree(
+    files: Mapping[str | pathlib.Path, FileSpec],
+    mode: Optional[int] = None,
+    stage: bool = False,
+    verbose: bool = False,
+) -> None:
+    """Creates or updates many files at once, like create_or_update_file.
+
+    Every directory is created once and the files are written on a thread pool.
+    Once all are written, files are given their own mode if one is paired with
+    their contents, or mode otherwise, so read-only files can be written too.
+    With stage, the files are then added to the index with a single git add.
+    """
+    entries = {
+        path: spec if isinstance(spec, tuple) else (spec, mode)
+        for path, spec in files.items()
+    }
+    directories = {os.path.dirname(path) for path in entries} - {""}
+    for directory in sorted(directories):
+        os.makedirs(directory, exist_ok=True)
+
+    with ThreadPoolExecutor(DEFAULT_MAX_CONCURRENCY) as executor:
+        # Consumed so errors are raised here
+        contents = [contents for contents, _ in entries.values()]
+        list(executor.map(_write_file, entries, contents))
+    for path, (_, file_mode) in entries.items():
+        if file_mode is not None:
+            os.chmod(path, file_mode)
+
+    if stage and entries:
+        add([str(path) for path in entries], verbose)
+
+
+def write_json_atomically(filepath: str, data: Any) -> None:
+    """Writes data as JSON to filepath, creating its directory if needed.
+
+    The data is written to a temporary file that then replaces filepath, so
+    concurrent readers see either the old or the new contents, never a partial
+    file. Raises OSError if it cannot be written.
+    """
+    directory = os.path.dirname(filepath) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as temp_file:
+            json.dump(data, temp_file)
+        os.replace(temp_path, filepath)
+    except OSError:
+        os.unlink(temp_path)
+        raise
+
+
+def _write_file(filepath: str | pathlib.Path, contents: Optional[str]) -> None:
     if contents is None:
         open(filepath, "a").close()
     else:
@@ -0,0 +1,167 @@
+"""Forking a repository and cloning the fork in one pipelined operation.
+
+Github creates forks asynchronously, so cloning right after forking can fail
+on a fork that has no commits yet. ensure_fork_clone replaces any stale fork,
+then polls until the new fork can be fetched before cloning it. The Github
+requests run alongside the local preparation (refreshing the reference cache
+of a reference clone), and the time taken by each stage is reported:
+
+    report = ensure_fork_clone("git-mastery/gm-shapes", "gm-shapes", "shapes", True)
+    print(report.summary())
+"""
+
+import asyncio
+import os
+import time
+from dataclasses import dataclass, field
+from sys import exit
+from typing import Awaitable, Dict, List, Tuple, TypeVar
+
+from exercise_utils.cli import run_async
+from exercise_utils.clone import FULL, CloneProfile, clone_options, github_url
+from exercise_utils.github_cli import (
+    delete_repo,
+    fork_repo,
+    get_github_username,
+    has_repo,
+)
+from exercise_utils.log import Level, log
+
+# Seconds to wait for a new fork to become clonable
+DEFAULT_READY_TIMEOUT = 120.0
+INITIAL_POLL_INTERVAL = 0.25
+MAX_POLL_INTERVAL = 8.0
+
+T = TypeVar("T")
+
+
+@dataclass
+class ForkCloneReport:
+    fork: str
+    stages: Dict[str, float] = field(default_factory=dict)
+    polls: int = 0
+    total: float = 0.0
+
+    def summary(self) -> str:
+        lines = [
+            f"{stage + ' (ms)':<16}{seconds * 1000:>10.1f}"
+            for stage, seconds in self.stages.items()
+        ]
+        lines.append(f"{'total (ms)':<16}{self.total * 1000:>10.1f}")
+        lines.append(f"{self.fork} ready after {self.polls} poll(s)")
+        return "\n".join(lines)
+
+
+async def ensure_fork_clone_async(
+    upstream: str,
+    fork_name: str,
+    dest: str,
+    verbose: bool,
+    profile: CloneProfile = FULL,
+    ready_timeout: float = DEFAULT_READY_TIMEOUT,
+) -> ForkCloneReport:
+    """Forks upstream as fork_name, replacing any existing fork, and clones it.
+
+    The fork is cloned into dest, borrowing from the cache of upstream for
+    reference profiles. Exits if the fork cannot be created, does not become
+    clonable within ready_timeout seconds or cannot be cloned.
+    """
+    started_at = time.monotonic()
+    report = ForkCloneReport(fork=fork_name)
+
+    async def timed(stage: str, operation: Awaitable[T]) -> T:
+        stage_started_at = time.monotonic()
+        result = await operation
+        report.stages[stage] = time.monotonic() - stage_started_at
+        return result
+
+    async def replace_fork() -> Tuple[str, bool]:
+        username = await timed(
+            "username", asyncio.to_thread(get_github_username, verbose)
+        )
+        fork = f"{username}/{fork_name}"
+        if await timed("lookup", asyncio.to_thread(has_repo, fork, True, verbose)):
+            await timed("delete", asyncio.to_thread(delete_repo, fork, verbose))
+
+        def create() -> bool:
+            fork_repo(upstream, fork_name, verbose)
+            # Github lists a fork as soon as it accepts it, before it is clonable
+            return has_repo(fork, True, verbose)
+
+        return fork, await timed("fork", asyncio.to_thread(create))
+
+    def prepare() -> List[str]:
+        os.makedirs(os.path.dirname(os.path.abspath(dest)), exist_ok=True)
+        return clone_options(profile, github_url(upstream), verbose)
+
+    (fork, created), options = await asyncio.gather(
+        replace_fork(), timed("prepare", asyncio.to_thread(prepare))
+    )
+    report.fork = fork
+    if not created:
+        log(Level.ERROR, f"Could not fork {upstream} as {fork}")
+        exit(1)
+
+    ready, report.polls = await timed(
+        "ready", wait_for_fork(fork, verbose, ready_timeout)
+    )
+    if not ready:
+        log(
+            Level.ERROR,
+            f"{fork} could not be cloned after {ready_timeout:.0f} seconds",
+        )
+        exit(1)
+
+    command = ["gh", "repo", "clone", fork, dest]
+    if options:
+        command.extend(["--", *options])
+    result = await timed("clone", run_async(command, verbose))
+    if not result.is_success():
+        log(Level.ERROR, f"Could not clone {fork}")
+        exit(1)
+
+    report.total = time.monotonic() - started_at
+    log(Level.INFO if verbose else Level.DEBUG, report.summary())
+    return report
+
+
+def ensure_fork_clone(
+    upstream: str,
+    fork_name: str,
+    dest: str,
+    verbose: bool,
+    profile: CloneProfile = FULL,
+    ready_timeout: float = DEFAULT_READY_TIMEOUT,
+) -> ForkCloneReport:
+    """Blocking entry point to ensure_fork_clone_async for setup scripts."""
+    return asyncio.run(
+        ensure_fork_clone_async(
+            upstream, fork_name, dest, verbose, profile, ready_timeout
+        )
+    )
+
+
+async def wait_for_fork(fork: str, verbose: bool, timeout: float) -> Tuple[bool, int]:
+    """Polls until the fork has branches to clone, backing off exponentially.
+
+    Returns if the fork became ready within timeout seconds and the number of
+    polls made.
+    """
+    deadline = time.monotonic() + timeout
+    interval = INITIAL_POLL_INTERVAL
+    polls = 0
+    while True:
+        polls += 1
+        # Github asks for credentials until the fork exists, which must not block
+        result = await run_async(
+            ["git", "ls-remote", "--heads", github_url(fork)],
+            verbose,
+            env={"GIT_TERMINAL_PROMPT": "0"},
+        )
+        if result.is_success() and result.stdout:
+            return True, polls
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False, polls
+        await asyncio.sleep(min(interval, remaining))
+        interval = min(interval * 2, MAX_POLL_INTERVAL)
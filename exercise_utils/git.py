@@ -1,43 +1,49 @@
 """Wrapper for Git CLI commands."""
 
-from typing import List, Optional
+import os
+import tempfile
+import textwrap
+from dataclasses import dataclass, field
+from datetime import datetime
+from sys import exit
+from typing import Dict, List, Optional, Set, Tuple, Union
 
 from exercise_utils.cli import run, run_command
+from exercise_utils.clone import FULL, CloneProfile, clone_options
+from exercise_utils.git_backend import get_git_backend
+from exercise_utils.reproducible import next_signature, signature_env
 
 
 def tag(tag_name: str, verbose: bool) -> None:
     """Tags the latest commit with the given tag_name."""
-    run_command(["git", "tag", tag_name], verbose)
+    get_git_backend().tag(tag_name, verbose)
 
 
 def tag_with_options(tag_name: str, options: List[str], verbose: bool) -> None:
     """Tags with the given tag_name with specified options."""
-    run_command(["git", "tag", tag_name, *options], verbose)
+    get_git_backend().tag_with_options(tag_name, options, verbose)
 
 
 def add(files: List[str], verbose: bool) -> None:
     """Adds a given list of file paths."""
-    run_command(["git", "add", *files], verbose)
+    get_git_backend().add(files, verbose)
 
 
 # TODO(woojiahao): Maybe these should be built from a class like builder for each
 # option
 def commit(message: str, verbose: bool) -> None:
     """Creates a commit with the given message."""
-    run_command(["git", "commit", "-m", message], verbose)
+    get_git_backend().commit(message, False, verbose)
 
 
 def empty_commit(message: str, verbose: bool) -> None:
     """Creates an empty commit with the given message."""
-    run_command(["git", "commit", "-m", message, "--allow-empty"], verbose)
+    get_git_backend().commit(message, True, verbose)
 
 
 def checkout(branch: str, create_branch: bool, verbose: bool) -> None:
     """Checkout to the given branch, creating it if requested."""
-    if create_branch:
-        run_command(["git", "checkout", "-b", branch], verbose)
-    else:
-        run_command(["git", "checkout", branch], verbose)
+    get_git_backend().checkout(branch, create_branch, verbose)
 
 
 def merge(target_branch: str, ff: bool, verbose: bool) -> None:
@@ -46,20 +52,14 @@ def merge(target_branch: str, ff: bool, verbose: bool) -> None:
     Forcefully sets --no-edit to avoid requiring the student to enter the commit
     message.
     """
-    if ff:
-        run_command(["git", "merge", target_branch, "--no-edit"], verbose)
-    else:
-        run_command(["git", "merge", target_branch, "--no-edit", "--no-ff"], verbose)
+    get_git_backend().merge(target_branch, ff, None, verbose)
 
 
 def merge_with_message(
     target_branch: str, ff: bool, message: str, verbose: bool
 ) -> None:
     """Merges the current branch with the target one."""
-    if ff:
-        run_command(["git", "merge", target_branch, "-m", message], verbose)
-    else:
-        run_command(["git", "merge", target_branch, "-m", message, "--no-ff"], verbose)
+    get_git_backend().merge(target_branch, ff, message, verbose)
 
 
 def init(verbose: bool) -> None:
@@ -67,34 +67,649 @@ def init(verbose: bool) -> None:
 
     Forces the name of the initial branch to be main.
     """
-    run_command(["git", "init", "--initial-branch=main"], verbose)
+    get_git_backend().init(verbose)
 
 
 def push(remote: str, branch: str, verbose: bool) -> None:
     """Push the given branch on the remote."""
-    run_command(["git", "push", remote, branch], verbose)
+    get_git_backend().push(remote, branch, verbose)
 
 
 def track_remote_branch(remote: str, branch: str, verbose: bool) -> None:
     """Tracks a remote branch locally using the same name."""
-    run_command(["git", "branch", branch, f"{remote}/{branch}"], verbose)
+    get_git_backend().track_remote_branch(remote, branch, verbose)
 
 
 def remove_remote(remote: str, verbose: bool) -> None:
     """Removes a given remote."""
-    run_command(["git", "remote", "rm", remote], verbose)
+    get_git_backend().remove_remote(remote, verbose)
 
 
 def add_remote(remote: str, remote_url: str, verbose: bool) -> None:
     """Adds a remote with the given name and URL."""
-    run_command(["git", "remote", "add", remote, remote_url], verbose)
+    get_git_backend().add_remote(remote, remote_url, verbose)
 
 
 def clone_repo_with_git(
-    repository_url: str, verbose: bool, name: Optional[str] = None
+    repository_url: str,
+    verbose: bool,
+    name: Optional[str] = None,
+    profile: CloneProfile = FULL,
 ) -> None:
-    """Clones a Git repository. Does not require Github CLI."""
-    if name is not None:
-        run(["git", "clone", repository_url, name], verbose)
+    """Clones a Git repository. Does not require Github CLI.
+
+    The profile selects a partial, shallow or reference clone.
+    """
+    options = clone_options(profile, repository_url, verbose)
+    get_git_backend().clone(repository_url, name, options, verbose)
+
+
+def create_branch(branch: str, start_point: str, verbose: bool) -> None:
+    """Creates a branch at start_point without checking it out."""
+    run_command(["git", "branch", branch, start_point], verbose)
+
+
+def commit_to_branch(
+    branch: str,
+    message: str,
+    files: Dict[str, Optional[str]],
+    verbose: bool,
+    mode: Optional[str] = None,
+) -> str:
+    """Creates a commit on the branch without touching the index or working tree.
+
+    files maps paths to their new contents, dedented like create_or_update_file,
+    and None deletes a path. Written paths keep their mode on the branch, e.g.
+    100755 for scripts, and new ones are given mode, 100644 by default. Returns
+    the SHA of the new commit. If the branch is checked out, call
+    materialize_branch once all changes are made.
+    """
+    parent = _rev_parse(f"refs/heads/{branch}", verbose)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        # A throwaway index keeps the real one untouched
+        env = {"GIT_INDEX_FILE": os.path.join(temp_dir, "index")}
+        if parent is not None:
+            _git(["read-tree", parent], verbose, env)
+
+        written = [path for path, contents in files.items() if contents is not None]
+        blob_paths = []
+        for i, path in enumerate(written):
+            blob_path = os.path.join(temp_dir, f"blob-{i}")
+            with open(blob_path, "w", encoding="utf-8", newline="") as blob_file:
+                blob_file.write(textwrap.dedent(files[path] or "").lstrip())
+            blob_paths.append(blob_path)
+        blobs = (
+            _git(
+                ["hash-object", "-w", "--stdin-paths"],
+                verbose,
+                input="\n".join(blob_paths) + "\n",
+            ).splitlines()
+            if blob_paths
+            else []
+        )
+
+        modes = _index_modes(written, verbose, env) if parent is not None else {}
+        entries = [
+            f"{modes.get(path, mode or '100644')} {blob}\t{path}"
+            for path, blob in zip(written, blobs)
+        ]
+        entries += [
+            f"0 {'0' * 40}\t{path}"
+            for path, contents in files.items()
+            if contents is None
+        ]
+        if entries:
+            _git(
+                ["update-index", "--index-info"],
+                verbose,
+                env,
+                input="\n".join(entries) + "\n",
+            )
+        tree = _git(["write-tree"], verbose, env)
+
+    parents = ["-p", parent] if parent is not None else []
+    sha = _git(["commit-tree", tree, *parents, "-m", message], verbose, signature_env())
+    _git(["update-ref", f"refs/heads/{branch}", sha, parent or ""], verbose)
+    return sha
+
+
+def merge_into_branch(
+    branch: str,
+    target_branch: str,
+    ff: bool,
+    verbose: bool,
+    message: Optional[str] = None,
+) -> str:
+    """Merges target_branch into branch without touching the index or working tree.
+
+    Uses git merge-tree, so it exits on conflicts instead of leaving them to be
+    resolved. Returns the SHA the branch ends up at. If the branch is checked
+    out, call materialize_branch once all changes are made.
+    """
+    ours = _rev_parse(f"refs/heads/{branch}", verbose)
+    theirs = _rev_parse(target_branch, verbose)
+    if ours is None or theirs is None:
+        exit(1)
+
+    # Like git merge, nothing is done if the branch already contains theirs
+    up_to_date = run(["git", "merge-base", "--is-ancestor", theirs, ours], verbose)
+    if up_to_date.is_success():
+        return ours
+    is_ancestor = run(["git", "merge-base", "--is-ancestor", ours, theirs], verbose)
+    if ff and is_ancestor.is_success():
+        _git(["update-ref", f"refs/heads/{branch}", theirs, ours], verbose)
+        return theirs
+
+    tree = _git(["merge-tree", "--write-tree", ours, theirs], verbose).splitlines()[0]
+    if message is None:
+        message = f"Merge branch '{target_branch}'"
+        if branch != "main":
+            message += f" into {branch}"
+    sha = _git(
+        ["commit-tree", tree, "-p", ours, "-p", theirs, "-m", message],
+        verbose,
+        signature_env(),
+    )
+    _git(["update-ref", f"refs/heads/{branch}", sha, ours], verbose)
+    return sha
+
+
+def materialize_branch(branch: str, verbose: bool) -> None:
+    """Checks out the branch, overwriting the index and working tree with it."""
+    run_command(["git", "checkout", "--force", "--quiet", branch], verbose)
+
+
+@dataclass
+class _RefUpdate:
+    action: str
+    ref: str
+    target: Optional[str] = None
+    message: Optional[str] = None
+
+
+class RefTransaction:
+    """Batches creates, moves and deletes of branches and tags, applying them in
+    one atomic git update-ref --stdin when the block exits without an error.
+
+    Either every update is applied or, if any fails (e.g. a created ref already
+    exists), none is and the process exits like the other wrappers. Targets are
+    revisions like HEAD~2 and are resolved together when the transaction commits.
+
+        with RefTransaction(verbose) as refs:
+            refs.create_tag("v1.0", "HEAD~4")
+            refs.create_tag("v2.0", "HEAD~1", message="First stable roster")
+            refs.create_branch("feature", "main")
+    """
+
+    def __init__(self, verbose: bool) -> None:
+        self.verbose = verbose
+        self.__updates: List[_RefUpdate] = []
+
+    def __enter__(self) -> "RefTransaction":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type | None,
+        exc_val: BaseException | None,
+        exc_tb: object | None,
+    ) -> None:
+        if exc_type is None:
+            self.commit()
+
+    def create_branch(self, branch: str, target: str = "HEAD") -> None:
+        self.__updates.append(_RefUpdate("create", f"refs/heads/{branch}", target))
+
+    def move_branch(self, branch: str, target: str) -> None:
+        self.__updates.append(_RefUpdate("update", f"refs/heads/{branch}", target))
+
+    def delete_branch(self, branch: str) -> None:
+        self.__updates.append(_RefUpdate("delete", f"refs/heads/{branch}"))
+
+    def track_remote_branch(self, remote: str, branch: str) -> None:
+        """Tracks a remote branch locally using the same name."""
+        self.create_branch(branch, f"refs/remotes/{remote}/{branch}")
+
+    def create_tag(
+        self, tag_name: str, target: str = "HEAD", message: Optional[str] = None
+    ) -> None:
+        """Creates a tag, annotated if a message is given and lightweight otherwise."""
+        self.__updates.append(
+            _RefUpdate("create", f"refs/tags/{tag_name}", target, message)
+        )
+
+    def move_tag(
+        self, tag_name: str, target: str, message: Optional[str] = None
+    ) -> None:
+        """Moves a tag like git tag -f, replacing it with an annotated one if a
+        message is given."""
+        self.__updates.append(
+            _RefUpdate("update", f"refs/tags/{tag_name}", target, message)
+        )
+
+    def delete_tag(self, tag_name: str) -> None:
+        self.__updates.append(_RefUpdate("delete", f"refs/tags/{tag_name}"))
+
+    def commit(self) -> None:
+        """Applies the queued updates in one transaction."""
+        updates, self.__updates = self.__updates, []
+        if not updates:
+            return
+        objects = self.__resolve(
+            [update.target for update in updates if update.target is not None]
+        )
+        tags = self.__write_tags(
+            [update for update in updates if update.message is not None], objects
+        )
+
+        commands = []
+        for update in updates:
+            if update.target is None:
+                commands.append(f"{update.action} {update.ref}")
+                continue
+            value = tags.get(update.ref) or objects[update.target][0]
+            commands.append(f"{update.action} {update.ref} {value}")
+        _git(["update-ref", "--stdin"], self.verbose, input="\n".join(commands) + "\n")
+
+    def __resolve(self, revisions: List[str]) -> Dict[str, Tuple[str, str]]:
+        """Returns the SHA and type each revision points to, exiting if any is
+        missing."""
+        unique = list(dict.fromkeys(revisions))
+        if not unique:
+            return {}
+        output = _git(
+            ["cat-file", "--batch-check=%(objectname) %(objecttype)"],
+            self.verbose,
+            input="\n".join(unique) + "\n",
+        )
+        objects = {}
+        for revision, line in zip(unique, output.splitlines()):
+            sha, object_type = line.rsplit(" ", 1)
+            if object_type == "missing":
+                exit(1)
+            objects[revision] = (sha, object_type)
+        return objects
+
+    def __write_tags(
+        self, updates: List[_RefUpdate], objects: Dict[str, Tuple[str, str]]
+    ) -> Dict[str, str]:
+        """Writes the tag objects of the annotated tags in one hash-object run."""
+        if not updates:
+            return {}
+        committer: Optional[str] = None
+        with tempfile.TemporaryDirectory() as temp_dir:
+            paths = []
+            for i, update in enumerate(updates):
+                assert update.target is not None and update.message is not None
+                signature = next_signature()
+                if signature is not None:
+                    tagger = f"{signature.name} <{signature.email}> {signature.date}"
+                else:
+                    if committer is None:
+                        committer = _git(["var", "GIT_COMMITTER_IDENT"], self.verbose)
+                    tagger = committer
+                sha, object_type = objects[update.target]
+                path = os.path.join(temp_dir, f"tag-{i}")
+                with open(path, "w", encoding="utf-8", newline="") as tag_file:
+                    tag_file.write(
+                        f"object {sha}\n"
+                        f"type {object_type}\n"
+                        f"tag {update.ref.removeprefix('refs/tags/')}\n"
+                        f"tagger {tagger}\n"
+                        "\n"
+                        f"{_message(update.message)}"
+                    )
+                paths.append(path)
+            shas = _git(
+                ["hash-object", "-w", "-t", "tag", "--stdin-paths"],
+                self.verbose,
+                input="\n".join(paths) + "\n",
+            ).splitlines()
+        return {update.ref: sha for update, sha in zip(updates, shas)}
+
+
+def _git(
+    args: List[str],
+    verbose: bool,
+    env: Dict[str, str] = {},
+    input: Optional[str] = None,
+) -> str:
+    """Runs a git plumbing command, exiting if it fails like run_command."""
+    result = run(["git", *args], verbose, env=env, input=input)
+    if not result.is_success():
+        exit(1)
+    return result.stdout
+
+
+def _index_modes(
+    paths: List[str], verbose: bool, env: Dict[str, str]
+) -> Dict[str, str]:
+    """Returns the modes of the paths in the index, for those it has."""
+    if not paths:
+        return {}
+    output = _git(
+        ["--literal-pathspecs", "ls-files", "--stage", "-z", "--", *paths],
+        verbose,
+        env,
+    )
+    modes = {}
+    for entry in output.split("\0"):
+        if entry:
+            info, path = entry.split("\t", 1)
+            modes[path] = info.split(" ", 1)[0]
+    return modes
+
+
+def _rev_parse(rev: str, verbose: bool) -> Optional[str]:
+    result = run(
+        ["git", "rev-parse", "--verify", "--quiet", f"{rev}^{{commit}}"], verbose
+    )
+    return result.stdout if result.is_success() else None
+
+
+Identity = Tuple[str, str]
+
+
+@dataclass
+class _Commit:
+    mark: str
+    branch: str
+    message: str
+    parents: List[str]
+    files: Dict[str, Optional[str]]
+    author: Optional[Identity]
+    date: Optional[datetime]
+
+
+@dataclass
+class _Reset:
+    ref: str
+    target: str
+
+
+@dataclass
+class _Tag:
+    name: str
+    target: str
+    message: str
+    tagger: Optional[Identity]
+    date: Optional[datetime]
+
+
+@dataclass
+class _Ident:
+    name: str
+    email: str
+    timestamp: str = field(default="")
+
+
+class HistoryBuilder:
+    """Declares commits, branches, merges and tags and writes them all with a
+    single git fast-import.
+
+    Commits build on the existing branches of the repository. File contents are
+    dedented like create_or_update_file, and None deletes a file. Once built,
+    the head branch is checked out.
+
+        history = HistoryBuilder(verbose)
+        history.commit("main", "Add notes", {"notes.txt": "hello"})
+        history.branch("feature", "main")
+        history.commit("feature", "Update notes", {"notes.txt": "hi"})
+        history.merge("main", "feature", "Merge branch 'feature'")
+        history.build("main")
+    """
+
+    def __init__(self, verbose: bool) -> None:
+        self.verbose = verbose
+        self.__commits: Dict[str, _Commit] = {}
+        self.__commands: List[Union[_Commit, _Reset, _Tag]] = []
+        self.__tips: Dict[str, str] = {}
+        self.__committer_ident: Optional[_Ident] = None
+
+    def tip(self, branch: str) -> str:
+        """Returns the latest commit declared on the branch, or the branch ref."""
+        return self.__tips.get(branch, f"refs/heads/{branch}")
+
+    def commit(
+        self,
+        branch: str,
+        message: str,
+        files: Dict[str, Optional[str]] = {},
+        author: Optional[Identity] = None,
+        date: Optional[Union[str, datetime]] = None,
+    ) -> str:
+        """Declares a commit on the branch, returning its mark.
+
+        An empty files mapping creates an empty commit.
+        """
+        return self.__add_commit(
+            branch, message, [self.tip(branch)], files, author, date
+        )
+
+    def merge(
+        self,
+        branch: str,
+        other: str,
+        message: str,
+        files: Optional[Dict[str, Optional[str]]] = None,
+        author: Optional[Identity] = None,
+        date: Optional[Union[str, datetime]] = None,
+    ) -> str:
+        """Declares a merge commit of other into branch, returning its mark.
+
+        Unless files are given, the merge takes the changes declared on other
+        since it diverged from branch, and raises ValueError if both sides
+        changed the same file differently.
+        """
+        tip = self.tip(branch)
+        other_tip = other if other.startswith(":") else self.tip(other)
+        if files is None:
+            files = self.__merged_changes(tip, other_tip)
+        return self.__add_commit(branch, message, [tip, other_tip], files, author, date)
+
+    def branch(self, name: str, start: str) -> None:
+        """Declares a branch starting at a branch name or commit mark."""
+        target = start if start.startswith(":") else self.tip(start)
+        self.__tips[name] = target
+        self.__commands.append(_Reset(f"refs/heads/{name}", target))
+
+    def tag(
+        self,
+        name: str,
+        target: str,
+        message: Optional[str] = None,
+        tagger: Optional[Identity] = None,
+        date: Optional[Union[str, datetime]] = None,
+    ) -> None:
+        """Declares a tag on a branch name or commit mark.
+
+        The tag is annotated if a message is given, and lightweight otherwise.
+        """
+        commit = target if target.startswith(":") else self.tip(target)
+        if message is None:
+            self.__commands.append(_Reset(f"refs/tags/{name}", commit))
+        else:
+            self.__commands.append(
+                _Tag(name, commit, message, tagger, _parse_date(date))
+            )
+
+    def build(self, head: str) -> None:
+        """Writes the declared history in one fast-import and checks out head.
+
+        Exits if fast-import fails, like the other wrappers.
+        """
+        self.__committer_ident = None
+        existing = set(
+            (
+                run_command(
+                    ["git", "for-each-ref", "--format=%(refname)"], self.verbose
+                )
+                or ""
+            ).splitlines()
+        )
+        stream: List[str] = []
+        for command in self.__commands:
+            if isinstance(command, _Commit):
+                stream.append(self.__render_commit(command, existing))
+            elif isinstance(command, _Reset):
+                stream.append(f"reset {command.ref}\n")
+                source = _source(command.target, existing)
+                if source is not None:
+                    stream.append(f"from {source}\n")
+                stream.append("\n")
+            else:
+                signer = self.__signer()
+                tagger = _ident(command.tagger, command.date, signer)
+                stream.append(
+                    f"tag {command.name}\n"
+                    f"from {_source(command.target, existing)}\n"
+                    f"tagger {tagger}\n"
+                    f"{_data(_message(command.message))}"
+                )
+        stream.append("done\n")
+
+        result = run(
+            ["git", "fast-import", "--quiet", "--done"],
+            self.verbose,
+            input="".join(stream),
+        )
+        if not result.is_success():
+            exit(1)
+        run_command(["git", "checkout", "--force", "--quiet", head], self.verbose)
+
+    def __add_commit(
+        self,
+        branch: str,
+        message: str,
+        parents: List[str],
+        files: Dict[str, Optional[str]],
+        author: Optional[Identity],
+        date: Optional[Union[str, datetime]],
+    ) -> str:
+        mark = f":{len(self.__commits) + 1}"
+        commit = _Commit(
+            mark=mark,
+            branch=branch,
+            message=message,
+            parents=parents,
+            files=dict(files),
+            author=author,
+            date=_parse_date(date),
+        )
+        self.__commits[mark] = commit
+        self.__commands.append(commit)
+        self.__tips[branch] = mark
+        return mark
+
+    def __ancestors(self, start: str) -> Set[str]:
+        """Returns the declared commits reachable from start, including itself."""
+        seen: Set[str] = set()
+        pending = [start]
+        while pending:
+            mark = pending.pop()
+            if mark in seen or mark not in self.__commits:
+                continue
+            seen.add(mark)
+            pending.extend(self.__commits[mark].parents)
+        return seen
+
+    def __merged_changes(self, tip: str, other: str) -> Dict[str, Optional[str]]:
+        ours = self.__ancestors(tip)
+        theirs = self.__ancestors(other)
+        our_changes = self.__changes(ours - theirs)
+        their_changes = self.__changes(theirs - ours)
+        for path, contents in their_changes.items():
+            if path in our_changes and our_changes[path] != contents:
+                raise ValueError(f"Merge conflict on {path}, pass the merged files")
+        return their_changes
+
+    def __changes(self, marks: Set[str]) -> Dict[str, Optional[str]]:
+        changes: Dict[str, Optional[str]] = {}
+        # Marks are numbered in declaration order, so later changes win
+        for mark in sorted(marks, key=lambda m: int(m[1:])):
+            changes.update(self.__commits[mark].files)
+        return changes
+
+    def __committer(self) -> _Ident:
+        ident = run_command(["git", "var", "GIT_COMMITTER_IDENT"], self.verbose)
+        assert ident is not None
+        name_email, timestamp = ident.strip().rsplit(">", 1)
+        name, email = name_email.split("<", 1)
+        return _Ident(name.strip(), email.strip(), timestamp.strip())
+
+    def __signer(self) -> _Ident:
+        """Returns the default identity and date of the next object."""
+        signature = next_signature()
+        if signature is not None:
+            return _Ident(signature.name, signature.email, signature.date)
+        if self.__committer_ident is None:
+            self.__committer_ident = self.__committer()
+        return self.__committer_ident
+
+    def __render_commit(self, commit: _Commit, existing: Set[str]) -> str:
+        signer = self.__signer()
+        lines = [
+            f"commit refs/heads/{commit.branch}\n",
+            f"mark {commit.mark}\n",
+            f"author {_ident(commit.author, commit.date, signer)}\n",
+            f"committer {_ident(None, None, signer)}\n",
+            _data(_message(commit.message)),
+        ]
+        sources = [_source(parent, existing) for parent in commit.parents]
+        if sources and sources[0] is not None:
+            lines.append(f"from {sources[0]}\n")
+        for source in sources[1:]:
+            if source is not None:
+                lines.append(f"merge {source}\n")
+        for path, contents in commit.files.items():
+            if contents is None:
+                lines.append(f"D {_quote(path)}\n")
+            else:
+                lines.append(f"M 100644 inline {_quote(path)}\n")
+                lines.append(_data(textwrap.dedent(contents).lstrip()))
+        lines.append("\n")
+        return "".join(lines)
+
+
+def _parse_date(date: Optional[Union[str, datetime]]) -> Optional[datetime]:
+    """Parses dates like "2024-01-01 08:00", in local time unless given a zone."""
+    if date is None:
+        return None
+    if isinstance(date, str):
+        date = datetime.fromisoformat(date)
+    return date.astimezone()
+
+
+def _ident(
+    identity: Optional[Identity], date: Optional[datetime], default: _Ident
+) -> str:
+    name, email = identity if identity is not None else (default.name, default.email)
+    if date is None:
+        timestamp = default.timestamp
     else:
-        run(["git", "clone", repository_url], verbose)
+        timestamp = f"{int(date.timestamp())} {date.strftime('%z')}"
+    return f"{name} <{email}> {timestamp}"
+
+
+def _source(target: str, existing: Set[str]) -> Optional[str]:
+    """Returns how fast-import refers to the target, or None if it does not exist."""
+    if target.startswith(":"):
+        return target
+    # ^0 makes fast-import read the ref from the repository
+    return f"{target}^0" if target in existing else None
+
+
+def _message(message: str) -> str:
+    # git commit and git tag end messages with a newline
+    return message if message.endswith("\n") else message + "\n"
+
+
+def _data(contents: str) -> str:
+    return f"data {len(contents.encode('utf-8'))}\n{contents}\n"
+
+
+def _quote(path: str) -> str:
+    if path.startswith('"') or "\n" in path:
+        escaped = path.replace("\\", "\\\\").replace('"', '\\"')
+        return '"' + escaped.replace("\n", "\\n") + '"'
+    return path
@@ -0,0 +1,348 @@
+"""Backends behind the wrappers in exercise_utils.git.
+
+SubprocessGitBackend runs the git CLI for every call. GitPythonBackend works on
+the repository in-process through GitPython where it can (staging, commits,
+lightweight tags, branches and remotes) and lets GitPython drive git for the
+rest. Both exit on failure, like run_command.
+
+The backend is picked with GITMASTERY_GIT_BACKEND=subprocess|gitpython, with
+set_git_backend, or for a block of code with use_git_backend.
+"""
+
+import os
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from contextvars import ContextVar
+from sys import exit
+from typing import TYPE_CHECKING, Callable, Dict, Iterator, List, Optional, TypeVar
+
+from exercise_utils.cli import run, run_command
+from exercise_utils.log import Level, log
+from exercise_utils.reproducible import next_signature, signature_env
+
+if TYPE_CHECKING:
+    from git import Repo
+
+GIT_BACKEND_ENV_VAR = "GITMASTERY_GIT_BACKEND"
+
+T = TypeVar("T")
+
+
+class GitBackend(ABC):
+    name: str
+
+    @abstractmethod
+    def tag(self, tag_name: str, verbose: bool) -> None: ...
+
+    @abstractmethod
+    def tag_with_options(
+        self, tag_name: str, options: List[str], verbose: bool
+    ) -> None: ...
+
+    @abstractmethod
+    def add(self, files: List[str], verbose: bool) -> None: ...
+
+    @abstractmethod
+    def commit(self, message: str, allow_empty: bool, verbose: bool) -> None: ...
+
+    @abstractmethod
+    def checkout(self, branch: str, create_branch: bool, verbose: bool) -> None: ...
+
+    @abstractmethod
+    def merge(
+        self, target_branch: str, ff: bool, message: Optional[str], verbose: bool
+    ) -> None: ...
+
+    @abstractmethod
+    def init(self, verbose: bool) -> None: ...
+
+    @abstractmethod
+    def push(self, remote: str, branch: str, verbose: bool) -> None: ...
+
+    @abstractmethod
+    def track_remote_branch(self, remote: str, branch: str, verbose: bool) -> None: ...
+
+    @abstractmethod
+    def remove_remote(self, remote: str, verbose: bool) -> None: ...
+
+    @abstractmethod
+    def add_remote(self, remote: str, remote_url: str, verbose: bool) -> None: ...
+
+    @abstractmethod
+    def clone(
+        self,
+        repository_url: str,
+        name: Optional[str],
+        options: List[str],
+        verbose: bool,
+    ) -> None:
+        """Clones the repository with the given git clone options.
+
+        Unlike the other operations, does not exit.
+        """
+
+
+class SubprocessGitBackend(GitBackend):
+    name = "subprocess"
+
+    def tag(self, tag_name: str, verbose: bool) -> None:
+        run_command(["git", "tag", tag_name], verbose)
+
+    def tag_with_options(
+        self, tag_name: str, options: List[str], verbose: bool
+    ) -> None:
+        run_command(["git", "tag", tag_name, *options], verbose, _tag_env(options))
+
+    def add(self, files: List[str], verbose: bool) -> None:
+        run_command(["git", "add", *files], verbose)
+
+    def commit(self, message: str, allow_empty: bool, verbose: bool) -> None:
+        command = ["git", "commit", "-m", message]
+        if allow_empty:
+            command.append("--allow-empty")
+        run_command(command, verbose, signature_env())
+
+    def checkout(self, branch: str, create_branch: bool, verbose: bool) -> None:
+        if create_branch:
+            run_command(["git", "checkout", "-b", branch], verbose)
+        else:
+            run_command(["git", "checkout", branch], verbose)
+
+    def merge(
+        self, target_branch: str, ff: bool, message: Optional[str], verbose: bool
+    ) -> None:
+        command = ["git", "merge", target_branch]
+        # --no-edit avoids requiring the student to enter the commit message
+        command.extend(["--no-edit"] if message is None else ["-m", message])
+        if not ff:
+            command.append("--no-ff")
+        run_command(command, verbose, signature_env())
+
+    def init(self, verbose: bool) -> None:
+        run_command(["git", "init", "--initial-branch=main"], verbose)
+
+    def push(self, remote: str, branch: str, verbose: bool) -> None:
+        run_command(["git", "push", remote, branch], verbose)
+
+    def track_remote_branch(self, remote: str, branch: str, verbose: bool) -> None:
+        run_command(["git", "branch", branch, f"{remote}/{branch}"], verbose)
+
+    def remove_remote(self, remote: str, verbose: bool) -> None:
+        run_command(["git", "remote", "rm", remote], verbose)
+
+    def add_remote(self, remote: str, remote_url: str, verbose: bool) -> None:
+        run_command(["git", "remote", "add", remote, remote_url], verbose)
+
+    def clone(
+        self,
+        repository_url: str,
+        name: Optional[str],
+        options: List[str],
+        verbose: bool,
+    ) -> None:
+        if name is not None:
+            run(["git", "clone", *options, repository_url, name], verbose)
+        else:
+            run(["git", "clone", *options, repository_url], verbose)
+
+
+class GitPythonBackend(GitBackend):
+    name = "gitpython"
+
+    def __init__(self) -> None:
+        self.__repos: Dict[str, "Repo"] = {}
+
+    def tag(self, tag_name: str, verbose: bool) -> None:
+        self.__attempt(lambda: self.__repo().create_tag(tag_name), verbose)
+
+    def tag_with_options(
+        self, tag_name: str, options: List[str], verbose: bool
+    ) -> None:
+        env = _tag_env(options)
+        self.__attempt(
+            lambda: self.__repo().git.tag(tag_name, *options, env=env), verbose
+        )
+
+    def add(self, files: List[str], verbose: bool) -> None:
+        def add_files() -> None:
+            repo = self.__repo()
+            # GitPython resolves paths against the repository root rather than
+            # the current directory like git add
+            paths = [os.path.abspath(f) for f in files]
+            # The in-process index only handles plain files; let git expand
+            # directories, globs and removals
+            if all(os.path.isfile(f) and not os.path.islink(f) for f in files):
+                repo.index.add(paths)
+            else:
+                repo.git.add(*paths)
+
+        self.__attempt(add_files, verbose)
+
+    def commit(self, message: str, allow_empty: bool, verbose: bool) -> None:
+        from git import Actor
+
+        def create_commit() -> None:
+            repo = self.__repo()
+            index = repo.index
+            if not allow_empty:
+                # Like git commit, refuse a commit that changes nothing, including
+                # an empty first commit
+                if repo.head.is_valid():
+                    unchanged = (
+                        index.write_tree().binsha == repo.head.commit.tree.binsha
+                    )
+                else:
+                    unchanged = not index.entries
+                if unchanged:
+                    raise ValueError("nothing to commit, working tree clean")
+            # Without a signature, GitPython falls back to the config and now
+            signature = next_signature()
+            actor = Actor(signature.name, signature.email) if signature else None
+            date = signature.date if signature else None
+            # git commit -m ends the message with a newline
+            index.commit(
+                message if message.endswith("\n") else message + "\n",
+                author=actor,
+                committer=actor,
+                author_date=date,
+                commit_date=date,
+            )
+
+        self.__attempt(create_commit, verbose)
+
+    def checkout(self, branch: str, create_branch: bool, verbose: bool) -> None:
+        if create_branch:
+            self.__attempt(lambda: self.__repo().git.checkout("-b", branch), verbose)
+        else:
+            self.__attempt(lambda: self.__repo().git.checkout(branch), verbose)
+
+    def merge(
+        self, target_branch: str, ff: bool, message: Optional[str], verbose: bool
+    ) -> None:
+        args = [target_branch]
+        args.extend(["--no-edit"] if message is None else ["-m", message])
+        if not ff:
+            args.append("--no-ff")
+        env = signature_env()
+        self.__attempt(lambda: self.__repo().git.merge(*args, env=env), verbose)
+
+    def init(self, verbose: bool) -> None:
+        from git import Repo
+
+        def init_repo() -> None:
+            cwd = os.getcwd()
+            self.__repos[cwd] = Repo.init(cwd, initial_branch="main")
+
+        self.__attempt(init_repo, verbose)
+
+    def push(self, remote: str, branch: str, verbose: bool) -> None:
+        self.__attempt(lambda: self.__repo().git.push(remote, branch), verbose)
+
+    def track_remote_branch(self, remote: str, branch: str, verbose: bool) -> None:
+        self.__attempt(
+            lambda: self.__repo().create_head(branch, f"{remote}/{branch}"), verbose
+        )
+
+    def remove_remote(self, remote: str, verbose: bool) -> None:
+        self.__attempt(lambda: self.__repo().delete_remote(remote), verbose)
+
+    def add_remote(self, remote: str, remote_url: str, verbose: bool) -> None:
+        self.__attempt(lambda: self.__repo().create_remote(remote, remote_url), verbose)
+
+    def clone(
+        self,
+        repository_url: str,
+        name: Optional[str],
+        options: List[str],
+        verbose: bool,
+    ) -> None:
+        from git import Repo
+
+        path = name
+        if path is None:
+            path = repository_url.rstrip("/").rsplit("/", 1)[-1].removesuffix(".git")
+        try:
+            Repo.clone_from(repository_url, path, multi_options=options)
+        except Exception as e:
+            log(Level.WARNING if verbose else Level.DEBUG, f"\t{e}")
+
+    def __repo(self) -> "Repo":
+        from git import Repo
+
+        cwd = os.getcwd()
+        if cwd not in self.__repos:
+            self.__repos[cwd] = Repo(cwd, search_parent_directories=True)
+        return self.__repos[cwd]
+
+    def __attempt(self, operation: Callable[[], T], verbose: bool) -> T:
+        try:
+            return operation()
+        except Exception as e:
+            log(Level.WARNING if verbose else Level.DEBUG, str(e))
+            exit(1)
+
+
+# Options making git tag create a tag object rather than a lightweight tag
+TAG_OBJECT_OPTIONS = ("-a", "--annotate", "-s", "--sign", "-u", "--local-user")
+TAG_MESSAGE_OPTIONS = ("-m", "--message", "-F", "--file")
+
+
+def _tag_env(options: List[str]) -> Dict[str, str]:
+    """Returns the environment for git tag, signing tag objects by the committer.
+
+    Lightweight tags take no signature, so the reproducible sequence is the same
+    as when the tags are created by a RefTransaction.
+    """
+    creates_object = any(
+        option in TAG_OBJECT_OPTIONS or option.split("=", 1)[0] in TAG_MESSAGE_OPTIONS
+        for option in options
+    )
+    return signature_env() if creates_object else {}
+
+
+BACKENDS: Dict[str, Callable[[], GitBackend]] = {
+    SubprocessGitBackend.name: SubprocessGitBackend,
+    GitPythonBackend.name: GitPythonBackend,
+}
+
+_default_backend: Optional[GitBackend] = None
+_active_backend: ContextVar[Optional[GitBackend]] = ContextVar(
+    "active_git_backend", default=None
+)
+
+
+def create_git_backend(name: str) -> GitBackend:
+    if name not in BACKENDS:
+        raise ValueError(
+            f"Unknown git backend {name}, expected one of {list(BACKENDS)}"
+        )
+    return BACKENDS[name]()
+
+
+def get_git_backend() -> GitBackend:
+    """Returns the backend for the current call site."""
+    global _default_backend
+    backend = _active_backend.get()
+    if backend is not None:
+        return backend
+    if _default_backend is None:
+        _default_backend = create_git_backend(
+            os.environ.get(GIT_BACKEND_ENV_VAR, SubprocessGitBackend.name)
+        )
+    return _default_backend
+
+
+def set_git_backend(name: str) -> None:
+    """Sets the backend used outside of use_git_backend blocks."""
+    global _default_backend
+    _default_backend = create_git_backend(name)
+
+
+@contextmanager
+def use_git_backend(name: str) -> Iterator[GitBackend]:
+    """Uses the given backend for the wrappers called within the context."""
+    token = _active_backend.set(create_git_backend(name))
+    try:
+        yield get_git_backend()
+    finally:
+        _active_backend.reset(token)
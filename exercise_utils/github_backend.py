@@ -0,0 +1,712 @@
+"""Backends behind the wrappers in exercise_utils.github_cli.
+
+GhGithubBackend runs the gh CLI for every call. HttpGithubBackend sends the
+requests itself over a pool of keep-alive connections, authenticated with the
+token gh is logged in with, which saves starting a gh process per call. It
+needs requests and talks to GITMASTERY_GITHUB_API_URL, https://api.github.com
+by default.
+
+Both answer repository lookups with the same GraphQL and REST queries, and
+share the caches of usernames and repository states. HttpGithubBackend also
+revalidates its GET responses against the on-disk cache of
+exercise_utils.http_cache, and then resolves repository states over REST, as
+GraphQL queries cannot be revalidated. Both wait on the rate limit
+tracker of exercise_utils.github_scheduler before every request, and retry
+throttled requests. The backend is picked with
+GITMASTERY_GITHUB_BACKEND=gh|http, with set_github_backend, or for a block of
+code with use_github_backend.
+"""
+
+import json
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
+
+from exercise_utils.cli import DEFAULT_MAX_CONCURRENCY, CommandResult, run
+from exercise_utils.github_scheduler import (
+    MAX_RETRIES,
+    get_rate_limit_tracker,
+    is_rate_limit_message,
+    retry_delay,
+)
+from exercise_utils.http_cache import CachedResponse, get_http_cache
+from exercise_utils.identity_cache import (
+    forget_token_fingerprint,
+    get_identity_cache,
+    gh_auth_token,
+    token_fingerprint,
+)
+from exercise_utils.log import Level, log
+
+if TYPE_CHECKING:
+    import requests
+
+GITHUB_BACKEND_ENV_VAR = "GITMASTERY_GITHUB_BACKEND"
+GITHUB_API_URL_ENV_VAR = "GITMASTERY_GITHUB_API_URL"
+DEFAULT_GITHUB_API_URL = "https://api.github.com"
+# Seconds to wait for Github to answer a request
+HTTP_TIMEOUT = 30
+# Names downloads give forks: the app's, the hands-on's, and Github's default
+FORK_NAME_TEMPLATES = ("{username}-gitmastery-{name}", "gitmastery-{name}", "{name}")
+
+
+@dataclass(frozen=True)
+class RepoState:
+    """What Github knows about a repository and the user's fork of it."""
+
+    owner: str
+    name: str
+    username: str
+    viewer: str
+    exists: bool
+    is_fork: bool
+    parent: Optional[str]
+    fork_name: Optional[str]
+
+
+REPO_STATE_QUERY = """
+query($owner: String!, $name: String!) {
+  viewer { login }
+  repository(owner: $owner, name: $name) {
+    isFork
+    parent { nameWithOwner }
+    forks(first: 1, affiliations: [OWNER]) { nodes { name owner { login } } }
+  }
+}
+"""
+
+USER_FORKS_QUERY = """
+query($username: String!, $endCursor: String) {
+  user(login: $username) {
+    repositories(
+      isFork: true, ownerAffiliations: [OWNER], first: 100, after: $endCursor
+    ) {
+      nodes { name parent { nameWithOwner } }
+      pageInfo { hasNextPage endCursor }
+    }
+  }
+}
+"""
+
+_viewer: Optional[str] = None
+_repo_states: Dict[Tuple[str, str, str], RepoState] = {}
+
+
+class GithubBackend(ABC):
+    name: str
+
+    @abstractmethod
+    def fork_repo(
+        self,
+        repository_name: str,
+        fork_name: str,
+        verbose: bool,
+        default_branch_only: bool,
+    ) -> None: ...
+
+    @abstractmethod
+    def create_repo(
+        self, repository_name: str, verbose: bool, private: bool = False
+    ) -> None: ...
+
+    @abstractmethod
+    def delete_repo(self, repository_name: str, verbose: bool) -> None: ...
+
+    @abstractmethod
+    def sync_fork(self, repository_name: str, verbose: bool) -> None:
+        """Resets the default branch of a fork to its parent's."""
+
+    @abstractmethod
+    def api(self, path: str, verbose: bool, paginate: bool = False) -> Optional[Any]:
+        """Returns the pages of a REST GET request, or None if it failed.
+
+        Without paginate, the only page is returned as is.
+        """
+
+    @abstractmethod
+    def graphql(
+        self,
+        query: str,
+        variables: Dict[str, str],
+        verbose: bool,
+        paginate: bool = False,
+    ) -> List[Dict[str, Any]]:
+        """Returns the pages of a GraphQL query, including those reporting errors.
+
+        Pages are requested for as long as the pageInfo of the query has a next
+        page, passing its endCursor.
+        """
+
+    def get_github_username(self, verbose: bool) -> str:
+        """Returns the currently authenticated Github user's username.
+
+        The username is remembered for the process and kept in the identity
+        cache, so it is looked up on Github at most once per token until the
+        cache expires.
+        """
+        global _viewer
+        if _viewer is None:
+            cache = get_identity_cache()
+            fingerprint = token_fingerprint()
+            login = cache.get(fingerprint) if fingerprint is not None else None
+            if login is None:
+                user = self.api("user", verbose)
+                if user is None:
+                    return ""
+                login = user.get("login") or ""
+                if fingerprint is not None and login:
+                    cache.put(fingerprint, login)
+            _viewer = login
+        return _viewer
+
+    def get_repo(self, repository_name: str, verbose: bool) -> Optional[Dict[str, Any]]:
+        """Returns Github's REST representation of a repository, if it exists."""
+        return self.api(f"repos/{repository_name}", verbose)
+
+    def list_user_repos(self, verbose: bool) -> Optional[List[Dict[str, Any]]]:
+        """Returns every repository the authenticated user owns, or None on failure."""
+        pages = self.api(
+            "user/repos?affiliation=owner&per_page=100", verbose, paginate=True
+        )
+        if pages is None:
+            return None
+        return [repository for page in pages for repository in page]
+
+    def has_repo(self, repo_name: str, is_fork: bool, verbose: bool) -> bool:
+        username = self.get_github_username(verbose)
+        owner, _, name = repo_name.rpartition("/")
+        state = self.fetch_repo_state(owner or username, name, username, verbose)
+        return state.exists and (not is_fork or state.is_fork)
+
+    def has_fork(
+        self, repository_name: str, owner_name: str, username: str, verbose: bool
+    ) -> bool:
+        state = self.fetch_repo_state(owner_name, repository_name, username, verbose)
+        return state.fork_name is not None
+
+    def get_fork_name(
+        self, repository_name: str, owner_name: str, username: str, verbose: bool
+    ) -> str:
+        state = self.fetch_repo_state(owner_name, repository_name, username, verbose)
+        return state.fork_name or ""
+
+    def fetch_repo_state(
+        self, owner: str, name: str, username: str, verbose: bool
+    ) -> RepoState:
+        """Returns the state of owner/name and username's fork of it.
+
+        Results are cached until the next repository is forked, created or
+        deleted.
+        """
+        key = (owner, name, username)
+        if key in _repo_states:
+            return _repo_states[key]
+        state = self._resolve_repo_state(owner, name, username, verbose)
+        # Without a viewer, the lookup failed altogether and is worth retrying
+        if state.viewer:
+            _repo_states[key] = state
+        return state
+
+    def _resolve_repo_state(
+        self, owner: str, name: str, username: str, verbose: bool
+    ) -> RepoState:
+        """Looks up the state of owner/name and username's fork of it on Github.
+
+        Resolved with a single GraphQL query, unless username is not the
+        authenticated user, in which case their fork is looked up with
+        find_fork.
+        """
+        global _viewer
+        pages = self.graphql(REPO_STATE_QUERY, {"owner": owner, "name": name}, verbose)
+        # Missing repositories are reported as errors next to the rest of the data
+        data = (pages[0].get("data") if pages else None) or {}
+        viewer = (data.get("viewer") or {}).get("login") or ""
+        if viewer:
+            _viewer = viewer
+        repository = data.get("repository")
+        parent = repository.get("parent") if repository is not None else None
+
+        fork_name = None
+        if repository is not None:
+            if username == viewer:
+                fork_name = next(
+                    (fork["name"] for fork in repository["forks"]["nodes"]), None
+                )
+            else:
+                fork_name = self.find_fork(owner, name, username, verbose)
+
+        return RepoState(
+            owner=owner,
+            name=name,
+            username=username,
+            viewer=viewer,
+            exists=repository is not None,
+            is_fork=repository is not None and repository["isFork"],
+            parent=parent["nameWithOwner"] if parent is not None else None,
+            fork_name=fork_name,
+        )
+
+    def find_fork(
+        self, owner: str, name: str, username: str, verbose: bool
+    ) -> Optional[str]:
+        """Returns the name of username's fork of owner/name, if any.
+
+        The names downloads give forks are checked first, with one request each.
+        Otherwise the user's forks are searched for one with owner/name as
+        parent, which rarely takes more than one page. Every fork of owner/name,
+        possibly thousands, is only listed if those lookups fail.
+        """
+        upstream = f"{owner}/{name}"
+        for fork_name in _fork_names(name, username):
+            repository = self.api(f"repos/{username}/{fork_name}", verbose)
+            if (
+                repository is not None
+                and (repository.get("parent") or {}).get("full_name") == upstream
+            ):
+                return repository["name"]
+
+        pages = self.graphql(
+            USER_FORKS_QUERY, {"username": username}, verbose, paginate=True
+        )
+        if pages and all(page.get("data") for page in pages):
+            for page in pages:
+                repositories = (page["data"]["user"] or {}).get("repositories") or {}
+                for fork in repositories.get("nodes", []):
+                    if (fork.get("parent") or {}).get("nameWithOwner") == upstream:
+                        return fork["name"]
+            return None
+
+        return self.find_fork_by_listing(owner, name, username, verbose)
+
+    def find_fork_by_listing(
+        self, owner: str, name: str, username: str, verbose: bool
+    ) -> Optional[str]:
+        """Returns the name of username's fork of owner/name by listing every fork."""
+        pages = self.api(
+            f"repos/{owner}/{name}/forks?per_page=100", verbose, paginate=True
+        )
+        for page in pages or []:
+            for fork in page:
+                if fork["owner"]["login"] == username:
+                    return fork["name"]
+        return None
+
+
+class GhGithubBackend(GithubBackend):
+    name = "gh"
+
+    def fork_repo(
+        self,
+        repository_name: str,
+        fork_name: str,
+        verbose: bool,
+        default_branch_only: bool,
+    ) -> None:
+        command = ["gh", "repo", "fork", repository_name]
+        if default_branch_only:
+            command.append("--default-branch-only")
+        command.extend(["--fork-name", fork_name])
+
+        self.__run(command, verbose)
+        clear_repo_state_cache()
+
+    def create_repo(
+        self, repository_name: str, verbose: bool, private: bool = False
+    ) -> None:
+        visibility = "--private" if private else "--public"
+        self.__run(["gh", "repo", "create", repository_name, visibility], verbose)
+        clear_repo_state_cache()
+
+    def delete_repo(self, repository_name: str, verbose: bool) -> None:
+        self.__run(["gh", "repo", "delete", repository_name, "--yes"], verbose)
+        clear_repo_state_cache()
+
+    def sync_fork(self, repository_name: str, verbose: bool) -> None:
+        self.__run(["gh", "repo", "sync", repository_name, "--force"], verbose)
+
+    def api(self, path: str, verbose: bool, paginate: bool = False) -> Optional[Any]:
+        command = ["gh", "api", "--paginate", path] if paginate else ["gh", "api", path]
+        result = self.__run(command, verbose)
+        if not result.is_success():
+            return None
+        pages = list(_json_documents(result.stdout))
+        return pages if paginate else pages[0]
+
+    def graphql(
+        self,
+        query: str,
+        variables: Dict[str, str],
+        verbose: bool,
+        paginate: bool = False,
+    ) -> List[Dict[str, Any]]:
+        command = ["gh", "api", "graphql"]
+        if paginate:
+            command.append("--paginate")
+        command.extend(["-f", f"query={query}"])
+        for key, value in variables.items():
+            command.extend(["-f", f"{key}={value}"])
+        # gh fails on errors, but still prints the data that could be resolved
+        result = self.__run(command, verbose)
+        try:
+            return list(_json_documents(result.stdout))
+        except json.JSONDecodeError:
+            return []
+
+    def __run(self, command: List[str], verbose: bool) -> CommandResult:
+        """Runs a gh command, retrying it while Github throttles it."""
+        tracker = get_rate_limit_tracker()
+        for attempt in range(MAX_RETRIES):
+            tracker.wait()
+            result = run(command, verbose)
+            if result.is_success() or not is_rate_limit_message(result.result.stderr):
+                return result
+            tracker.throttle()
+            time.sleep(retry_delay(attempt))
+        tracker.wait()
+        return run(command, verbose)
+
+
+class HttpGithubBackend(GithubBackend):
+    name = "http"
+
+    def __init__(self, api_url: Optional[str] = None) -> None:
+        self.api_url = (
+            api_url or os.environ.get(GITHUB_API_URL_ENV_VAR, DEFAULT_GITHUB_API_URL)
+        ).rstrip("/")
+        self.__session: Optional["requests.Session"] = None
+        self.__lock = threading.Lock()
+
+    def fork_repo(
+        self,
+        repository_name: str,
+        fork_name: str,
+        verbose: bool,
+        default_branch_only: bool,
+    ) -> None:
+        self.__request(
+            "POST",
+            f"repos/{repository_name}/forks",
+            verbose,
+            {"name": fork_name, "default_branch_only": default_branch_only},
+        )
+        clear_repo_state_cache()
+
+    def create_repo(
+        self, repository_name: str, verbose: bool, private: bool = False
+    ) -> None:
+        owner, _, name = repository_name.rpartition("/")
+        # Like gh, repositories of other owners are created in their organisation
+        path = "user/repos"
+        if owner and owner != self.get_github_username(verbose):
+            path = f"orgs/{owner}/repos"
+        self.__request("POST", path, verbose, {"name": name, "private": private})
+        clear_repo_state_cache()
+
+    def delete_repo(self, repository_name: str, verbose: bool) -> None:
+        if "/" not in repository_name:
+            username = self.get_github_username(verbose)
+            repository_name = f"{username}/{repository_name}"
+        self.__request("DELETE", f"repos/{repository_name}", verbose)
+        clear_repo_state_cache()
+
+    def sync_fork(self, repository_name: str, verbose: bool) -> None:
+        # Like gh repo sync --force, points the branch at the parent's commit
+        repository = self.get_repo(repository_name, verbose)
+        if repository is None or repository.get("parent") is None:
+            return
+        branch = repository["default_branch"]
+        parent_branch = self.api(
+            f"repos/{repository['parent']['full_name']}/git/ref/heads/{branch}",
+            verbose,
+        )
+        if parent_branch is None:
+            return
+        self.__request(
+            "PATCH",
+            f"repos/{repository['full_name']}/git/refs/heads/{branch}",
+            verbose,
+            {"sha": parent_branch["object"]["sha"], "force": True},
+        )
+
+    def api(self, path: str, verbose: bool, paginate: bool = False) -> Optional[Any]:
+        response = self.__request("GET", path, verbose)
+        if response is None:
+            return None
+        if not paginate:
+            return response.json()
+        pages = [response.json()]
+        while "next" in response.links:
+            response = self.__request("GET", response.links["next"]["url"], verbose)
+            if response is None:
+                return None
+            pages.append(response.json())
+        return pages
+
+    def graphql(
+        self,
+        query: str,
+        variables: Dict[str, str],
+        verbose: bool,
+        paginate: bool = False,
+    ) -> List[Dict[str, Any]]:
+        pages: List[Dict[str, Any]] = []
+        variables = dict(variables)
+        while True:
+            response = self.__request(
+                "POST",
+                "graphql",
+                verbose,
+                {"query": query, "variables": variables},
+                accept_errors=True,
+            )
+            if response is None:
+                return pages
+            pages.append(response.json())
+            page_info = _page_info(pages[-1])
+            if not paginate or page_info is None or not page_info["hasNextPage"]:
+                return pages
+            variables["endCursor"] = page_info["endCursor"]
+
+    def _resolve_repo_state(
+        self, owner: str, name: str, username: str, verbose: bool
+    ) -> RepoState:
+        """Looks up the state of owner/name and username's fork of it on Github.
+
+        With the HTTP cache, the repository and the fork are looked up with GET
+        requests, which are answered 304 while they are unchanged.
+        """
+        if get_http_cache() is None:
+            return super()._resolve_repo_state(owner, name, username, verbose)
+        viewer = self.get_github_username(verbose)
+        repository = self.get_repo(f"{owner}/{name}", verbose)
+        parent = repository.get("parent") if repository is not None else None
+        return RepoState(
+            owner=owner,
+            name=name,
+            username=username,
+            viewer=viewer,
+            exists=repository is not None,
+            is_fork=repository is not None and repository["fork"],
+            parent=parent["full_name"] if parent is not None else None,
+            fork_name=self.find_fork(owner, name, username, verbose)
+            if repository is not None
+            else None,
+        )
+
+    def __request(
+        self,
+        method: str,
+        path: str,
+        verbose: bool,
+        body: Optional[Dict[str, Any]] = None,
+        accept_errors: bool = False,
+    ) -> Optional["requests.Response"]:
+        """Sends a request, returning the response unless it failed.
+
+        With accept_errors, error responses with a JSON body are returned too.
+        GET requests are made conditional on the cached response, which is
+        returned if Github answers 304.
+        """
+        import requests
+
+        url = path if "://" in path else f"{self.api_url}/{path}"
+        cache = get_http_cache() if method == "GET" else None
+        fingerprint = token_fingerprint() if cache is not None else None
+        cached = cache.get(url, fingerprint) if cache is not None else None
+        headers = cached.conditional_headers() if cached is not None else {}
+        tracker = get_rate_limit_tracker()
+        for attempt in range(MAX_RETRIES + 1):
+            tracker.wait()
+            try:
+                response = self.__get_session().request(
+                    method, url, json=body, headers=headers, timeout=HTTP_TIMEOUT
+                )
+            except requests.RequestException as e:
+                log(Level.WARNING if verbose else Level.DEBUG, f"\t{method} {url}: {e}")
+                if attempt == MAX_RETRIES:
+                    return None
+                time.sleep(retry_delay(attempt))
+                continue
+
+            minimum = tracker.observe(
+                response.status_code, response.headers, _message(response)
+            )
+            retry = minimum is not None or response.status_code >= 500
+            if not retry or attempt == MAX_RETRIES:
+                break
+            log(Level.DEBUG, f"\t{method} {url}: {response.status_code}, retrying")
+            time.sleep(retry_delay(attempt, minimum or 0.0))
+
+        failed = not response.ok
+        level = Level.INFO if verbose else Level.DEBUG
+        if failed and verbose:
+            level = Level.WARNING
+        log(level, f"\t{method} {url}: {response.status_code}")
+        if failed and not (accept_errors and _is_json(response)):
+            return None
+        if cache is not None:
+            cache.record(hit=cached is not None and response.status_code == 304)
+            if cached is not None and response.status_code == 304:
+                return _cached_response(cached)
+            cache.put(url, fingerprint, response.text, response.headers)
+        return response
+
+    def __get_session(self) -> "requests.Session":
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        with self.__lock:
+            if self.__session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_maxsize=DEFAULT_MAX_CONCURRENCY)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                session.headers["Accept"] = "application/vnd.github+json"
+                token = gh_auth_token()
+                if token is not None:
+                    session.headers["Authorization"] = f"token {token}"
+                self.__session = session
+            return self.__session
+
+
+def _is_json(response: "requests.Response") -> bool:
+    return response.headers.get("Content-Type", "").startswith("application/json")
+
+
+def _cached_response(cached: CachedResponse) -> "requests.Response":
+    """Returns a cached response as if Github had sent it again."""
+    import requests
+    from requests.structures import CaseInsensitiveDict
+
+    response = requests.Response()
+    response.status_code = 200
+    response.url = cached.url
+    response.headers = CaseInsensitiveDict(cached.headers)
+    response.encoding = "utf-8"
+    response._content = cached.body.encode("utf-8")
+    return response
+
+
+def _message(response: "requests.Response") -> str:
+    """Returns the message of an error response."""
+    if response.ok or not _is_json(response):
+        return ""
+    try:
+        return str(response.json().get("message") or "")
+    except (ValueError, AttributeError):
+        return ""
+
+
+def _page_info(node: Any) -> Optional[Dict[str, Any]]:
+    """Returns the first pageInfo found in a GraphQL response."""
+    if isinstance(node, dict):
+        if "pageInfo" in node:
+            return node["pageInfo"]
+        for value in node.values():
+            page_info = _page_info(value)
+            if page_info is not None:
+                return page_info
+    return None
+
+
+def _fork_names(name: str, username: str) -> List[str]:
+    """Returns the names username's fork of name likely has, most likely first."""
+    return [
+        template.format(username=username, name=name)
+        for template in FORK_NAME_TEMPLATES
+    ]
+
+
+def _json_documents(output: str) -> Iterator[Any]:
+    """Yields the JSON documents gh api --paginate prints one after another."""
+    decoder = json.JSONDecoder()
+    position = 0
+    while position < len(output):
+        document, position = decoder.raw_decode(output, position)
+        yield document
+        while position < len(output) and output[position].isspace():
+            position += 1
+
+
+def clear_repo_state_cache() -> None:
+    """Forgets the fetched repository states, e.g. after changing repositories."""
+    _repo_states.clear()
+
+
+def invalidate_github_username() -> None:
+    """Forgets the cached usernames, e.g. after logging in as another user."""
+    global _viewer
+    _viewer = None
+    forget_token_fingerprint()
+    get_identity_cache().invalidate()
+
+
+def set_github_username(username: Optional[str]) -> None:
+    """Sets the username remembered for the process, without the identity cache.
+
+    None makes the next get_github_username look it up again.
+    """
+    global _viewer
+    _viewer = username
+
+
+BACKENDS: Dict[str, Callable[[], GithubBackend]] = {
+    GhGithubBackend.name: GhGithubBackend,
+    HttpGithubBackend.name: HttpGithubBackend,
+}
+
+_default_backend: Optional[GithubBackend] = None
+_active_backend: ContextVar[Optional[GithubBackend]] = ContextVar(
+    "active_github_backend", default=None
+)
+
+
+def create_github_backend(name: str) -> GithubBackend:
+    if name not in BACKENDS:
+        raise ValueError(
+            f"Unknown Github backend {name}, expected one of {list(BACKENDS)}"
+        )
+    return BACKENDS[name]()
+
+
+def get_github_backend() -> GithubBackend:
+    """Returns the backend for the current call site."""
+    global _default_backend
+    backend = _active_backend.get()
+    if backend is not None:
+        return backend
+    if _default_backend is None:
+        _default_backend = create_github_backend(
+            os.environ.get(GITHUB_BACKEND_ENV_VAR, GhGithubBackend.name)
+        )
+    return _default_backend
+
+
+def set_github_backend(name: str) -> None:
+    """Sets the backend used outside of use_github_backend blocks."""
+    global _default_backend
+    _default_backend = create_github_backend(name)
+
+
+@contextmanager
+def use_github_backend(name: str) -> Iterator[GithubBackend]:
+    """Uses the given backend for the wrappers called within the context."""
+    token = _active_backend.set(create_github_backend(name))
+    try:
+        yield get_github_backend()
+    finally:
+        _active_backend.reset(token)
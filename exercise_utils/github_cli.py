@@ -1,9 +1,12 @@
 """Wrapper for Github CLI commands."""
 # TODO: The following should be built using the builder pattern
 
-from typing import Optional
+from typing import Any, Dict, List, Optional
 
+from exercise_utils import github_backend
 from exercise_utils.cli import run
+from exercise_utils.clone import FULL, CloneProfile, clone_options, github_url
+from exercise_utils.github_backend import RepoState, get_github_backend
 
 
 def fork_repo(
@@ -16,94 +19,118 @@ def fork_repo(
     Creates a fork of a repository.
     Forks only the default branch, unless specified otherwise.
     """
-    command = ["gh", "repo", "fork", repository_name]
-    if default_branch_only:
-        command.append("--default-branch-only")
-    command.extend(["--fork-name", fork_name])
-
-    run(command, verbose)
+    get_github_backend().fork_repo(
+        repository_name, fork_name, verbose, default_branch_only
+    )
 
 
 def clone_repo_with_gh(
-    repository_name: str, verbose: bool, name: Optional[str] = None
+    repository_name: str,
+    verbose: bool,
+    name: Optional[str] = None,
+    profile: CloneProfile = FULL,
+    reference_repository: Optional[str] = None,
 ) -> None:
-    """Creates a clone of a repository using Github CLI."""
+    """Creates a clone of a repository using Github CLI.
+
+    The profile selects a partial, shallow or reference clone. Reference clones
+    borrow from the cache of reference_repository, e.g. the upstream of a fork,
+    and default to the cloned repository.
+    """
+    command = ["gh", "repo", "clone", repository_name]
     if name is not None:
-        run(["gh", "repo", "clone", repository_name, name], verbose)
-    else:
-        run(["gh", "repo", "clone", repository_name], verbose)
+        command.append(name)
+    options = clone_options(
+        profile, github_url(reference_repository or repository_name), verbose
+    )
+    if options:
+        command.extend(["--", *options])
+    run(command, verbose)
 
 
 def delete_repo(repository_name: str, verbose: bool) -> None:
     """Deletes a repository."""
-    run(["gh", "repo", "delete", repository_name, "--yes"], verbose)
+    get_github_backend().delete_repo(repository_name, verbose)
 
 
-def create_repo(repository_name: str, verbose: bool) -> None:
-    """Creates a Github repository on the current user's account."""
-    run(["gh", "repo", "create", repository_name, "--public"], verbose)
+def create_repo(repository_name: str, verbose: bool, private: bool = False) -> None:
+    """Creates a Github repository on the current user's account.
+
+    The repository is public unless private is set.
+    """
+    get_github_backend().create_repo(repository_name, verbose, private)
+
+
+def sync_fork(repository_name: str, verbose: bool) -> None:
+    """Resets the default branch of a fork to its parent's, discarding its commits."""
+    get_github_backend().sync_fork(repository_name, verbose)
+
+
+def list_user_repos(verbose: bool) -> Optional[List[Dict[str, Any]]]:
+    """Returns every repository the current user owns, or None if listing failed."""
+    return get_github_backend().list_user_repos(verbose)
 
 
 def get_github_username(verbose: bool) -> str:
-    """Returns the currently authenticated Github user's username."""
-    result = run(["gh", "api", "user", "-q", ".login"], verbose)
+    """Returns the currently authenticated Github user's username.
+
+    The username is remembered for the process and kept in the identity cache,
+    so it is looked up on Github at most once per token until the cache expires.
+    """
+    return get_github_backend().get_github_username(verbose)
 
-    if result.is_success():
-        username = result.stdout.splitlines()[0]
-        return username
-    return ""
+
+def invalidate_github_username() -> None:
+    """Forgets the cached usernames, e.g. after logging in as another user."""
+    github_backend.invalidate_github_username()
+
+
+def get_repo(repository_name: str, verbose: bool) -> Optional[Dict[str, Any]]:
+    """Returns Github's REST representation of a repository, if it exists."""
+    return get_github_backend().get_repo(repository_name, verbose)
 
 
 def has_repo(repo_name: str, is_fork: bool, verbose: bool) -> bool:
     """Returns if the given repository exists under the current user's repositories."""
-    command = ["gh", "repo", "view", repo_name]
-    if is_fork:
-        command.extend(["--json", "isFork", "--jq", ".isFork"])
-    result = run(
-        command,
-        verbose,
-        env={"GH_PAGER": "cat"},
-    )
-
-    return result.is_success() and (not is_fork or result.stdout == "true")
+    return get_github_backend().has_repo(repo_name, is_fork, verbose)
 
 
 def has_fork(
     repository_name: str, owner_name: str, username: str, verbose: bool
 ) -> bool:
     """Returns if the current user has a fork of the given repository by owner"""
-    result = run(
-        [
-            "gh",
-            "api",
-            "--paginate",
-            f"repos/{owner_name}/{repository_name}/forks",
-            "-q",
-            f'''.[] | .owner.login | select(. =="{username}")''',
-        ],
-        verbose,
-    )
-
-    return result.is_success() and result.stdout.strip() == username
+    return get_github_backend().has_fork(repository_name, owner_name, username, verbose)
 
 
 def get_fork_name(
     repository_name: str, owner_name: str, username: str, verbose: bool
 ) -> str:
     """Returns the name of the current user's fork repo"""
-    result = run(
-        [
-            "gh",
-            "api",
-            "--paginate",
-            f"repos/{owner_name}/{repository_name}/forks",
-            "-q",
-            f'''.[] | select(.owner.login =="{username}") | .name''',
-        ],
-        verbose,
+    return get_github_backend().get_fork_name(
+        repository_name, owner_name, username, verbose
     )
 
-    if result.is_success():
-        forkname = result.stdout.splitlines()[0]
-        return forkname
-    return ""
+
+def fetch_repo_state(owner: str, name: str, username: str, verbose: bool) -> RepoState:
+    """Returns the state of owner/name and username's fork of it.
+
+    Cached until the next repository is forked, created or deleted.
+    """
+    return get_github_backend().fetch_repo_state(owner, name, username, verbose)
+
+
+def clear_repo_state_cache() -> None:
+    """Forgets the fetched repository states, e.g. after changing repositories."""
+    github_backend.clear_repo_state_cache()
+
+
+def find_fork(owner: str, name: str, username: str, verbose: bool) -> Optional[str]:
+    """Returns the name of username's fork of owner/name, if any."""
+    return get_github_backend().find_fork(owner, name, username, verbose)
+
+
+def find_fork_by_listing(
+    owner: str, name: str, username: str, verbose: bool
+) -> Optional[str]:
+    """Returns the name of username's fork of owner/name by listing every fork."""
+    return get_github_backend().find_fork_by_listing(owner, name, username, verbose)
@@ -0,0 +1,232 @@
+"""Rate-limit-aware scheduling of bulk Github operations.
+
+Github allows a budget of requests per hour, reported in the X-RateLimit-*
+headers of every response, and answers bursts of concurrent requests with
+secondary rate limits. The RateLimitTracker follows those headers for the whole
+process: the Github backends wait on it before every request, so requests are
+spread out as the budget runs low and paused until it resets, and report
+throttled requests to it, which are retried after a jittered backoff.
+
+GithubScheduler runs many operations, e.g. the wrappers in
+exercise_utils.github_cli, on a bounded number of threads. It halves its
+concurrency whenever Github throttles a request and slowly grows it back:
+
+    with GithubScheduler() as scheduler:
+        scheduler.map(lambda fork: delete_repo(fork, False), forks)
+
+Only the http backend sees the headers. With the gh backend, throttling is
+recognised from gh's error messages.
+"""
+
+import contextvars
+import random
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Iterable, List, Mapping, Optional, TypeVar
+
+from exercise_utils.cli import DEFAULT_MAX_CONCURRENCY
+
+# Requests kept in reserve, e.g. for the student's own gh calls
+DEFAULT_RESERVE = 10
+# Below this share of the budget, requests are spread until the reset
+PACING_THRESHOLD = 0.1
+MAX_RETRIES = 5
+BASE_RETRY_DELAY = 1.0
+MAX_RETRY_DELAY = 60.0
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+def retry_delay(attempt: int, minimum: float = 0.0) -> float:
+    """Returns how long to wait before retry number attempt, starting at 0.
+
+    Waits at least minimum, plus a random share of an exponential backoff from
+    the larger of minimum and BASE_RETRY_DELAY, so throttled workers do not all
+    retry at once.
+    """
+    backoff = min(MAX_RETRY_DELAY, max(minimum, BASE_RETRY_DELAY) * 2**attempt)
+    return minimum + random.uniform(0, backoff)
+
+
+def is_rate_limit_message(message: str) -> bool:
+    return "rate limit" in message.lower()
+
+
+class RateLimitTracker:
+    """The rate limit budget of the authenticated user, as last reported."""
+
+    def __init__(self, reserve: int = DEFAULT_RESERVE) -> None:
+        self.reserve = reserve
+        self.limit: Optional[int] = None
+        self.remaining: Optional[int] = None
+        self.reset: Optional[float] = None
+        self.throttled = 0
+        self.__blocked_until = 0.0
+        self.__next_slot = 0.0
+        self.__lock = threading.Lock()
+
+    def wait(self) -> float:
+        """Blocks until a request may be sent, returning the seconds waited."""
+        with self.__lock:
+            now = time.time()
+            if self.reset is not None and now >= self.reset:
+                # A new window started, whose budget is not known yet
+                self.remaining = None
+                self.reset = None
+            start = max(now, self.__blocked_until)
+            if self.remaining is not None and self.reset is not None:
+                if self.remaining <= self.reserve:
+                    start = max(start, self.reset)
+                elif (
+                    self.limit is not None
+                    and self.remaining < self.limit * PACING_THRESHOLD
+                ):
+                    # Spread what is left evenly over the rest of the window
+                    interval = (self.reset - now) / (self.remaining - self.reserve)
+                    start = max(start, self.__next_slot)
+                    self.__next_slot = start + interval
+                # Counted now, so concurrent callers do not spend the same request
+                self.remaining -= 1
+        delay = max(0.0, start - now)
+        if delay:
+            time.sleep(delay)
+        return delay
+
+    def observe(
+        self, status: int, headers: Mapping[str, str], message: str = ""
+    ) -> Optional[float]:
+        """Updates the budget from a response.
+
+        If the request was throttled, returns the seconds Github asked to wait
+        before retrying it, and None otherwise.
+        """
+        now = time.time()
+        with self.__lock:
+            if "X-RateLimit-Remaining" in headers:
+                reported = int(headers["X-RateLimit-Remaining"])
+                window_reset = float(headers.get("X-RateLimit-Reset") or now)
+                # Within a window, responses to earlier requests can arrive after
+                # later requests were counted
+                if window_reset == self.reset and self.remaining is not None:
+                    reported = min(reported, self.remaining)
+                self.limit = int(headers.get("X-RateLimit-Limit") or 0) or None
+                self.remaining = reported
+                self.reset = window_reset
+            remaining, reset = self.remaining, self.reset
+
+        retry_after = headers.get("Retry-After")
+        throttled = status == 429 or (
+            status == 403
+            and (
+                retry_after is not None
+                or remaining == 0
+                or is_rate_limit_message(message)
+            )
+        )
+        if not throttled:
+            return None
+        if retry_after is not None:
+            minimum = float(retry_after)
+        elif remaining == 0 and reset is not None:
+            minimum = max(0.0, reset - now)
+        else:
+            minimum = 0.0
+        self.throttle(minimum)
+        return minimum
+
+    def throttle(self, minimum: float = 0.0) -> None:
+        """Records a throttled request, holding back requests for minimum seconds."""
+        with self.__lock:
+            self.throttled += 1
+            self.__blocked_until = max(self.__blocked_until, time.time() + minimum)
+
+
+_tracker: Optional[RateLimitTracker] = None
+_tracker_lock = threading.Lock()
+
+
+def get_rate_limit_tracker() -> RateLimitTracker:
+    """Returns the process-wide rate limit tracker."""
+    global _tracker
+    with _tracker_lock:
+        if _tracker is None:
+            _tracker = RateLimitTracker()
+        return _tracker
+
+
+def set_rate_limit_tracker(tracker: Optional[RateLimitTracker]) -> None:
+    """Replaces the process-wide rate limit tracker, None starting a fresh one."""
+    global _tracker
+    with _tracker_lock:
+        _tracker = tracker
+
+
+class GithubScheduler:
+    """Runs Github operations concurrently, backing off when throttled.
+
+    At most max_concurrency operations run at once. The limit is halved each
+    time Github throttles a request and grows by one after as many operations
+    as the limit complete without throttling.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        tracker: Optional[RateLimitTracker] = None,
+    ) -> None:
+        self.max_concurrency = max_concurrency
+        self.concurrency = max_concurrency
+        self.tracker = tracker or get_rate_limit_tracker()
+        self.__executor = ThreadPoolExecutor(max_concurrency)
+        self.__condition = threading.Condition()
+        self.__in_flight = 0
+        self.__successes = 0
+        self.__seen_throttled = self.tracker.throttled
+
+    def submit(self, operation: Callable[..., T], *args: Any) -> "Future[T]":
+        """Queues the operation, run with the caller's context variables."""
+        context = contextvars.copy_context()
+        return self.__executor.submit(self.__run, context, operation, args)
+
+    def map(self, operation: Callable[[R], T], items: Iterable[R]) -> List[T]:
+        """Runs the operation on every item, returning the results in order."""
+        futures = [self.submit(operation, item) for item in items]
+        return [future.result() for future in futures]
+
+    def close(self) -> None:
+        self.__executor.shutdown(wait=True)
+
+    def __enter__(self) -> "GithubScheduler":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    def __run(
+        self,
+        context: contextvars.Context,
+        operation: Callable[..., T],
+        args: Any,
+    ) -> T:
+        with self.__condition:
+            while self.__in_flight >= self.concurrency:
+                self.__condition.wait()
+            self.__in_flight += 1
+        try:
+            return context.run(operation, *args)
+        finally:
+            with self.__condition:
+                self.__in_flight -= 1
+                throttled = self.tracker.throttled
+                if throttled > self.__seen_throttled:
+                    self.__seen_throttled = throttled
+                    self.concurrency = max(1, self.concurrency // 2)
+                    self.__successes = 0
+                elif self.concurrency < self.max_concurrency:
+                    self.__successes += 1
+                    if self.__successes >= self.concurrency:
+                        self.concurrency += 1
+                        self.__successes = 0
+                self.__condition.notify_all()
@@ -1,14 +1,20 @@
 """Git-Mastery specific exercise utility."""
 
+from sys import exit
+
 from exercise_utils.cli import run_command
+from exercise_utils.git import tag
 
 
 def create_start_tag(verbose: bool):
     """Creates a Git-Mastery start tag."""
-    commits_str = run_command(
-        ["git", "log", "--reverse", "--pretty=format:%h"], verbose
+    # Only the root commits are listed, rather than walking the whole history.
+    # The last one listed is the first commit git log --reverse would print.
+    roots = run_command(
+        ["git", "rev-list", "--max-parents=0", "--abbrev-commit", "HEAD"], verbose
     )
-    assert commits_str is not None
-    first_commit = commits_str.split("\n")[0]
+    if not roots:
+        exit(1)
+    first_commit = roots.split()[-1]
     tag_name = f"git-mastery-start-{first_commit}"
-    run_command(["git", "tag", tag_name], verbose)
+    tag(tag_name, verbose)
@@ -0,0 +1,145 @@
+"""On-disk cache of Github's responses, revalidated with conditional requests.
+
+Github sends an ETag and often a Last-Modified header with its responses. The
+http Github backend keeps successful GET responses in
+~/.cache/git-mastery/http (or GITMASTERY_HTTP_CACHE), one file per endpoint and
+token fingerprint, and sends those headers back as If-None-Match and
+If-Modified-Since. Github then answers 304 Not Modified without a body while the
+data is unchanged, which does not count against the rate limit, and the cached
+body is used. Every response is revalidated, so the cache never serves stale
+data. Set GITMASTERY_HTTP_CACHE=off to disable it.
+
+Hits (304s) and misses are counted for the process in HttpCache.stats, and the
+hit rate is logged at exit.
+"""
+
+import atexit
+import hashlib
+import json
+import os
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, Mapping, Optional
+
+from exercise_utils.file import write_json_atomically
+from exercise_utils.log import Level, log
+
+HTTP_CACHE_ENV_VAR = "GITMASTERY_HTTP_CACHE"
+DEFAULT_HTTP_CACHE = os.path.join("~", ".cache", "git-mastery", "http")
+# Response headers kept with the body, e.g. for following pagination links
+KEPT_HEADERS = ("Content-Type", "ETag", "Last-Modified", "Link")
+
+
+@dataclass
+class CachedResponse:
+    url: str
+    body: str
+    headers: Dict[str, str] = field(default_factory=dict)
+
+    def conditional_headers(self) -> Dict[str, str]:
+        """Returns the headers making Github answer 304 if nothing changed."""
+        headers = {}
+        if "ETag" in self.headers:
+            headers["If-None-Match"] = self.headers["ETag"]
+        if "Last-Modified" in self.headers:
+            headers["If-Modified-Since"] = self.headers["Last-Modified"]
+        return headers
+
+
+@dataclass
+class HttpCacheStats:
+    hits: int = 0
+    misses: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        requests = self.hits + self.misses
+        return self.hits / requests if requests else 0.0
+
+    def summary(self) -> str:
+        return (
+            f"HTTP cache: {self.hits} hit(s), {self.misses} miss(es), "
+            f"{self.hit_rate:.0%} hit rate"
+        )
+
+
+class HttpCache:
+    def __init__(self, path: str) -> None:
+        self.path = os.path.expanduser(path)
+        self.stats = HttpCacheStats()
+        self.__lock = threading.Lock()
+
+    def get(self, url: str, fingerprint: Optional[str]) -> Optional[CachedResponse]:
+        try:
+            with open(self.__entry_path(url, fingerprint), "r") as entry_file:
+                entry = json.load(entry_file)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(entry, dict) or entry.get("url") != url:
+            return None
+        return CachedResponse(url, entry.get("body", ""), entry.get("headers", {}))
+
+    def put(
+        self,
+        url: str,
+        fingerprint: Optional[str],
+        body: str,
+        headers: Mapping[str, str],
+    ) -> None:
+        """Stores a response, if it has headers to revalidate it with."""
+        kept = {name: headers[name] for name in KEPT_HEADERS if name in headers}
+        if "ETag" not in kept and "Last-Modified" not in kept:
+            return
+        entry = {"url": url, "body": body, "headers": kept}
+        try:
+            write_json_atomically(self.__entry_path(url, fingerprint), entry)
+        except OSError:
+            # The cache is an optimisation, so a read-only home is not an error
+            pass
+
+    def record(self, hit: bool) -> None:
+        with self.__lock:
+            if hit:
+                self.stats.hits += 1
+            else:
+                self.stats.misses += 1
+
+    def __entry_path(self, url: str, fingerprint: Optional[str]) -> str:
+        # Users see different data, e.g. for private repositories
+        key = f"{fingerprint or ''} {url}".encode("utf-8")
+        return os.path.join(self.path, hashlib.sha256(key).hexdigest() + ".json")
+
+
+_cache: Optional[HttpCache] = None
+_cache_checked = False
+
+
+def get_http_cache() -> Optional[HttpCache]:
+    """Returns the process-wide HTTP cache, or None if it is disabled."""
+    global _cache, _cache_checked
+    if not _cache_checked:
+        _cache_checked = True
+        path = os.environ.get(HTTP_CACHE_ENV_VAR, DEFAULT_HTTP_CACHE)
+        if path.lower() != "off":
+            _cache = HttpCache(path)
+            atexit.register(_log_stats, _cache)
+    return _cache
+
+
+def set_http_cache(cache: Optional[HttpCache]) -> None:
+    """Replaces the process-wide HTTP cache, None disabling it."""
+    global _cache, _cache_checked
+    _cache = cache
+    _cache_checked = True
+
+
+def reset_http_cache() -> None:
+    """Forgets the process-wide HTTP cache, to configure it again on next use."""
+    global _cache, _cache_checked
+    _cache = None
+    _cache_checked = False
+
+
+def _log_stats(cache: HttpCache) -> None:
+    if cache.stats.hits or cache.stats.misses:
+        log(Level.INFO, cache.stats.summary())
@@ -0,0 +1,122 @@
+"""On-disk cache of the authenticated Github user's login.
+
+Downloads and verifies each look up who the user is. The answer is cached in
+~/.cache/git-mastery/identity.json (or GITMASTERY_IDENTITY_CACHE), keyed by a
+fingerprint of the gh auth token, so logging in as someone else or refreshing the
+token misses the cache. Entries expire after GITMASTERY_IDENTITY_TTL seconds, a
+day by default, and github_cli.invalidate_github_username drops them explicitly.
+"""
+
+import hashlib
+import json
+import os
+import subprocess
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from exercise_utils.file import write_json_atomically
+
+IDENTITY_CACHE_ENV_VAR = "GITMASTERY_IDENTITY_CACHE"
+IDENTITY_TTL_ENV_VAR = "GITMASTERY_IDENTITY_TTL"
+DEFAULT_IDENTITY_CACHE = os.path.join("~", ".cache", "git-mastery", "identity.json")
+DEFAULT_IDENTITY_TTL = 24 * 60 * 60
+
+
+class IdentityCache:
+    def __init__(self, path: str, ttl: float) -> None:
+        self.path = os.path.expanduser(path)
+        self.ttl = ttl
+        self.__lock = threading.Lock()
+
+    def get(self, fingerprint: str) -> Optional[str]:
+        """Returns the cached login for the token, unless missing or expired."""
+        entry = self.__read().get(fingerprint)
+        if entry is None or time.time() - entry.get("fetched_at", 0) > self.ttl:
+            return None
+        return entry.get("login") or None
+
+    def put(self, fingerprint: str, login: str) -> None:
+        with self.__lock:
+            entries = self.__read()
+            now = time.time()
+            # Expired entries of other tokens are dropped while rewriting
+            entries = {
+                key: entry
+                for key, entry in entries.items()
+                if now - entry.get("fetched_at", 0) <= self.ttl
+            }
+            entries[fingerprint] = {"login": login, "fetched_at": now}
+            self.__write(entries)
+
+    def invalidate(self, fingerprint: Optional[str] = None) -> None:
+        """Drops the entry of the token, or every entry if none is given."""
+        with self.__lock:
+            entries = self.__read()
+            if fingerprint is None:
+                entries = {}
+            else:
+                entries.pop(fingerprint, None)
+            self.__write(entries)
+
+    def __read(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self.path, "r") as cache_file:
+                entries = json.load(cache_file)
+        except (OSError, ValueError):
+            return {}
+        return entries if isinstance(entries, dict) else {}
+
+    def __write(self, entries: Dict[str, Dict[str, Any]]) -> None:
+        try:
+            write_json_atomically(self.path, entries)
+        except OSError:
+            # The cache is an optimisation, so a read-only home is not an error
+            pass
+
+
+_cache: Optional[IdentityCache] = None
+_fingerprint: Optional[str] = None
+
+
+def get_identity_cache() -> IdentityCache:
+    """Returns the process-wide identity cache, configured from the environment."""
+    global _cache
+    if _cache is None:
+        ttl = os.environ.get(IDENTITY_TTL_ENV_VAR)
+        _cache = IdentityCache(
+            os.environ.get(IDENTITY_CACHE_ENV_VAR, DEFAULT_IDENTITY_CACHE),
+            float(ttl) if ttl else DEFAULT_IDENTITY_TTL,
+        )
+    return _cache
+
+
+def gh_auth_token() -> Optional[str]:
+    """Returns the token gh is logged in with, or None if not logged in."""
+    # Run directly rather than through exercise_utils.cli, so the token never
+    # ends up in logs or cassettes
+    try:
+        result = subprocess.run(["gh", "auth", "token"], capture_output=True, text=True)
+    except OSError:
+        return None
+    token = result.stdout.strip()
+    if result.returncode != 0 or not token:
+        return None
+    return token
+
+
+def token_fingerprint() -> Optional[str]:
+    """Returns a fingerprint of the gh auth token, or None if not logged in."""
+    global _fingerprint
+    if _fingerprint is None:
+        token = gh_auth_token()
+        if token is None:
+            return None
+        _fingerprint = hashlib.sha256(token.encode("utf-8")).hexdigest()
+    return _fingerprint
+
+
+def forget_token_fingerprint() -> None:
+    """Makes the next lookup read the token again, e.g. after gh auth login."""
+    global _fingerprint
+    _fingerprint = None
@@ -0,0 +1,216 @@
+"""Buffered, structured logging for exercise_utils.
+
+Records are handed to a background writer thread through a bounded queue, so
+callers only wait on terminal I/O when the queue is full. The process-wide sink
+stands in for sys.stdout, so print() calls first wait for the queued records to
+be written and stay in order with them; the queue is also flushed before
+exercise_utils exits on an error. The verbose flag taken
+by the exercise_utils helpers maps onto levels: output of verbose calls is logged
+at INFO (WARNING for failures) and shown by default, while output of quiet calls
+is logged at DEBUG and only shown with GITMASTERY_LOG_LEVEL=debug.
+
+GITMASTERY_LOG_FORMAT selects between the plain text format, which matches the
+helpers' previous output, and json, which emits one JSON object per record.
+"""
+
+import atexit
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Any, Dict, List, Optional, TextIO
+
+LOG_FORMAT_ENV_VAR = "GITMASTERY_LOG_FORMAT"
+LOG_LEVEL_ENV_VAR = "GITMASTERY_LOG_LEVEL"
+DEFAULT_QUEUE_SIZE = 1024
+
+
+class Level(IntEnum):
+    DEBUG = 10
+    INFO = 20
+    WARNING = 30
+    ERROR = 40
+
+
+@dataclass
+class LogRecord:
+    level: Level
+    message: str
+    command: Optional[List[str]] = None
+    returncode: Optional[int] = None
+    timestamp: float = field(default_factory=time.time)
+
+
+class TextFormatter:
+    def format(self, record: LogRecord) -> str:
+        return record.message
+
+
+class JsonFormatter:
+    def format(self, record: LogRecord) -> str:
+        data: Dict[str, Any] = {
+            "timestamp": record.timestamp,
+            "level": record.level.name.lower(),
+            "message": record.message,
+        }
+        if record.command is not None:
+            data["command"] = record.command
+            data["returncode"] = record.returncode
+        return json.dumps(data)
+
+
+Formatter = TextFormatter | JsonFormatter
+
+
+class LogSink:
+    def __init__(
+        self,
+        stream: Optional[TextIO] = None,
+        formatter: Formatter = TextFormatter(),
+        level: Level = Level.INFO,
+        max_queue_size: int = DEFAULT_QUEUE_SIZE,
+    ) -> None:
+        self.stream = stream
+        self.formatter = formatter
+        self.level = level
+        self.__queue: queue.Queue[Optional[LogRecord]] = queue.Queue(max_queue_size)
+        self.__writer: Optional[threading.Thread] = None
+        self.__lock = threading.Lock()
+
+    def enabled(self, level: Level) -> bool:
+        return level >= self.level
+
+    def log(self, record: LogRecord) -> None:
+        """Queues the record for writing, blocking only if the queue is full."""
+        if not self.enabled(record.level):
+            return
+        self.__ensure_writer()
+        self.__queue.put(record)
+
+    def flush(self) -> None:
+        """Waits until every queued record has been written."""
+        writer = self.__writer
+        # The writer itself writes through sys.stdout, and must not wait on itself
+        if writer is not None and writer is not threading.current_thread():
+            self.__queue.join()
+
+    def close(self) -> None:
+        """Writes the remaining records and stops the writer thread."""
+        with self.__lock:
+            writer, self.__writer = self.__writer, None
+        if writer is not None:
+            self.__queue.put(None)
+            writer.join()
+
+    def __ensure_writer(self) -> None:
+        with self.__lock:
+            if self.__writer is None:
+                self.__writer = threading.Thread(
+                    target=self.__write, name="exercise-utils-log", daemon=True
+                )
+                self.__writer.start()
+
+    def __write(self) -> None:
+        while True:
+            record = self.__queue.get()
+            try:
+                if record is None:
+                    return
+                # Resolved per write so redirections of sys.stdout are honoured
+                stream = self.stream or sys.stdout
+                stream.write(self.formatter.format(record) + "\n")
+                # Batch the flushes while records keep coming in
+                if self.__queue.empty():
+                    stream.flush()
+            finally:
+                self.__queue.task_done()
+
+
+class _OrderedStdout:
+    """Wraps sys.stdout so that writes wait for the queued records first."""
+
+    def __init__(self, stream: TextIO) -> None:
+        self.stream = stream
+
+    def write(self, text: str) -> int:
+        flush()
+        return self.stream.write(text)
+
+    def flush(self) -> None:
+        flush()
+        self.stream.flush()
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.stream, name)
+
+
+_sink: Optional[LogSink] = None
+_sink_lock = threading.Lock()
+
+
+def get_sink() -> LogSink:
+    """Returns the process-wide sink, configured from the environment."""
+    global _sink
+    with _sink_lock:
+        if _sink is None:
+            log_format = os.environ.get(LOG_FORMAT_ENV_VAR, "text").lower()
+            level_name = os.environ.get(LOG_LEVEL_ENV_VAR, "info").upper()
+            formatter: Formatter = (
+                JsonFormatter() if log_format == "json" else TextFormatter()
+            )
+            level = Level.__members__.get(level_name, Level.INFO)
+            _sink = LogSink(formatter=formatter, level=level)
+            atexit.register(_sink.close)
+            _order_stdout()
+        return _sink
+
+
+def set_sink(sink: LogSink) -> None:
+    """Replaces the process-wide sink, writing out the previous one first."""
+    global _sink
+    with _sink_lock:
+        previous, _sink = _sink, sink
+    if previous is not None:
+        previous.close()
+    _order_stdout()
+
+
+def _order_stdout() -> None:
+    """Makes print() calls wait for the records queued before them."""
+    if not isinstance(sys.stdout, _OrderedStdout):
+        sys.stdout = _OrderedStdout(sys.stdout)  # type: ignore[assignment]
+
+
+def flush() -> None:
+    """Waits until everything logged so far has been written."""
+    if _sink is not None:
+        _sink.flush()
+
+
+def log(level: Level, message: str) -> None:
+    get_sink().log(LogRecord(level, message))
+
+
+def log_command_output(
+    command: List[str],
+    returncode: Optional[int],
+    output: str,
+    verbose: bool,
+) -> None:
+    """Logs a command's output at the level its verbose flag maps onto.
+
+    returncode is None for output logged while the command is still running.
+    """
+    if not verbose:
+        level = Level.DEBUG
+    elif returncode is None or returncode == 0:
+        level = Level.INFO
+    else:
+        level = Level.WARNING
+    sink = get_sink()
+    if sink.enabled(level):
+        sink.log(LogRecord(level, output, command=command, returncode=returncode))
@@ -0,0 +1,134 @@
+"""Bulk cleanup of the repositories downloads create on Github.
+
+Downloads create gitmastery-* repositories and *-gitmastery-* forks on the
+user's account, which pile up on test accounts. find_exercise_repositories
+lists them with one paginated sweep of the user's repositories, and
+cleanup_repositories deletes or resets them on a GithubScheduler, which bounds
+the requests in flight and backs off when Github throttles them:
+
+    repositories = find_exercise_repositories(False)
+    print(cleanup_repositories(repositories, DELETE, False, dry_run=True).summary())
+
+Resetting syncs a fork's default branch with its parent and recreates any other
+repository empty, with the same visibility. With dry_run, the repositories are
+only listed.
+"""
+
+import time
+from dataclasses import dataclass, field
+from fnmatch import fnmatchcase
+from sys import exit
+from typing import List, Sequence
+
+from exercise_utils.cli import DEFAULT_MAX_CONCURRENCY
+from exercise_utils.github_cli import (
+    create_repo,
+    delete_repo,
+    list_user_repos,
+    sync_fork,
+)
+from exercise_utils.github_scheduler import GithubScheduler
+from exercise_utils.log import Level, log
+
+DEFAULT_PATTERNS = ["gitmastery-*", "*-gitmastery-*"]
+
+DELETE = "delete"
+RESET = "reset"
+ACTIONS = [DELETE, RESET]
+PAST_TENSE = {DELETE: "Deleted", RESET: "Reset"}
+
+
+@dataclass(frozen=True)
+class ExerciseRepository:
+    full_name: str
+    is_fork: bool
+    private: bool = False
+
+
+@dataclass
+class CleanupReport:
+    action: str
+    dry_run: bool
+    repositories: List[ExerciseRepository] = field(default_factory=list)
+    # Repositories still listed after being deleted
+    remaining: List[str] = field(default_factory=list)
+    elapsed: float = 0.0
+
+    def summary(self) -> str:
+        done = PAST_TENSE[self.action]
+        lines = []
+        for repository in self.repositories:
+            name = repository.full_name + (" (fork)" if repository.is_fork else "")
+            if self.dry_run:
+                lines.append(f"Would {self.action} {name}")
+            elif repository.full_name in self.remaining:
+                lines.append(f"Could not {self.action} {name}")
+            else:
+                lines.append(f"{done} {name}")
+        if not self.dry_run:
+            count = len(self.repositories) - len(self.remaining)
+            lines.append(
+                f"{done} {count} of {len(self.repositories)} repositories "
+                f"in {self.elapsed:.1f}s"
+            )
+        return "\n".join(lines)
+
+
+def find_exercise_repositories(
+    verbose: bool, patterns: Sequence[str] = DEFAULT_PATTERNS
+) -> List[ExerciseRepository]:
+    """Returns the user's repositories whose names match any of patterns.
+
+    Exits if the user's repositories cannot be listed.
+    """
+    repositories = list_user_repos(verbose)
+    if repositories is None:
+        log(Level.ERROR, "Could not list your Github repositories")
+        exit(1)
+    return [
+        ExerciseRepository(
+            repository["full_name"], repository["fork"], repository["private"]
+        )
+        for repository in repositories
+        if any(fnmatchcase(repository["name"], pattern) for pattern in patterns)
+    ]
+
+
+def cleanup_repositories(
+    repositories: Sequence[ExerciseRepository],
+    action: str,
+    verbose: bool,
+    dry_run: bool = False,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+) -> CleanupReport:
+    """Deletes or resets the repositories, running up to max_concurrency at once.
+
+    Deleted repositories are listed again afterwards, to report those that are
+    left.
+    """
+    if action not in ACTIONS:
+        raise ValueError(f"Unknown cleanup action {action}, expected one of {ACTIONS}")
+    report = CleanupReport(action, dry_run, list(repositories))
+    if dry_run or not repositories:
+        return report
+
+    def clean(repository: ExerciseRepository) -> None:
+        if action == RESET and repository.is_fork:
+            sync_fork(repository.full_name, verbose)
+            return
+        delete_repo(repository.full_name, verbose)
+        if action == RESET:
+            create_repo(repository.full_name, verbose, repository.private)
+
+    started_at = time.monotonic()
+    with GithubScheduler(max_concurrency) as scheduler:
+        scheduler.map(clean, repositories)
+    if action == DELETE:
+        deleted = {repository.full_name for repository in repositories}
+        report.remaining = [
+            repository.full_name
+            for repository in find_exercise_repositories(verbose, ["*"])
+            if repository.full_name in deleted
+        ]
+    report.elapsed = time.monotonic() - started_at
+    return report
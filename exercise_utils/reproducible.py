@@ -0,0 +1,123 @@
+"""Reproducible identities and timestamps for the objects created by setups.
+
+Within a reproducible block, every commit and annotated tag created through
+exercise_utils.git is given an author, committer and date derived from the
+exercise name and the number of objects created so far, instead of the local
+git config and the current time. The same setup then always produces
+byte-identical objects, so commit SHAs and the git-mastery-start tag are stable:
+
+    with reproducible("log-and-order"):
+        setup(verbose)
+
+Identities and dates passed explicitly (e.g. to HistoryBuilder) are kept. The
+mode can be enabled for a whole process with GITMASTERY_REPRODUCIBLE=<exercise>.
+"""
+
+import hashlib
+import os
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Dict, Iterator, Optional
+
+REPRODUCIBLE_ENV_VAR = "GITMASTERY_REPRODUCIBLE"
+
+IDENTITY_NAME = "Git-Mastery"
+# 2024-01-01T00:00:00Z, the clocks of all exercises start within a year of it
+EPOCH = 1704067200
+EPOCH_SPREAD = 365 * 24 * 60 * 60
+# Time between consecutive objects
+STEP = 60
+
+
+@dataclass(frozen=True)
+class Signature:
+    name: str
+    email: str
+    timestamp: int
+
+    @property
+    def date(self) -> str:
+        """Returns the date in git's internal format."""
+        return f"{self.timestamp} +0000"
+
+    def env(self) -> Dict[str, str]:
+        """Returns the environment making git use this signature for new objects."""
+        return {
+            "GIT_AUTHOR_NAME": self.name,
+            "GIT_AUTHOR_EMAIL": self.email,
+            "GIT_AUTHOR_DATE": f"@{self.date}",
+            "GIT_COMMITTER_NAME": self.name,
+            "GIT_COMMITTER_EMAIL": self.email,
+            "GIT_COMMITTER_DATE": f"@{self.date}",
+        }
+
+
+class ReproducibleClock:
+    """Hands out the signatures of an exercise's objects in creation order."""
+
+    def __init__(self, exercise: str) -> None:
+        self.exercise = exercise
+        digest = hashlib.sha256(exercise.encode("utf-8")).digest()
+        offset = int.from_bytes(digest[:8], "big") % EPOCH_SPREAD
+        self.start = EPOCH + offset - offset % STEP
+        self.sequence = 0
+        self.__lock = threading.Lock()
+
+    def next(self) -> Signature:
+        with self.__lock:
+            self.sequence += 1
+            sequence = self.sequence
+        return Signature(
+            IDENTITY_NAME,
+            f"{self.exercise}@exercises.git-mastery.org",
+            self.start + sequence * STEP,
+        )
+
+
+_process_clock: Optional[ReproducibleClock] = None
+_process_clock_checked = False
+_active_clock: ContextVar[Optional[ReproducibleClock]] = ContextVar(
+    "active_reproducible_clock", default=None
+)
+
+
+def current_clock() -> Optional[ReproducibleClock]:
+    """Returns the active clock, if reproducible mode is on."""
+    global _process_clock, _process_clock_checked
+    clock = _active_clock.get()
+    if clock is not None:
+        return clock
+    if not _process_clock_checked:
+        _process_clock_checked = True
+        exercise = os.environ.get(REPRODUCIBLE_ENV_VAR)
+        if exercise:
+            _process_clock = ReproducibleClock(exercise)
+    return _process_clock
+
+
+def next_signature() -> Optional[Signature]:
+    """Returns the signature for the next object, or None if the mode is off."""
+    clock = current_clock()
+    return clock.next() if clock is not None else None
+
+
+def signature_env() -> Dict[str, str]:
+    """Returns the environment for a git command creating one object.
+
+    Empty if reproducible mode is off.
+    """
+    signature = next_signature()
+    return signature.env() if signature is not None else {}
+
+
+@contextmanager
+def reproducible(exercise: str) -> Iterator[ReproducibleClock]:
+    """Makes the objects created within the context reproducible."""
+    clock = ReproducibleClock(exercise)
+    token = _active_clock.set(clock)
+    try:
+        yield clock
+    finally:
+        _active_clock.reset(token)
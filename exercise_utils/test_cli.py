@@ -0,0 +1,56 @@
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+from exercise_utils.cli import CommandSession, gather_commands, run_async
+
+pytestmark = pytest.mark.skipif(os.name == "nt", reason="runs sh")
+
+# Records how many of the commands are running when it starts, then holds its slot
+HOLD_SLOT = (
+    'mkdir "running-$0" && ls -d running-* | wc -l > "seen-$0" '
+    '&& sleep 0.5 && rmdir "running-$0" && echo "$0"'
+)
+
+
+def test_run_async_runs_in_the_active_session(tmp_path: Path) -> None:
+    command = [
+        sys.executable,
+        "-c",
+        "import os, sys; sys.stdout.buffer.write(os.environ['GREETING'].encode())",
+    ]
+    with CommandSession(cwd=tmp_path, env={"GREETING": "hi\r\nthere"}):
+        result = asyncio.run(run_async(command, False))
+        cwd = asyncio.run(run_async(["pwd"], False))
+
+    assert result.is_success()
+    # Decoded like run, with universal newlines
+    assert result.result.stdout == "hi\nthere"
+    assert cwd.stdout == str(tmp_path)
+
+
+def test_run_async_reports_failures(tmp_path: Path) -> None:
+    result = asyncio.run(run_async(["sh", "-c", "echo oops >&2; exit 3"], False))
+    missing = asyncio.run(run_async([str(tmp_path / "missing")], False))
+
+    assert (result.returncode, result.result.stderr) == (3, "oops\n")
+    assert not missing.is_success()
+
+
+@pytest.mark.parametrize("max_concurrency", [2, 6])
+def test_gather_commands_overlaps_up_to_the_cap(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch, max_concurrency: int
+) -> None:
+    monkeypatch.chdir(tmp_path)
+    commands = [["sh", "-c", HOLD_SLOT, str(i)] for i in range(6)]
+
+    results = asyncio.run(
+        gather_commands(commands, False, max_concurrency=max_concurrency)
+    )
+
+    assert [result.stdout for result in results] == [str(i) for i in range(6)]
+    seen = [int((tmp_path / f"seen-{i}").read_text()) for i in range(6)]
+    assert max(seen) == max_concurrency
@@ -0,0 +1,47 @@
+import os
+import time
+from pathlib import Path
+
+import pytest
+
+from exercise_utils.cli import run
+from exercise_utils.deadline import CommandTimeoutError, deadline
+
+pytestmark = pytest.mark.skipif(os.name == "nt", reason="uses POSIX process groups")
+
+
+def is_running(pid: int) -> bool:
+    try:
+        with open(f"/proc/{pid}/stat") as stat_file:
+            # Killed processes may linger as zombies until they are reaped
+            return stat_file.read().rsplit(")", 1)[1].split()[0] != "Z"
+    except FileNotFoundError:
+        return False
+
+
+@pytest.mark.skipif(not os.path.isdir("/proc"), reason="reads /proc")
+def test_deadline_kills_the_process_group(tmp_path: Path) -> None:
+    pid_file = tmp_path / "pid"
+    command = ["sh", "-c", f"sleep 30 & echo $! > {pid_file}; wait"]
+
+    started_at = time.monotonic()
+    with pytest.raises(CommandTimeoutError) as error:
+        with deadline("download", 10) as budget:
+            with deadline("clone", 0.5):
+                run(command, False)
+
+    assert time.monotonic() - started_at < 5
+    assert error.value.phase == "clone"
+    assert error.value.command == command
+    # The background sleep was started by the command, and was killed with it
+    assert not is_running(int(pid_file.read_text()))
+    assert [phase.name for phase in budget.phases] == ["download", "clone"]
+    assert budget.phases[1].exceeded
+
+
+def test_expired_deadline_raises_before_running(tmp_path: Path) -> None:
+    marker = tmp_path / "ran"
+    with deadline("download", 0):
+        with pytest.raises(CommandTimeoutError):
+            run(["touch", str(marker)], False)
+    assert not marker.exists()
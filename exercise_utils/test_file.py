@@ -0,0 +1,40 @@
+import os
+import stat
+import subprocess
+from pathlib import Path
+
+import pytest
+
+from exercise_utils.file import materialize_tree
+
+
+def test_materialize_tree_writes_modes_and_stages(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.chdir(tmp_path)
+    subprocess.run(["git", "init", "--quiet"], check=True)
+    (tmp_path / "existing.txt").write_text("kept")
+
+    materialize_tree(
+        {
+            "a/b/c.txt": """
+            nested
+            """,
+            "a/d.txt": ("read only", stat.S_IREAD),
+            "existing.txt": None,
+        },
+        mode=stat.S_IRUSR | stat.S_IWUSR,
+        stage=True,
+    )
+
+    assert (tmp_path / "a/b/c.txt").read_text() == "nested\n"
+    assert (tmp_path / "existing.txt").read_text() == "kept"
+    assert stat.S_IMODE(os.stat("a/d.txt").st_mode) == stat.S_IREAD
+    assert stat.S_IMODE(os.stat("a/b/c.txt").st_mode) == stat.S_IRUSR | stat.S_IWUSR
+    staged = subprocess.run(
+        ["git", "diff", "--cached", "--name-only"],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout.split()
+    assert staged == ["a/b/c.txt", "a/d.txt", "existing.txt"]
@@ -0,0 +1,96 @@
+import subprocess
+import time
+from pathlib import Path
+
+import pytest
+
+from exercise_utils.fork_clone import ensure_fork_clone
+from exercise_utils.github_backend import use_github_backend
+from testing.fake_github import FakeGithub, running_fake_github
+
+pytest.importorskip("requests")
+pytestmark = pytest.mark.usefixtures("github_state")
+
+
+@pytest.fixture
+def fake(tmp_path: Path) -> FakeGithub:
+    source = tmp_path / "source"
+    source.mkdir()
+    (source / "shapes.txt").write_text("square\n")
+    for command in (
+        ["init", "--quiet", "--initial-branch=main"],
+        ["add", "shapes.txt"],
+        ["-c", "user.name=a", "-c", "user.email=a@b", "commit", "-qm", "Add shapes"],
+    ):
+        subprocess.run(["git", "-C", str(source), *command], check=True)
+    fake = FakeGithub(str(tmp_path / "github"))
+    fake.add_repository("git-mastery", "gm-shapes", source=str(source))
+    return fake
+
+
+def test_fork_is_cloned_once_ready(
+    tmp_path: Path, fake: FakeGithub, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    fake.fork_delay = 0.5
+    monkeypatch.chdir(tmp_path)
+    with (
+        running_fake_github(fake, str(tmp_path / "bin")),
+        use_github_backend("http"),
+    ):
+        report = ensure_fork_clone("git-mastery/gm-shapes", "shapes", "clone", False)
+
+    assert report.fork == "viewer/shapes"
+    # Polled with backoff until the fork was written
+    assert 1 < report.polls < 6
+    assert (tmp_path / "clone" / "shapes.txt").read_text() == "square\n"
+
+
+def test_failed_fork_exits_without_polling(
+    tmp_path: Path, fake: FakeGithub, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    # Not a fork, so forking under its name is refused
+    fake.add_repository("viewer", "shapes")
+    monkeypatch.chdir(tmp_path)
+    started_at = time.monotonic()
+    with (
+        running_fake_github(fake, str(tmp_path / "bin")),
+        use_github_backend("http"),
+        pytest.raises(SystemExit),
+    ):
+        ensure_fork_clone("git-mastery/gm-shapes", "shapes", "clone", False)
+
+    assert time.monotonic() - started_at < 5
+
+
+def test_fork_that_never_becomes_ready_times_out(
+    tmp_path: Path, fake: FakeGithub, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    fake.fork_delay = 3
+    monkeypatch.chdir(tmp_path)
+    with (
+        running_fake_github(fake, str(tmp_path / "bin")),
+        use_github_backend("http"),
+        pytest.raises(SystemExit),
+    ):
+        ensure_fork_clone(
+            "git-mastery/gm-shapes", "shapes", "clone", False, ready_timeout=1
+        )
+
+    assert not (tmp_path / "clone").exists()
+
+
+def test_failed_clone_exits(
+    tmp_path: Path, fake: FakeGithub, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    # git refuses to clone into a folder that is not empty
+    (tmp_path / "clone").mkdir()
+    (tmp_path / "clone" / "notes.txt").write_text("kept\n")
+    monkeypatch.chdir(tmp_path)
+    with (
+        running_fake_github(fake, str(tmp_path / "bin")),
+        use_github_backend("http"),
+        pytest.raises(SystemExit),
+    ):
+        ensure_fork_clone("git-mastery/gm-shapes", "shapes", "clone", False)
+
+    assert [path.name for path in (tmp_path / "clone").iterdir()] == ["notes.txt"]
@@ -0,0 +1,164 @@
+import subprocess
+from pathlib import Path
+
+import pytest
+
+from exercise_utils.git import (
+    HistoryBuilder,
+    RefTransaction,
+    commit_to_branch,
+    init,
+    merge_into_branch,
+)
+from exercise_utils.reproducible import reproducible
+
+
+def git(*args: str) -> str:
+    return subprocess.run(
+        ["git", *args], capture_output=True, text=True, check=True
+    ).stdout
+
+
+@pytest.fixture
+def repo(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    monkeypatch.chdir(tmp_path)
+    init(False)
+    return tmp_path
+
+
+def test_commit_to_branch_keeps_existing_modes(repo: Path) -> None:
+    (repo / "run.sh").write_text("echo 1\n")
+    (repo / "run.sh").chmod(0o755)
+    git("add", "run.sh")
+    git("-c", "user.name=a", "-c", "user.email=a@b", "commit", "-qm", "Add run.sh")
+
+    commit_to_branch(
+        "main",
+        "Update files",
+        {"run.sh": "echo 2\n", "notes.txt": "new\n", "tool": "#!/bin/sh\n"},
+        False,
+    )
+    commit_to_branch("main", "Update tool", {"tool": "#!/bin/sh\n"}, False, "100755")
+    commit_to_branch("main", "Add build.sh", {"build.sh": "make\n"}, False, "100755")
+
+    modes = {
+        path: mode
+        for mode, _, _, path in (
+            line.split(maxsplit=3) for line in git("ls-tree", "main").splitlines()
+        )
+    }
+    assert modes == {
+        "build.sh": "100755",
+        "notes.txt": "100644",
+        "run.sh": "100755",
+        "tool": "100644",
+    }
+    assert git("show", "main:run.sh") == "echo 2\n"
+    # The working tree is untouched until the branch is materialized
+    assert (repo / "run.sh").read_text() == "echo 1\n"
+
+
+def test_merge_into_branch_creates_merge_commits(repo: Path) -> None:
+    commit_to_branch("main", "Add a", {"a.txt": "a\n"}, False)
+    git("branch", "feature")
+    commit_to_branch("feature", "Add b", {"b.txt": "b\n"}, False)
+
+    # feature is ahead of main, so it is fast-forwarded unless asked not to
+    merge_into_branch("main", "feature", True, False)
+    assert git("rev-parse", "main") == git("rev-parse", "feature")
+
+    commit_to_branch("main", "Remove a", {"a.txt": None}, False)
+    commit_to_branch("feature", "Add c", {"c.txt": "c\n"}, False)
+    sha = merge_into_branch("main", "feature", False, False)
+
+    assert git("log", "-1", "--format=%s", "main") == "Merge branch 'feature'\n"
+    assert git("rev-parse", "main^2").strip() == git("rev-parse", "feature").strip()
+    assert git("rev-parse", "main").strip() == sha
+    assert git("ls-tree", "--name-only", "main").split() == ["b.txt", "c.txt"]
+
+
+@pytest.mark.parametrize("ff", [True, False])
+def test_merge_into_branch_does_nothing_when_up_to_date(repo: Path, ff: bool) -> None:
+    commit_to_branch("main", "Add a", {"a.txt": "a\n"}, False)
+    git("branch", "feature")
+    main = commit_to_branch("main", "Add b", {"b.txt": "b\n"}, False)
+
+    # feature is already in main, so there is nothing to merge
+    assert merge_into_branch("main", "feature", ff, False) == main
+    assert git("rev-parse", "main").strip() == main
+
+
+def test_history_builder_writes_merges_and_tags(repo: Path) -> None:
+    history = HistoryBuilder(False)
+    history.commit("main", "Add notes", {"notes.txt": "hello\n"})
+    history.branch("feature", "main")
+    feature = history.commit("feature", "Add todo", {"todo.txt": "test\n"})
+    history.commit("main", "Update notes", {"notes.txt": "hi\n"})
+    history.merge("main", "feature", "Merge branch 'feature'")
+    history.tag("v1.0", "main", "First release")
+    history.tag("wip", feature)
+    with reproducible("history"):
+        history.build("main")
+
+    graph = git("log", "--graph", "--format=%s%d", "main").splitlines()
+    assert [line.rstrip() for line in graph] == [
+        "*   Merge branch 'feature' (HEAD -> main, tag: v1.0)",
+        "|\\",
+        "| * Add todo (tag: wip, feature)",
+        "* | Update notes",
+        "|/",
+        "* Add notes",
+    ]
+    assert git("cat-file", "-t", "v1.0") == "tag\n"
+    assert git("cat-file", "-t", "wip") == "commit\n"
+    assert git("show", "main:notes.txt") == "hi\n"
+    assert git("show", "main:todo.txt") == "test\n"
+    assert git("status", "--porcelain") == ""
+
+
+def test_history_builder_rejects_conflicting_merges(repo: Path) -> None:
+    history = HistoryBuilder(False)
+    history.commit("main", "Add notes", {"notes.txt": "hello\n"})
+    history.branch("feature", "main")
+    history.commit("feature", "Update notes", {"notes.txt": "hi\n"})
+    history.commit("main", "Update notes", {"notes.txt": "hey\n"})
+
+    with pytest.raises(ValueError, match="notes.txt"):
+        history.merge("main", "feature", "Merge branch 'feature'")
+
+
+def test_ref_transaction_applies_every_update(repo: Path) -> None:
+    commit_to_branch("main", "Add a", {"a.txt": "a\n"}, False)
+    commit_to_branch("main", "Add b", {"b.txt": "b\n"}, False)
+    git("branch", "old")
+
+    with reproducible("refs"):
+        with RefTransaction(False) as refs:
+            refs.create_tag("v1.0", "main~1")
+            refs.create_tag("v2.0", "main", message="Second release")
+            refs.create_branch("feature", "main~1")
+            refs.delete_branch("old")
+
+    assert git("for-each-ref", "--format=%(refname) %(objecttype)").splitlines() == [
+        "refs/heads/feature commit",
+        "refs/heads/main commit",
+        "refs/tags/v1.0 commit",
+        "refs/tags/v2.0 tag",
+    ]
+    assert git("rev-parse", "feature") == git("rev-parse", "main~1")
+    assert git("rev-parse", "v2.0^{}") == git("rev-parse", "main")
+
+
+def test_ref_transaction_applies_nothing_if_an_update_fails(repo: Path) -> None:
+    commit_to_branch("main", "Add a", {"a.txt": "a\n"}, False)
+    git("branch", "feature")
+    refs_before = git("for-each-ref")
+
+    with pytest.raises(SystemExit):
+        with RefTransaction(False) as refs:
+            refs.create_tag("v1.0", "main")
+            refs.delete_branch("main")
+            # Already exists, so the whole transaction is rejected
+            refs.create_branch("feature", "main")
+
+    assert git("for-each-ref") == refs_before
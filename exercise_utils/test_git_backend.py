@@ -0,0 +1,182 @@
+import json
+import os
+import random
+import shutil
+import subprocess
+from contextlib import nullcontext
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import pytest
+
+from exercise_utils.git import add, commit, empty_commit, init
+from exercise_utils.git_backend import use_git_backend
+from exercise_utils.reproducible import reproducible
+
+pytest.importorskip("git")
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def local_exercises() -> List[str]:
+    exercises = []
+    for config_path in sorted(ROOT.glob("*/.gitmastery-exercise.json")):
+        config = json.loads(config_path.read_text())
+        if config["exercise_repo"]["repo_type"] in ("local", "local-ignore"):
+            exercises.append(config_path.parent.name)
+    return exercises
+
+
+def download(exercise: str, destination: Path) -> None:
+    """Sets up the exercise like scripts/test-download.py does for local repos."""
+    exercise_folder = ROOT / exercise
+    config = json.loads((exercise_folder / ".gitmastery-exercise.json").read_text())
+    repo_folder = destination / config["exercise_repo"]["repo_name"]
+    repo_folder.mkdir(parents=True)
+    for resource, path in config["base_files"].items():
+        shutil.copyfile(exercise_folder / "res" / resource, destination / path)
+
+    namespace: Dict[str, Any] = {}
+    exec((exercise_folder / "download.py").read_text(), namespace)
+    resources = namespace.get("__resources__", {})
+    for resource, path in resources.items():
+        (repo_folder / path).parent.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(exercise_folder / "res" / resource, repo_folder / path)
+
+    os.chdir(repo_folder)
+    random.seed(0)
+    if config["exercise_repo"]["init"]:
+        init(False)
+        if resources:
+            add(["."], False)
+            commit("Set initial state", False)
+        else:
+            empty_commit("Set initial state", False)
+    if "setup" in namespace:
+        namespace["setup"]()
+
+
+def git(*args: str) -> str:
+    return subprocess.run(["git", *args], capture_output=True, text=True).stdout
+
+
+def snapshot(repo_folder: Path) -> Dict[str, Any]:
+    """Returns the refs, histories and status, independent of commit SHAs."""
+    os.chdir(repo_folder)
+    if not (repo_folder / ".git").exists():
+        return {}
+    refs: Dict[str, List[Tuple[str, str, int]]] = {}
+    for ref in git("for-each-ref", "--format=%(refname)").split():
+        history = git("log", "--format=%T %P%x00%s", ref).splitlines()
+        name = ref
+        if ref.startswith("refs/tags/git-mastery-start-"):
+            name = "refs/tags/git-mastery-start"
+        refs[name] = []
+        for line in history:
+            hashes, subject = line.split("\0", 1)
+            tree, *parents = hashes.split()
+            refs[name].append((tree, subject, len(parents)))
+        # Commits made within the same second can be listed in either order
+        refs[name].sort()
+    return {
+        "refs": refs,
+        "head": git("symbolic-ref", "-q", "HEAD").strip() or None,
+        "status": git("status", "--porcelain", "--untracked-files=all"),
+    }
+
+
+@pytest.fixture(autouse=True)
+def seeded_generators(monkeypatch: pytest.MonkeyPatch) -> None:
+    # Some setups use unseeded generators, which must produce the same data
+    seed = random.Random.seed
+    monkeypatch.setattr(
+        random.Random,
+        "seed",
+        lambda self, a=None, version=2: seed(self, 0 if a is None else a, version),
+    )
+
+
+def download_with_each_backend(
+    exercise: str, tmp_path: Path, is_reproducible: bool
+) -> Dict[str, Path]:
+    """Downloads the exercise with every backend, returning the repo folders."""
+    cwd = os.getcwd()
+    repo_folders = {}
+    try:
+        for backend in ("subprocess", "gitpython"):
+            destination = tmp_path / backend
+            with use_git_backend(backend):
+                with reproducible(exercise) if is_reproducible else nullcontext():
+                    download(exercise, destination)
+            repo_folders[backend] = next(p for p in destination.iterdir() if p.is_dir())
+    finally:
+        os.chdir(cwd)
+    return repo_folders
+
+
+@pytest.mark.parametrize("exercise", local_exercises())
+def test_backends_create_same_repository(exercise: str, tmp_path: Path) -> None:
+    repo_folders = download_with_each_backend(exercise, tmp_path, False)
+    cwd = os.getcwd()
+    try:
+        snapshots = {
+            backend: snapshot(folder) for backend, folder in repo_folders.items()
+        }
+    finally:
+        os.chdir(cwd)
+    assert snapshots["gitpython"] == snapshots["subprocess"]
+
+
+@pytest.mark.parametrize("exercise", local_exercises())
+def test_backends_create_identical_objects_when_reproducible(
+    exercise: str, tmp_path: Path
+) -> None:
+    repo_folders = download_with_each_backend(exercise, tmp_path, True)
+    refs = {
+        backend: git(
+            "-C", str(folder), "for-each-ref", "--format=%(objectname) %(refname)"
+        )
+        for backend, folder in repo_folders.items()
+    }
+    assert refs["gitpython"] == refs["subprocess"]
+
+
+@pytest.mark.parametrize("backend", ["subprocess", "gitpython"])
+def test_backends_add_paths_relative_to_the_current_directory(
+    backend: str, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.chdir(tmp_path)
+    with use_git_backend(backend), reproducible("add"):
+        init(False)
+        (tmp_path / "notes").mkdir()
+        (tmp_path / "notes" / "todo.txt").write_text("test\n")
+        (tmp_path / "notes" / "done.txt").write_text("init\n")
+        monkeypatch.chdir(tmp_path / "notes")
+        add(["todo.txt"], False)
+        add(["."], False)
+        commit("Add notes", False)
+
+    assert git("ls-tree", "-r", "--full-tree", "--name-only", "HEAD").split() == [
+        "notes/done.txt",
+        "notes/todo.txt",
+    ]
+
+
+@pytest.mark.parametrize("backend", ["subprocess", "gitpython"])
+def test_backends_refuse_to_commit_nothing(
+    backend: str, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.chdir(tmp_path)
+    with use_git_backend(backend), reproducible("commit"):
+        init(False)
+        # Including as the first commit, on an unborn branch
+        with pytest.raises(SystemExit):
+            commit("Nothing", False)
+        (tmp_path / "notes.txt").write_text("hello\n")
+        add(["notes.txt"], False)
+        commit("Add notes", False)
+        with pytest.raises(SystemExit):
+            commit("Nothing", False)
+        empty_commit("Empty", False)
+
+    assert git("log", "--format=%s").split("\n") == ["Empty", "Add notes", ""]
@@ -0,0 +1,36 @@
+from pathlib import Path
+
+import pytest
+
+from exercise_utils import github_cli
+from exercise_utils.github_backend import use_github_backend
+from testing.fake_github import FakeGithub, running_fake_github
+
+pytest.importorskip("requests")
+pytestmark = pytest.mark.usefixtures("github_state")
+
+
+@pytest.mark.parametrize(
+    "fork_name, requests",
+    [
+        ("student-gitmastery-gm-shapes", 1),
+        ("gitmastery-gm-shapes", 2),
+        ("gm-shapes", 3),
+    ],
+)
+def test_find_fork_probes_the_names_downloads_create(
+    tmp_path: Path, fork_name: str, requests: int
+) -> None:
+    fake = FakeGithub(str(tmp_path / "github"))
+    fake.add_repository("git-mastery", "gm-shapes", on_disk=False)
+    fake.add_repository("student", fork_name, "git-mastery/gm-shapes", on_disk=False)
+
+    with (
+        running_fake_github(fake, str(tmp_path / "bin")) as github,
+        use_github_backend("http"),
+    ):
+        found = github_cli.find_fork("git-mastery", "gm-shapes", "student", False)
+
+    assert found == fork_name
+    # Each name is probed with one request, without searching the forks
+    assert github.requests == requests
@@ -0,0 +1,81 @@
+import subprocess
+from pathlib import Path
+
+import pytest
+
+from exercise_utils.github_backend import use_github_backend
+from exercise_utils.reproducible import reproducible
+from hands_on import populate_remote, push_tags
+from testing.fake_github import FakeGithub, running_fake_github
+
+pytestmark = pytest.mark.usefixtures("github_state")
+
+
+def git(folder: Path, *args: str) -> str:
+    return subprocess.run(
+        ["git", "-C", str(folder), *args], capture_output=True, text=True, check=True
+    ).stdout
+
+
+@pytest.fixture
+def fake(tmp_path: Path) -> FakeGithub:
+    source = tmp_path / "source"
+    source.mkdir()
+    git(source, "init", "--quiet", "--initial-branch=main")
+    for i in range(3):
+        (source / "preferences.txt").write_text(f"{i}\n")
+        git(source, "add", "preferences.txt")
+        git(
+            source, "-c", "user.name=a", "-c", "user.email=a@b", "commit", "-qm", str(i)
+        )
+    fake = FakeGithub(str(tmp_path / "github"))
+    fake.add_repository("git-mastery", "samplerepo-preferences", source=str(source))
+    return fake
+
+
+@pytest.mark.parametrize("existing_fork", [False, True])
+def test_push_tags_download_through_the_gh_shim(
+    tmp_path: Path,
+    fake: FakeGithub,
+    monkeypatch: pytest.MonkeyPatch,
+    existing_fork: bool,
+) -> None:
+    if existing_fork:
+        fake.add_repository(
+            "viewer", "my-preferences", "git-mastery/samplerepo-preferences"
+        )
+    monkeypatch.chdir(tmp_path)
+    with (
+        running_fake_github(fake, str(tmp_path / "bin")) as github,
+        use_github_backend("gh"),
+        reproducible("push_tags"),
+    ):
+        push_tags.download(False)
+
+    fork = "my-preferences" if existing_fork else "gitmastery-samplerepo-preferences"
+    assert github.repositories[f"viewer/{fork}"].parent == (
+        "git-mastery/samplerepo-preferences"
+    )
+    clone = tmp_path / "gitmastery-samplerepo-preferences"
+    assert git(clone, "remote", "get-url", "origin").strip().endswith(f"/{fork}.git")
+    assert git(clone, "tag").split() == ["v0.9", "v1.0"]
+    assert git(clone, "log", "-1", "--format=%s", "v1.0") == "1\n"
+
+
+def test_populate_remote_download_through_the_gh_shim(
+    tmp_path: Path, fake: FakeGithub, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    fake.add_repository("viewer", "gitmastery-things")
+    monkeypatch.chdir(tmp_path)
+    with (
+        running_fake_github(fake, str(tmp_path / "bin")) as github,
+        use_github_backend("gh"),
+        reproducible("populate_remote"),
+    ):
+        populate_remote.download(False)
+
+    # The existing repository was deleted and created again, empty
+    assert "viewer/gitmastery-things" in github.repositories
+    assert git(tmp_path / "things", "remote", "get-url", "origin") == (
+        "https://github.com/viewer/gitmastery-things\n"
+    )
@@ -0,0 +1,66 @@
+import time
+from pathlib import Path
+from typing import Iterator
+
+import pytest
+
+from exercise_utils import github_scheduler
+from exercise_utils.github_backend import HttpGithubBackend
+from exercise_utils.github_scheduler import (
+    GithubScheduler,
+    RateLimitTracker,
+    set_rate_limit_tracker,
+)
+from testing.fake_github import FakeGithub, running_fake_github
+
+pytest.importorskip("requests")
+
+REPOSITORIES = 30
+
+
+@pytest.fixture(autouse=True)
+def tracker(
+    monkeypatch: pytest.MonkeyPatch, github_state: None
+) -> Iterator[RateLimitTracker]:
+    tracker = RateLimitTracker(reserve=2)
+    set_rate_limit_tracker(tracker)
+    monkeypatch.setattr(github_scheduler, "BASE_RETRY_DELAY", 0.05)
+    yield tracker
+
+
+def fetch_all(github: FakeGithub, scheduler: GithubScheduler) -> list:
+    for i in range(REPOSITORIES):
+        github.add_repository("student", f"repo-{i}", on_disk=False)
+    backend = HttpGithubBackend()
+    return scheduler.map(
+        lambda i: backend.api(f"repos/student/repo-{i}", False), range(REPOSITORIES)
+    )
+
+
+def test_scheduler_waits_for_the_rate_limit_to_reset(tmp_path: Path) -> None:
+    fake = FakeGithub(str(tmp_path), rate_limit=20, rate_limit_window=1)
+    with running_fake_github(fake, str(tmp_path / "bin")) as github:
+        started_at = time.monotonic()
+        with GithubScheduler(max_concurrency=4) as scheduler:
+            results = fetch_all(github, scheduler)
+
+    assert [result["name"] for result in results] == [
+        f"repo-{i}" for i in range(REPOSITORIES)
+    ]
+    # The budget ran out once, and the scheduler waited instead of failing
+    assert github.rate_limited == 0
+    assert time.monotonic() - started_at >= 0.5
+
+
+def test_scheduler_backs_off_on_secondary_rate_limits(
+    tmp_path: Path, tracker: RateLimitTracker
+) -> None:
+    fake = FakeGithub(str(tmp_path), latency=0.05, max_concurrent_requests=2)
+    with running_fake_github(fake, str(tmp_path / "bin")) as github:
+        with GithubScheduler(max_concurrency=8) as scheduler:
+            results = fetch_all(github, scheduler)
+
+    assert all(result is not None for result in results)
+    assert github.rate_limited > 0
+    assert tracker.throttled == github.rate_limited
+    assert scheduler.concurrency < 8
@@ -0,0 +1,58 @@
+from pathlib import Path
+from typing import Iterator
+
+import pytest
+
+from exercise_utils.github_backend import HttpGithubBackend
+from exercise_utils.http_cache import HttpCache, set_http_cache
+from testing.fake_github import FakeGithub, running_fake_github
+
+pytest.importorskip("requests")
+
+
+@pytest.fixture(autouse=True)
+def cache(tmp_path: Path, github_state: None) -> Iterator[HttpCache]:
+    cache = HttpCache(str(tmp_path / "cache"))
+    set_http_cache(cache)
+    yield cache
+
+
+def test_unchanged_repositories_are_revalidated(
+    tmp_path: Path, cache: HttpCache
+) -> None:
+    fake = FakeGithub(str(tmp_path / "github"))
+    fake.add_repository("git-mastery", "gm-shapes", on_disk=False)
+    fake.add_repository("viewer", "gm-shapes", "git-mastery/gm-shapes", on_disk=False)
+    with running_fake_github(fake, str(tmp_path / "bin")) as github:
+        first = HttpGithubBackend().get_repo("viewer/gm-shapes", False)
+        # A new process, with nothing but the cache on disk
+        second = HttpGithubBackend().get_repo("viewer/gm-shapes", False)
+        state = HttpGithubBackend().fetch_repo_state(
+            "git-mastery", "gm-shapes", "viewer", False
+        )
+
+    assert first == second
+    assert state.exists and state.fork_name == "gm-shapes"
+    assert github.not_modified == 2
+    assert (cache.stats.hits, cache.stats.misses) == (2, 2)
+    assert cache.stats.summary() == "HTTP cache: 2 hit(s), 2 miss(es), 50% hit rate"
+
+
+def test_changed_repositories_are_fetched_again(
+    tmp_path: Path, cache: HttpCache
+) -> None:
+    fake = FakeGithub(str(tmp_path / "github"))
+    fake.add_repository("viewer", "gm-shapes", on_disk=False)
+    with running_fake_github(fake, str(tmp_path / "bin")) as github:
+        backend = HttpGithubBackend()
+        assert backend.get_repo("viewer/gm-shapes", False) == (
+            github.repositories["viewer/gm-shapes"].rest()
+        )
+        github.repositories["viewer/gm-shapes"].private = True
+        repository = backend.get_repo("viewer/gm-shapes", False)
+        assert repository is not None and repository["private"] is True
+        github.delete_repository("viewer/gm-shapes")
+        assert backend.get_repo("viewer/gm-shapes", False) is None
+
+    assert github.not_modified == 0
+    assert cache.stats.hits == 0
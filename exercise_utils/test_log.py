@@ -0,0 +1,27 @@
+from typing import Iterator
+
+import pytest
+
+from exercise_utils.log import Level, LogSink, log, set_sink
+
+
+@pytest.fixture(autouse=True)
+def default_sink() -> Iterator[None]:
+    yield
+    set_sink(LogSink())
+
+
+def test_print_waits_for_the_queued_records(
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    # Set within the test, as pytest only captures stdout once the test runs
+    sink = LogSink(level=Level.DEBUG)
+    set_sink(sink)
+    for i in range(500):
+        log(Level.INFO, f"record {i}")
+    print("done")
+    log(Level.DEBUG, "after")
+    sink.flush()
+
+    lines = capsys.readouterr().out.splitlines()
+    assert lines == [f"record {i}" for i in range(500)] + ["done", "after"]
@@ -0,0 +1,65 @@
+from pathlib import Path
+
+import pytest
+
+from exercise_utils.github_backend import use_github_backend
+from exercise_utils.repo_cleanup import (
+    DELETE,
+    RESET,
+    ExerciseRepository,
+    cleanup_repositories,
+    find_exercise_repositories,
+)
+from testing.fake_github import FakeGithub, running_fake_github
+
+pytest.importorskip("requests")
+pytestmark = pytest.mark.usefixtures("github_state")
+
+
+def test_cleanup_deletes_exercise_repositories(tmp_path: Path) -> None:
+    fake = FakeGithub(str(tmp_path / "github"))
+    fake.add_repository("git-mastery", "gm-shapes", on_disk=False)
+    fake.add_repository(
+        "viewer", "viewer-gitmastery-gm-shapes", "git-mastery/gm-shapes", on_disk=False
+    )
+    for i in range(120):
+        fake.add_repository("viewer", f"gitmastery-things-{i}", on_disk=False)
+    fake.add_repository("viewer", "gm-shapes", on_disk=False)
+
+    with (
+        running_fake_github(fake, str(tmp_path / "bin")) as github,
+        use_github_backend("http"),
+    ):
+        repositories = find_exercise_repositories(False)
+        # The 122 repositories of the viewer are listed in two pages
+        assert github.requests == 2
+        preview = cleanup_repositories(repositories, DELETE, False, dry_run=True)
+        assert len(github.repositories) == 123
+        report = cleanup_repositories(repositories, DELETE, False)
+
+    assert len(repositories) == 121
+    assert repositories[0] == ExerciseRepository(
+        "viewer/viewer-gitmastery-gm-shapes", True
+    )
+    assert preview.summary().splitlines()[0] == (
+        "Would delete viewer/viewer-gitmastery-gm-shapes (fork)"
+    )
+    assert report.remaining == []
+    assert sorted(github.repositories) == ["git-mastery/gm-shapes", "viewer/gm-shapes"]
+
+
+def test_reset_keeps_the_visibility_of_recreated_repositories(tmp_path: Path) -> None:
+    fake = FakeGithub(str(tmp_path / "github"))
+    fake.add_repository("viewer", "gitmastery-things", private=True)
+    fake.add_repository("viewer", "gitmastery-shapes")
+
+    with (
+        running_fake_github(fake, str(tmp_path / "bin")) as github,
+        use_github_backend("http"),
+    ):
+        repositories = find_exercise_repositories(False)
+        cleanup_repositories(repositories, RESET, False)
+
+    assert ExerciseRepository("viewer/gitmastery-things", False, True) in repositories
+    assert github.repositories["viewer/gitmastery-things"].private
+    assert not github.repositories["viewer/gitmastery-shapes"].private
@@ -0,0 +1,148 @@
+"""Opt-in tracing of the commands run through exercise_utils.cli.
+
+Set GITMASTERY_TRACE to a file path to record every command. When the process
+exits, the run is written to that path as Chrome trace-event JSON (viewable in
+chrome://tracing or https://ui.perfetto.dev) and a summary of the slowest commands
+is printed to stderr.
+"""
+
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+TRACE_ENV_VAR = "GITMASTERY_TRACE"
+DEFAULT_SUMMARY_SIZE = 10
+
+
+@dataclass
+class CommandSpan:
+    argv: List[str]
+    cwd: str
+    start: float
+    end: float
+    returncode: int
+    output_size: int
+    thread_id: int
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+    @property
+    def name(self) -> str:
+        # "git commit", "gh repo" etc. reads better in a flame graph than argv[0]
+        return " ".join(self.argv[:2])
+
+
+class CommandTracer:
+    def __init__(self) -> None:
+        self.started_at = time.time()
+        self.spans: List[CommandSpan] = []
+        self.__lock = threading.Lock()
+
+    def record(
+        self,
+        argv: List[str],
+        cwd: Optional[str],
+        start: float,
+        end: float,
+        returncode: int,
+        output_size: int,
+    ) -> None:
+        """Records a finished command."""
+        span = CommandSpan(
+            argv=list(argv),
+            cwd=cwd if cwd is not None else os.getcwd(),
+            start=start,
+            end=end,
+            returncode=returncode,
+            output_size=output_size,
+            thread_id=threading.get_ident(),
+        )
+        with self.__lock:
+            self.spans.append(span)
+
+    def to_chrome_trace(self) -> Dict[str, Any]:
+        """Returns the recorded spans as Chrome trace-event JSON."""
+        pid = os.getpid()
+        origin = min([self.started_at, *(span.start for span in self.spans)])
+        events = [
+            {
+                "name": span.name,
+                "cat": "command",
+                "ph": "X",
+                "ts": int((span.start - origin) * 1_000_000),
+                "dur": int(span.duration * 1_000_000),
+                "pid": pid,
+                "tid": span.thread_id,
+                "args": {
+                    "argv": span.argv,
+                    "cwd": span.cwd,
+                    "returncode": span.returncode,
+                    "output_size": span.output_size,
+                },
+            }
+            for span in self.spans
+        ]
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def write_chrome_trace(self, path: str) -> None:
+        with open(path, "w") as trace_file:
+            json.dump(self.to_chrome_trace(), trace_file)
+
+    def summary(self, top_n: int = DEFAULT_SUMMARY_SIZE) -> str:
+        """Returns a table of the top_n slowest commands."""
+        total = sum(span.duration for span in self.spans)
+        slowest = sorted(self.spans, key=lambda span: span.duration, reverse=True)
+        lines = [
+            f"{len(self.spans)} commands, {total * 1000:.1f} ms in total",
+            f"{'ms':>10}  {'exit':>4}  {'bytes':>8}  command",
+        ]
+        for span in slowest[:top_n]:
+            lines.append(
+                f"{span.duration * 1000:>10.1f}  {span.returncode:>4}  "
+                f"{span.output_size:>8}  {' '.join(span.argv)}"
+            )
+        return "\n".join(lines)
+
+
+_tracer: Optional[CommandTracer] = None
+_tracer_checked = False
+
+
+def get_tracer() -> Optional[CommandTracer]:
+    """Returns the active tracer, starting one if GITMASTERY_TRACE is set."""
+    global _tracer_checked
+    if not _tracer_checked:
+        _tracer_checked = True
+        path = os.environ.get(TRACE_ENV_VAR)
+        if path:
+            tracer = start_tracing()
+            # Resolve now since setup scripts change directories while running
+            atexit.register(_export, tracer, os.path.abspath(path))
+    return _tracer
+
+
+def start_tracing() -> CommandTracer:
+    """Starts recording commands, replacing any active tracer."""
+    global _tracer, _tracer_checked
+    _tracer_checked = True
+    _tracer = CommandTracer()
+    return _tracer
+
+
+def stop_tracing() -> Optional[CommandTracer]:
+    """Stops recording commands and returns the tracer that was active."""
+    global _tracer
+    tracer, _tracer = _tracer, None
+    return tracer
+
+
+def _export(tracer: CommandTracer, path: str) -> None:
+    tracer.write_chrome_trace(path)
+    print(tracer.summary(), file=sys.stderr)
@@ -1,7 +1,11 @@
 import os
 
-from exercise_utils.file import create_or_update_file, append_to_file
-from exercise_utils.git import add, commit, init, checkout
+from exercise_utils.git import (
+    commit_to_branch,
+    create_branch,
+    init,
+    materialize_branch,
+)
 
 __requires_git__ = True
 __requires_github__ = False
@@ -13,35 +17,43 @@ def download(verbose: bool):
 
     init(verbose)
 
-    create_or_update_file(
-        "colours.txt",
-        """
-        blue
-        """,
+    commit_to_branch(
+        "main",
+        "Add colours.txt",
+        {
+            "colours.txt": """
+            blue
+            """
+        },
+        verbose,
     )
-    add(["colours.txt"], verbose)
-    commit("Add colours.txt", verbose)
-
-    checkout("fix1", True, verbose)
-    append_to_file(
-        "colours.txt",
-        """
-      green
-      red
-      white
-      """,
+
+    create_branch("fix1", "main", verbose)
+    commit_to_branch(
+        "fix1",
+        "Add green, red, white",
+        {
+            "colours.txt": """
+            blue
+            green
+            red
+            white
+            """
+        },
+        verbose,
     )
-    add(["colours.txt"], verbose)
-    commit("Add green, red, white", verbose)
-
-    checkout("main", False, verbose)
-    append_to_file(
-        "colours.txt",
-        """
-      black
-      red
-      white
-      """,
+
+    commit_to_branch(
+        "main",
+        "Add black, red, white",
+        {
+            "colours.txt": """
+            blue
+            black
+            red
+            white
+            """
+        },
+        verbose,
     )
-    add(["colours.txt"], verbose)
-    commit("Add black, red, white", verbose)
+    materialize_branch("main", verbose)
@@ -1,8 +1,5 @@
 import os
-from exercise_utils.git import (
-    tag,
-    tag_with_options,
-)
+from exercise_utils.git import RefTransaction
 from exercise_utils.github_cli import (
     get_github_username,
     has_repo,
@@ -30,5 +27,6 @@ def download(verbose: bool):
     clone_repo_with_gh(full_repo_name, verbose)
 
     os.chdir(LOCAL_DIR)
-    tag("v1.0", verbose)
-    tag_with_options("v0.9", ["HEAD~2", "-a", "-m", "First beta release"], verbose)
+    with RefTransaction(verbose) as refs:
+        refs.create_tag("v1.0")
+        refs.create_tag("v0.9", "HEAD~2", message="First beta release")
@@ -1,13 +1,7 @@
 import os
 
 from exercise_utils.cli import run_command
-from exercise_utils.github_cli import (
-    get_github_username,
-    fork_repo,
-    clone_repo_with_gh,
-    has_repo,
-    delete_repo,
-)
+from exercise_utils.fork_clone import ensure_fork_clone
 
 __requires_git__ = True
 __requires_github__ = True
@@ -19,15 +13,7 @@ LOCAL_DIR = "samplerepo-finances"
 
 
 def download(verbose: bool):
-    username = get_github_username(verbose)
-    full_repo_name = f"{username}/{FORK_NAME}"
-
-    if has_repo(full_repo_name, True, verbose):
-        delete_repo(full_repo_name, verbose)
-
-    fork_repo(TARGET_REPO, FORK_NAME, verbose)
-
-    clone_repo_with_gh(full_repo_name, verbose, LOCAL_DIR)
+    ensure_fork_clone(TARGET_REPO, FORK_NAME, LOCAL_DIR, verbose)
 
     os.chdir(LOCAL_DIR)
 
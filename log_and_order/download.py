@@ -1,53 +1,29 @@
 from sys import exit
 
-from exercise_utils.cli import run_command
-from exercise_utils.git import checkout, merge_with_message
-
-
-def commit(
-    author: str,
-    email: str,
-    date: str,
-    message: str,
-    verbose: bool,
-) -> None:
-    run_command(
-        [
-            "git",
-            "commit",
-            "--allow-empty",
-            "--date",
-            date,
-            "--author",
-            f"{author} <{email}>",
-            "-m",
-            message,
-        ],
-        verbose,
-    )
+from exercise_utils.cli import stream_command
+from exercise_utils.git import HistoryBuilder
 
 
 def replace_sha_in_file(verbose: bool = False):
-    # Get a list of commit SHAs (most recent first)
-    log_output = run_command(
-        ["git", "log", "--pretty=format:%H"],
-        verbose,
-    )
-    assert log_output is not None
+    import random
 
-    commits = log_output.strip().splitlines()
-    if not commits or len(commits) < 2:
+    # Pick one of the commit SHAs (most recent first) at random, streaming the log
+    # instead of holding all of it
+    chosen_sha = None
+    candidates = 0
+    with stream_command(["git", "log", "--pretty=format:%H"], verbose) as commits:
+        for i, sha in enumerate(commits):
+            # Exclude the very first commit (the root commit)
+            if i == 0 or i == 10:
+                continue
+            candidates += 1
+            if random.randrange(candidates) == 0:
+                chosen_sha = sha
+
+    if not commits.is_success() or chosen_sha is None:
         print("Not enough commits to choose from.")
         exit(1)
 
-    # Exclude the very first commit (the root commit)
-    commits_without_root = commits[1:10] + commits[11:]
-
-    # Pick one at random
-    import random
-
-    chosen_sha = random.choice(commits_without_root)
-
     if verbose:
         print(f"Chosen commit: {chosen_sha}")
 
@@ -73,6 +49,8 @@ CRIMINAL = ("Josh Badur", "josh.badur@example.com")
 
 
 def setup(verbose: bool = False):
+    history = HistoryBuilder(verbose)
+
     # Early small crimes
     crimes = [
         "Stole bicycle from Main Street",
@@ -88,13 +66,16 @@ def setup(verbose: bool = False):
     ]
 
     for i, msg in enumerate(crimes, start=1):
-        commit(*ANON, f"2024-01-{i:02d} 08:00", msg, verbose)
+        history.commit("main", msg, author=ANON, date=f"2024-01-{i:02d} 08:00")
 
     # Branch: the criminal tries to hide crimes
-    checkout("rewrite", True, verbose)
-    commit(*CRIMINAL, "2024-02-10 10:00", "Rewrite the comments", verbose)
-    commit(*CRIMINAL, "2024-02-11 09:00", "Covering my tracks", verbose)
-    checkout("main", False, verbose)
+    history.branch("rewrite", "main")
+    history.commit(
+        "rewrite", "Rewrite the comments", author=CRIMINAL, date="2024-02-10 10:00"
+    )
+    history.commit(
+        "rewrite", "Covering my tracks", author=CRIMINAL, date="2024-02-11 09:00"
+    )
 
     # Escalation of crimes
     more_crimes = [
@@ -106,10 +87,10 @@ def setup(verbose: bool = False):
     ]
 
     for j, msg in enumerate(more_crimes, start=1):
-        commit(*ANON, f"2024-03-{j:02d} 07:00", msg, verbose)
+        history.commit("main", msg, author=ANON, date=f"2024-03-{j:02d} 07:00")
 
     # Merge rewrite branch back, creates a real graph
-    merge_with_message("rewrite", False, "Merge branch 'rewrite'", verbose)
+    history.merge("main", "rewrite", "Merge branch 'rewrite'")
 
     # Add a few final commits after merge
     aftermath = [
@@ -118,6 +99,8 @@ def setup(verbose: bool = False):
         "Citywide curfew announced",
     ]
     for k, msg in enumerate(aftermath, start=1):
-        commit(*ANON, f"2024-04-{k:02d} 12:00", msg, verbose)
+        history.commit("main", msg, author=ANON, date=f"2024-04-{k:02d} 12:00")
+
+    history.build("main")
 
     replace_sha_in_file(verbose)
@@ -0,0 +1,101 @@
+# Benchmarks the fork lookups of exercise_utils.github_cli against the local fake
+# Github with many forks, through the fake gh put on PATH.
+#
+#   PYTHONPATH="." python scripts/benchmark-fork-lookup.py --forks 10000
+#
+# find_fork takes 1 request for a fork with the name downloads give it, and 4
+# (the 3 name probes, then one page of USER_FORKS_QUERY) for a fork renamed
+# otherwise, whatever the number of forks. Listing every fork takes 1 request
+# per 100 forks.
+import argparse
+import os
+import tempfile
+import time
+from typing import Callable, Optional, Tuple
+
+from exercise_utils import github_cli
+from testing.fake_github import DEFAULT_VIEWER, FakeGithub, running_fake_github
+
+OWNER = "git-mastery"
+REPOSITORY = "gm-shapes"
+VIEWER = DEFAULT_VIEWER
+STUDENT = "student"
+# A student whose fork has the name downloads give it
+DOWNLOADER = "downloader"
+
+
+def measure(
+    github: FakeGithub, lookup: Callable[[], Optional[str]]
+) -> Tuple[Optional[str], int, float]:
+    github_cli.clear_repo_state_cache()
+    github.requests = 0
+    started_at = time.monotonic()
+    result = lookup()
+    return result, github.requests, time.monotonic() - started_at
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--forks", type=int, default=10000)
+    parser.add_argument(
+        "--latency", type=float, default=0, help="seconds added to every request"
+    )
+    args = parser.parse_args()
+
+    upstream = f"{OWNER}/{REPOSITORY}"
+    with (
+        tempfile.TemporaryDirectory() as root,
+        running_fake_github(FakeGithub(root), os.path.join(root, "bin")) as github,
+    ):
+        # The forks are never cloned, so they only exist in the API
+        github.add_repository(OWNER, REPOSITORY, on_disk=False)
+        for i in range(args.forks):
+            github.add_repository(f"user-{i}", REPOSITORY, upstream, on_disk=False)
+        # The forks come last in the listing, the student's under another name
+        github.add_repository(VIEWER, REPOSITORY, upstream, on_disk=False)
+        github.add_repository(STUDENT, f"{STUDENT}-gm-shapes", upstream, on_disk=False)
+        github.add_repository(
+            DOWNLOADER, f"{DOWNLOADER}-gitmastery-gm-shapes", upstream, on_disk=False
+        )
+        github.latency = args.latency
+
+        cases = [
+            (
+                "listing every fork",
+                STUDENT,
+                lambda: github_cli.find_fork_by_listing(
+                    OWNER, REPOSITORY, STUDENT, False
+                ),
+            ),
+            (
+                "find_fork",
+                STUDENT,
+                lambda: github_cli.find_fork(OWNER, REPOSITORY, STUDENT, False),
+            ),
+            (
+                "find_fork",
+                DOWNLOADER,
+                lambda: github_cli.find_fork(OWNER, REPOSITORY, DOWNLOADER, False),
+            ),
+            (
+                "fetch_repo_state",
+                VIEWER,
+                lambda: (
+                    github_cli.fetch_repo_state(
+                        OWNER, REPOSITORY, VIEWER, False
+                    ).fork_name
+                ),
+            ),
+        ]
+        print(f"{args.forks} forks of {upstream}, {args.latency * 1000:.0f}ms latency")
+        print(f"{'lookup':<20}{'user':<12}{'fork':<32}{'requests':>10}{'seconds':>10}")
+        for name, username, lookup in cases:
+            fork, requests, seconds = measure(github, lookup)
+            print(
+                f"{name:<20}{username:<12}{fork or '-':<32}"
+                f"{requests:>10}{seconds:>10.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
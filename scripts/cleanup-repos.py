@@ -0,0 +1,73 @@
+# Deletes or resets the repositories and forks that downloads created on the
+# authenticated Github account, e.g. a test account after many test downloads.
+#
+#   PYTHONPATH="." python scripts/cleanup-repos.py delete --dry-run
+#
+# The repositories are listed and confirmed before anything is changed, unless
+# --yes is given.
+import argparse
+
+from exercise_utils.cli import DEFAULT_MAX_CONCURRENCY
+from exercise_utils.github_backend import BACKENDS, set_github_backend
+from exercise_utils.repo_cleanup import (
+    ACTIONS,
+    DEFAULT_PATTERNS,
+    cleanup_repositories,
+    find_exercise_repositories,
+)
+
+
+def confirm(prompt: str) -> bool:
+    try:
+        str_result = input(f"{prompt} (defaults to N)  [y/N]: ")
+    except EOFError:
+        return False
+    return str_result.strip().lower() == "y"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("action", choices=ACTIONS)
+    parser.add_argument(
+        "--pattern",
+        action="append",
+        help="repository names to clean up, by default "
+        + " and ".join(DEFAULT_PATTERNS),
+    )
+    parser.add_argument(
+        "--dry-run", action="store_true", help="only list the repositories"
+    )
+    parser.add_argument(
+        "--yes", action="store_true", help="clean up without asking for confirmation"
+    )
+    parser.add_argument("--max-concurrency", type=int, default=DEFAULT_MAX_CONCURRENCY)
+    parser.add_argument("--backend", choices=list(BACKENDS))
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    if args.backend is not None:
+        set_github_backend(args.backend)
+    repositories = find_exercise_repositories(
+        args.verbose, args.pattern or DEFAULT_PATTERNS
+    )
+    if not repositories:
+        print("No repositories to clean up")
+        return
+    if not args.dry_run and not args.yes:
+        preview = cleanup_repositories(repositories, args.action, False, dry_run=True)
+        print(preview.summary())
+        if not confirm(f"{args.action.capitalize()} {len(repositories)} repositories?"):
+            print("Cancelled")
+            return
+    report = cleanup_repositories(
+        repositories,
+        args.action,
+        args.verbose,
+        dry_run=args.dry_run,
+        max_concurrency=args.max_concurrency,
+    )
+    print(report.summary())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,55 +1,40 @@
+import argparse
 import json
 import os
 import shutil
 import subprocess
 import sys
+from contextlib import nullcontext
 from pathlib import Path
 from typing import Any, Dict
 
-
-def get_username() -> str:
-    result = subprocess.run(
-        ["gh", "api", "user", "-q", ".login"], capture_output=True, text=True
-    )
-
-    if result.returncode == 0:
-        username = result.stdout.splitlines()[0]
-        return username
-    return ""
+from exercise_utils.clone import (
+    CloneProfile,
+    clone_options,
+    github_url,
+    parse_clone_profile,
+)
+from exercise_utils.fork_clone import ensure_fork_clone
+from exercise_utils.github_cli import get_github_username
+from exercise_utils.optimize import optimize_repository
+from exercise_utils.reproducible import reproducible, signature_env
 
 
-def has_fork(fork_name: str) -> bool:
-    result = subprocess.run(
-        ["gh", "repo", "view", fork_name, "--json", "isFork", "--jq", ".isFork"],
-        capture_output=True,
-        text=True,
-        env=dict(os.environ, **{"GH_PAGER": "cat"}),
-    )
-    return result.returncode == 0 and result.stdout.strip() == "true"
+def get_username() -> str:
+    return get_github_username(False)
 
 
-def fork(repository_name: str, fork_name: str) -> None:
+def clone_with_custom_name(
+    repository_name: str, name: str, profile: CloneProfile, reference_repository: str
+) -> None:
+    options = clone_options(profile, github_url(reference_repository), False)
     subprocess.run(
-        [
-            "gh",
-            "repo",
-            "fork",
-            repository_name,
-            "--default-branch-only",
-            "--fork-name",
-            fork_name,
-        ],
+        ["gh", "repo", "clone", repository_name, name, "--", *options],
         capture_output=True,
         text=True,
     )
 
 
-def clone_with_custom_name(repository_name: str, name: str) -> None:
-    subprocess.run(
-        ["gh", "repo", "clone", repository_name, name], capture_output=True, text=True
-    )
-
-
 def init() -> None:
     subprocess.run(
         ["git", "init", "--initial-branch=main"], capture_output=True, text=True
@@ -61,26 +46,26 @@ def add_all() -> None:
 
 
 def commit(message: str) -> None:
-    subprocess.run(["git", "commit", "-m", message], capture_output=True, text=True)
-
-
-def empty_commit(message: str) -> None:
     subprocess.run(
-        ["git", "commit", "-m", message, "--allow-empty"],
+        ["git", "commit", "-m", message],
         capture_output=True,
         text=True,
+        env=dict(os.environ, **signature_env()),
     )
 
 
-def delete_repo(repository_name: str) -> None:
+def empty_commit(message: str) -> None:
     subprocess.run(
-        ["gh", "repo", "delete", repository_name, "--yes"],
+        ["git", "commit", "-m", message, "--allow-empty"],
         capture_output=True,
         text=True,
+        env=dict(os.environ, **signature_env()),
     )
 
 
-def download_exercise(exercise_folder_name: str) -> None:
+def download_exercise(
+    exercise_folder_name: str, is_reproducible: bool, should_optimize: bool
+) -> None:
     os.makedirs("test-downloads", exist_ok=True)
     test_folder_name = os.path.join("test-downloads", exercise_folder_name)
     shutil.rmtree(test_folder_name, ignore_errors=True)
@@ -115,19 +100,22 @@ def download_exercise(exercise_folder_name: str) -> None:
     elif repo_type == "remote":
         username = get_username()
         exercise_repo = f"git-mastery/{repo_title}"
+        profile = parse_clone_profile(config["exercise_repo"].get("clone"))
         if config["exercise_repo"]["create_fork"]:
             fork_name = f"{username}-gitmastery-{repo_title}"
-            if has_fork(fork_name):
-                delete_repo(fork_name)
-            fork(exercise_repo, fork_name)
-            cur_dir = os.getcwd()
-            os.chdir(os.path.join(test_folder_name))
-            clone_with_custom_name(f"{username}/{fork_name}", repo_name)
-            os.chdir(cur_dir)
+            # A fork shares its objects with the upstream, so borrow from its cache
+            report = ensure_fork_clone(
+                exercise_repo,
+                fork_name,
+                os.path.join(test_folder_name, repo_name),
+                False,
+                profile,
+            )
+            print(report.summary())
         else:
             cur_dir = os.getcwd()
             os.chdir(os.path.join(test_folder_name))
-            clone_with_custom_name(exercise_repo, repo_name)
+            clone_with_custom_name(exercise_repo, repo_name, profile, exercise_repo)
             os.chdir(cur_dir)
 
     if repo_type != "ignore":
@@ -148,17 +136,23 @@ def download_exercise(exercise_folder_name: str) -> None:
                 )
 
         os.chdir(os.path.join(test_folder_name, repo_name))
-        if config["exercise_repo"]["init"]:
-            init()
-            initial_commit_message = "Set initial state"
-            if download_resources:
-                add_all()
-                commit(initial_commit_message)
-            else:
-                empty_commit(initial_commit_message)
+        with (
+            reproducible(config["exercise_name"]) if is_reproducible else nullcontext()
+        ):
+            if config["exercise_repo"]["init"]:
+                init()
+                initial_commit_message = "Set initial state"
+                if download_resources:
+                    add_all()
+                    commit(initial_commit_message)
+                else:
+                    empty_commit(initial_commit_message)
+
+            if "setup" in namespace:
+                namespace["setup"]()
 
-        if "setup" in namespace:
-            namespace["setup"]()
+        if should_optimize and os.path.isdir(".git"):
+            print(optimize_repository(False).summary())
 
 
 def download_hands_on(hands_on_folder_name: str) -> None:
@@ -181,14 +175,21 @@ def download_hands_on(hands_on_folder_name: str) -> None:
 
 
 if __name__ == "__main__":
-    if len(sys.argv) != 2:
-        print(
-            "Missing exercise/hands-on folder name: ./test-download.py <exercise/hands-on folder name>"
-        )
-        sys.exit(1)
+    parser = argparse.ArgumentParser()
+    parser.add_argument("name", help="exercise/hands-on folder name")
+    parser.add_argument(
+        "--reproducible",
+        action="store_true",
+        help="derive commit identities and dates from the exercise name",
+    )
+    parser.add_argument(
+        "--optimize",
+        action="store_true",
+        help="pack objects and write a commit-graph once the setup has run",
+    )
+    args = parser.parse_args()
 
-    arg = sys.argv[1]
-    arg = arg.replace("-", "_")
+    arg = args.name.replace("-", "_")
 
     if arg.startswith("hp_"):
         if not os.path.isfile(os.path.join("hands_on", f"{arg[3:]}.py")):
@@ -199,4 +200,4 @@ if __name__ == "__main__":
         if not os.path.isdir(arg):
             print("Invalid exercise folder name")
             sys.exit(1)
-        download_exercise(arg)
+        download_exercise(arg, args.reproducible, args.optimize)
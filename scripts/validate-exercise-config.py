@@ -7,6 +7,8 @@ import sys
 from dataclasses import dataclass
 from typing import List, Set
 
+from exercise_utils.clone import parse_clone_profile
+
 # List of exercises to exempt, maybe because these have not been updated or are deprecated exercises
 EXEMPTION_LIST: Set[str] = set()
 
@@ -73,6 +75,19 @@ def main() -> None:
                     )
                 )
 
+            clone_profile = config.get("exercise_repo", {}).get("clone")
+            if clone_profile is not None:
+                if config["exercise_repo"].get("repo_type") != "remote":
+                    issues.append(
+                        ValidationIssue(
+                            dir, "Cannot use clone without 'remote' repo_type"
+                        )
+                    )
+                try:
+                    parse_clone_profile(clone_profile)
+                except ValueError as e:
+                    issues.append(ValidationIssue(dir, f"Invalid clone: {e}"))
+
             for file in config["base_files"].keys():
                 if not os.path.isfile(pathlib.Path(dir) / "res" / file):
                     issues.append(
@@ -1,5 +1,5 @@
 from exercise_utils.cli import run_command
-from exercise_utils.git import tag, tag_with_options
+from exercise_utils.git import RefTransaction, tag
 
 
 def setup(verbose: bool = False):
@@ -8,5 +8,6 @@ def setup(verbose: bool = False):
     run_command(["git", "push", "production", "--tags"], verbose)
     run_command(["git", "tag", "-d", "beta"], verbose)
 
-    tag_with_options("v1.0", ["HEAD~4"], verbose)
-    tag_with_options("v2.0", ["-a", "HEAD~1", "-m", "First stable roster"], verbose)
+    with RefTransaction(verbose) as refs:
+        refs.create_tag("v1.0", "HEAD~4")
+        refs.create_tag("v2.0", "HEAD~1", message="First stable roster")
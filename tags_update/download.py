@@ -1,7 +1,8 @@
-from exercise_utils.git import tag, tag_with_options
+from exercise_utils.git import RefTransaction
 
 
 def setup(verbose: bool = False):
-    tag_with_options("first-update", ["HEAD~4"], verbose)
-    tag("april-update", verbose)
-    tag("may-update", verbose)
+    with RefTransaction(verbose) as refs:
+        refs.create_tag("first-update", "HEAD~4")
+        refs.create_tag("april-update")
+        refs.create_tag("may-update")
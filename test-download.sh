@@ -1,4 +1,4 @@
 #!/bin/bash
 
 # PYTHONPATH tells python to look for modules in the current directory
-PYTHONPATH="." python scripts/test-download.py $1
+PYTHONPATH="." python scripts/test-download.py "$@"
@@ -0,0 +1,297 @@
+"""A gh replacement talking to testing.fake_github.
+
+Implements the gh commands exercises use: auth token, api (with --paginate,
+-X and -f), and repo clone, create, delete, fork, sync and view (with --json and
+simple --jq paths). The fake is found through GITMASTERY_FAKE_GITHUB_URL. Run as
+a script by the gh wrapper fake_github_env writes, so only the standard library
+is imported.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import urllib.error
+import urllib.request
+from typing import Any, Dict, List, NoReturn, Optional, Tuple
+
+URL = os.environ.get("GITMASTERY_FAKE_GITHUB_URL", "http://127.0.0.1:8080")
+TOKEN = os.environ.get("GITMASTERY_FAKE_GITHUB_TOKEN", "fake-token")
+
+
+def fail(message: str) -> NoReturn:
+    print(message, file=sys.stderr)
+    sys.exit(1)
+
+
+def fail_request(status: int, body: str) -> NoReturn:
+    """Fails like gh does on an error response, with Github's message."""
+    try:
+        message = json.loads(body).get("message") or ""
+    except (ValueError, AttributeError):
+        message = ""
+    fail(f"gh: {message} (HTTP {status})")
+
+
+def request(
+    method: str, path: str, body: Optional[Dict[str, Any]] = None
+) -> Tuple[int, str, str]:
+    """Returns the status, body and Link header of a request to the fake."""
+    data = json.dumps(body).encode() if body is not None else None
+    url = path if path.startswith("http") else URL + path
+    http_request = urllib.request.Request(
+        url,
+        data,
+        method=method,
+        headers={"Authorization": f"token {TOKEN}", "Content-Type": "application/json"},
+    )
+    try:
+        with urllib.request.urlopen(http_request) as response:
+            return (
+                response.status,
+                response.read().decode(),
+                response.headers.get("Link", ""),
+            )
+    except urllib.error.HTTPError as error:
+        return error.code, error.read().decode(), ""
+
+
+def page_info(node: Any) -> Optional[Dict[str, Any]]:
+    if isinstance(node, dict):
+        if "pageInfo" in node:
+            return node["pageInfo"]
+        for value in node.values():
+            found = page_info(value)
+            if found:
+                return found
+    return None
+
+
+def api(args: List[str]) -> None:
+    paginate, method, fields, path = False, None, {}, None
+    rest = iter(args)
+    for arg in rest:
+        if arg == "--paginate":
+            paginate = True
+        elif arg in ("-X", "--method"):
+            method = next(rest)
+        elif arg in ("-f", "-F", "--field", "--raw-field"):
+            key, _, value = next(rest).partition("=")
+            fields[key] = value
+        else:
+            path = arg
+    if path is None:
+        fail("accepts 1 arg(s), received 0")
+
+    if path == "graphql":
+        query = fields.pop("query")
+        while True:
+            status, body, _ = request(
+                "POST", "/graphql", {"query": query, "variables": fields}
+            )
+            print(body)
+            info = page_info(json.loads(body))
+            if status >= 400:
+                fail_request(status, body)
+            if not paginate or not info or not info["hasNextPage"]:
+                return
+            fields["endCursor"] = info["endCursor"]
+
+    method = method or ("POST" if fields else "GET")
+    next_path: Optional[str] = "/" + path.lstrip("/")
+    while next_path:
+        status, body, link = request(method, next_path, fields or None)
+        if body:
+            print(body)
+        if status >= 400:
+            fail_request(status, body)
+        next_links = [part for part in link.split(",") if 'rel="next"' in part]
+        next_path = None
+        if paginate and next_links:
+            next_path = next_links[0].split(";")[0].strip(" <>")
+
+
+def full_name(name: str) -> str:
+    """Returns owner/name, taking the authenticated user as the default owner."""
+    if "/" in name:
+        return name
+    _, body, _ = request("GET", "/user")
+    return f"{json.loads(body)['login']}/{name}"
+
+
+def get_repository(name: str) -> Dict[str, Any]:
+    status, body, _ = request("GET", f"/repos/{full_name(name)}")
+    if status != 200 and status != 404:
+        fail_request(status, body)
+    if status != 200:
+        fail(
+            "GraphQL: Could not resolve to a Repository with the name "
+            f"'{full_name(name)}'. (repository)"
+        )
+    return json.loads(body)
+
+
+def view_fields(repository: Dict[str, Any]) -> Dict[str, Any]:
+    """Returns the gh repo view --json fields of a REST repository."""
+    parent = repository.get("parent")
+    return {
+        "name": repository["name"],
+        "nameWithOwner": repository["full_name"],
+        "owner": {"login": repository["owner"]["login"]},
+        "isFork": repository["fork"],
+        "isPrivate": repository["private"],
+        "visibility": repository["visibility"].upper(),
+        "url": repository["html_url"],
+        "defaultBranchRef": {"name": repository["default_branch"]},
+        "parent": {"name": parent["name"], "owner": {"login": parent["owner"]["login"]}}
+        if parent
+        else None,
+    }
+
+
+def jq(value: Any, expression: str) -> str:
+    """Evaluates a .field.field path, printing strings raw like gh --jq."""
+    for key in filter(None, expression.split(".")):
+        value = value.get(key) if isinstance(value, dict) else None
+    if isinstance(value, str):
+        return value
+    return json.dumps(value)
+
+
+def repo_view(args: List[str]) -> None:
+    name, fields, expression = None, None, None
+    rest = iter(args)
+    for arg in rest:
+        if arg == "--json":
+            fields = next(rest).split(",")
+        elif arg in ("--jq", "-q"):
+            expression = next(rest)
+        elif not arg.startswith("-"):
+            name = arg
+    if name is None or fields is None:
+        fail("fake gh only supports gh repo view <repository> --json <fields>")
+    available = view_fields(get_repository(name))
+    selected = {key: available.get(key) for key in fields}
+    print(jq(selected, expression) if expression else json.dumps(selected, indent=2))
+
+
+def git(*command: str) -> None:
+    if subprocess.run(["git", *command]).returncode != 0:
+        sys.exit(1)
+
+
+def repo_clone(args: List[str]) -> None:
+    options = args[args.index("--") + 1 :] if "--" in args else []
+    positional = args[: args.index("--")] if "--" in args else args
+    repository = get_repository(positional[0])
+    directory = positional[1] if len(positional) > 1 else repository["name"]
+    git("clone", *options, repository["clone_url"], directory)
+    parent = repository.get("parent")
+    # Like gh, clones of forks also track the upstream repository
+    if parent:
+        git(
+            "-C",
+            directory,
+            "remote",
+            "add",
+            "-f",
+            "upstream",
+            f"https://github.com/{parent['full_name']}.git",
+        )
+
+
+def repo_fork(args: List[str]) -> None:
+    body: Dict[str, Any] = {}
+    name = None
+    rest = iter(args)
+    for arg in rest:
+        if arg == "--default-branch-only":
+            body["default_branch_only"] = True
+        elif arg == "--fork-name":
+            body["name"] = next(rest)
+        elif not arg.startswith("-"):
+            name = arg
+    if name is None:
+        fail("fake gh only supports forking a given repository")
+    status, body_text, _ = request("POST", f"/repos/{full_name(name)}/forks", body)
+    if status >= 400:
+        fail_request(status, body_text)
+    print(f"✓ Created fork {json.loads(body_text)['full_name']}", file=sys.stderr)
+
+
+def repo_create(args: List[str]) -> None:
+    name = next(arg for arg in args if not arg.startswith("-"))
+    body = {"name": name.split("/")[-1], "private": "--private" in args}
+    status, body_text, _ = request("POST", "/user/repos", body)
+    if status >= 400:
+        fail_request(status, body_text)
+    print(json.loads(body_text)["html_url"])
+
+
+def repo_delete(args: List[str]) -> None:
+    name = next(arg for arg in args if not arg.startswith("-"))
+    status, body, _ = request("DELETE", f"/repos/{full_name(name)}")
+    if status >= 400:
+        fail_request(status, body)
+
+
+def repo_sync(args: List[str]) -> None:
+    """Syncs a fork's branch with its parent on Github, like gh repo sync."""
+    name, branch = None, None
+    rest = iter(args)
+    for arg in rest:
+        if arg in ("-b", "--branch"):
+            branch = next(rest)
+        elif not arg.startswith("-"):
+            name = arg
+    if name is None:
+        fail("fake gh only supports syncing a given remote repository")
+    repository = get_repository(name)
+    parent = repository.get("parent")
+    if not parent:
+        fail(f"can't determine source repository for {repository['full_name']}")
+    branch = branch or repository["default_branch"]
+    status, body, _ = request(
+        "GET", f"/repos/{parent['full_name']}/git/ref/heads/{branch}"
+    )
+    if status >= 400:
+        fail_request(status, body)
+    sha = json.loads(body)["object"]["sha"]
+    status, body, _ = request(
+        "PATCH",
+        f"/repos/{repository['full_name']}/git/refs/heads/{branch}",
+        {"sha": sha, "force": "--force" in args},
+    )
+    if status >= 400:
+        fail_request(status, body)
+    print(
+        f'✓ Synced the "{repository["owner"]["login"]}:{branch}" branch from '
+        f'"{parent["owner"]["login"]}:{branch}"',
+        file=sys.stderr,
+    )
+
+
+def main() -> None:
+    args = sys.argv[1:]
+    if args[:2] == ["auth", "token"]:
+        print(TOKEN)
+    elif args[:1] == ["api"]:
+        api(args[1:])
+    elif args[:2] == ["repo", "view"]:
+        repo_view(args[2:])
+    elif args[:2] == ["repo", "clone"]:
+        repo_clone(args[2:])
+    elif args[:2] == ["repo", "fork"]:
+        repo_fork(args[2:])
+    elif args[:2] == ["repo", "create"]:
+        repo_create(args[2:])
+    elif args[:2] == ["repo", "delete"]:
+        repo_delete(args[2:])
+    elif args[:2] == ["repo", "sync"]:
+        repo_sync(args[2:])
+    else:
+        fail(f"fake gh does not support gh {' '.join(args)}")
+
+
+if __name__ == "__main__":
+    main()
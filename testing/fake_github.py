@@ -0,0 +1,675 @@
+"""A local stand-in for Github, to run remote flows offline and at scale.
+
+FakeGithub serves the REST and GraphQL endpoints exercise_utils.github_cli and
+the verifiers use, backed by bare repositories under a root folder. fake_gh is
+a gh replacement that forwards to it, and git is pointed at the bare
+repositories by rewriting https://github.com/ URLs, so clones, fetches and
+pushes land in them:
+
+    with running_fake_github(FakeGithub(root), bin_directory) as github:
+        github.add_repository("git-mastery", "gm-shapes", source=local_copy)
+        ...  # gh and git now talk to the fake
+
+Every request waits for github.latency seconds first, to model a slow network.
+The server can also be run on its own, printing the environment that points gh
+and git at it:
+
+    PYTHONPATH="." python -m testing.fake_github ROOT \\
+        --seed git-mastery/gm-shapes=PATH --latency 0.05
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import re
+import shlex
+import shutil
+import stat
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from exercise_utils.github_backend import GITHUB_API_URL_ENV_VAR
+
+FAKE_GITHUB_URL_ENV_VAR = "GITMASTERY_FAKE_GITHUB_URL"
+FAKE_GITHUB_TOKEN_ENV_VAR = "GITMASTERY_FAKE_GITHUB_TOKEN"
+DEFAULT_VIEWER = "viewer"
+DEFAULT_TOKEN = "fake-token"
+GITHUB_URL = "https://github.com/"
+# Github's limits for authenticated users
+DEFAULT_RATE_LIMIT = 5000
+DEFAULT_RATE_LIMIT_WINDOW = 60 * 60.0
+
+
+@dataclass
+class FakeRepository:
+    owner: str
+    name: str
+    parent: Optional[str] = None
+    private: bool = False
+    default_branch: str = "main"
+
+    @property
+    def full_name(self) -> str:
+        return f"{self.owner}/{self.name}"
+
+    def rest(self) -> Dict[str, Any]:
+        data: Dict[str, Any] = {
+            "name": self.name,
+            "full_name": self.full_name,
+            "owner": {"login": self.owner},
+            "private": self.private,
+            "visibility": "private" if self.private else "public",
+            "fork": self.parent is not None,
+            "default_branch": self.default_branch,
+            "html_url": f"{GITHUB_URL}{self.full_name}",
+            "clone_url": f"{GITHUB_URL}{self.full_name}.git",
+        }
+        if self.parent is not None:
+            owner, _, name = self.parent.partition("/")
+            data["parent"] = {
+                "name": name,
+                "full_name": self.parent,
+                "owner": {"login": owner},
+            }
+        return data
+
+
+@dataclass
+class Response:
+    status: int
+    body: Any = None
+    headers: Dict[str, str] = field(default_factory=dict)
+
+
+class FakeGithub:
+    """Github's repositories of a single authenticated user, on disk under root.
+
+    Repositories added with on_disk=False only exist in the API, which lets load
+    tests create thousands of forks that are never cloned. Like on Github, forks
+    can be made to only become clonable fork_delay seconds after being created.
+
+    Every response carries Github's X-RateLimit-* headers. Each resource (core
+    for REST, graphql) allows rate_limit requests per rate_limit_window seconds,
+    after which requests fail with 403 until the window resets. REST GET
+    responses carry an ETag, and requests whose If-None-Match still matches are
+    answered 304 without counting against the rate limit. With
+    max_concurrent_requests set, requests beyond it hit a secondary rate limit
+    and are told to retry after a second.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        viewer: str = DEFAULT_VIEWER,
+        token: str = DEFAULT_TOKEN,
+        latency: float = 0.0,
+        fork_delay: float = 0.0,
+        rate_limit: int = DEFAULT_RATE_LIMIT,
+        rate_limit_window: float = DEFAULT_RATE_LIMIT_WINDOW,
+        max_concurrent_requests: Optional[int] = None,
+    ) -> None:
+        self.root = os.path.abspath(root)
+        self.viewer = viewer
+        self.token = token
+        self.latency = latency
+        self.fork_delay = fork_delay
+        self.rate_limit = rate_limit
+        self.rate_limit_window = rate_limit_window
+        self.max_concurrent_requests = max_concurrent_requests
+        self.repositories: Dict[str, FakeRepository] = {}
+        self.requests = 0
+        self.rate_limited = 0
+        self.not_modified = 0
+        self.__used: Dict[str, int] = {}
+        self.__resets: Dict[str, float] = {}
+        self.__in_flight = 0
+        self.__lock = threading.RLock()
+
+    def path(self, full_name: str) -> str:
+        """Returns where the bare repository of owner/name is kept."""
+        return os.path.join(self.root, *full_name.split("/")) + ".git"
+
+    def add_repository(
+        self,
+        owner: str,
+        name: str,
+        parent: Optional[str] = None,
+        source: Optional[str] = None,
+        private: bool = False,
+        on_disk: bool = True,
+        default_branch_only: bool = False,
+    ) -> FakeRepository:
+        """Adds a repository, copying source or the parent's repository if given."""
+        repository = FakeRepository(owner, name, parent, private)
+        with self.__lock:
+            if repository.full_name in self.repositories:
+                raise ValueError(f"{repository.full_name} already exists")
+            self.repositories[repository.full_name] = repository
+        if on_disk:
+            self.write_repository(repository, source, default_branch_only)
+        return repository
+
+    def write_repository(
+        self,
+        repository: FakeRepository,
+        source: Optional[str] = None,
+        default_branch_only: bool = False,
+    ) -> None:
+        """Creates the bare repository of an added repository."""
+        if self.repositories.get(repository.full_name) is not repository:
+            # Deleted before its fork was ready
+            return
+        path = self.path(repository.full_name)
+        parent = repository.parent
+        if source is None and parent is not None and os.path.isdir(self.path(parent)):
+            source = self.path(parent)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if source is not None:
+            command = ["git", "clone", "--bare", "--quiet", source, path]
+            if default_branch_only:
+                command.insert(3, "--single-branch")
+        else:
+            command = [
+                "git",
+                "init",
+                "--bare",
+                "--quiet",
+                "--initial-branch=main",
+                path,
+            ]
+        subprocess.run(command, check=True, capture_output=True)
+        # Lets partial clones of the repository fetch what they are missing, and
+        # forks fetch commits by id when synced
+        for key in ("uploadpack.allowFilter", "uploadpack.allowAnySHA1InWant"):
+            subprocess.run(["git", "-C", path, "config", key, "true"], check=True)
+        head = subprocess.run(
+            ["git", "-C", path, "symbolic-ref", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+        )
+        if head.returncode == 0:
+            repository.default_branch = head.stdout.strip()
+
+    def delete_repository(self, full_name: str) -> bool:
+        with self.__lock:
+            if self.repositories.pop(full_name, None) is None:
+                return False
+        shutil.rmtree(self.path(full_name), ignore_errors=True)
+        return True
+
+    def forks_of(self, full_name: str) -> List[FakeRepository]:
+        with self.__lock:
+            return [r for r in self.repositories.values() if r.parent == full_name]
+
+    def handle(
+        self,
+        method: str,
+        path: str,
+        query: Dict[str, List[str]],
+        body: Any,
+        authorization: Optional[str],
+        if_none_match: Optional[str] = None,
+    ) -> Response:
+        resource = "graphql" if path == "/graphql" else "core"
+        with self.__lock:
+            self.requests += 1
+            self.__in_flight += 1
+            in_flight = self.__in_flight
+        try:
+            if self.latency:
+                time.sleep(self.latency)
+            if authorization not in (f"token {self.token}", f"bearer {self.token}"):
+                return Response(401, {"message": "Bad credentials"})
+            if (
+                self.max_concurrent_requests
+                and in_flight > self.max_concurrent_requests
+            ):
+                with self.__lock:
+                    self.rate_limited += 1
+                return Response(
+                    403,
+                    {"message": "You have exceeded a secondary rate limit."},
+                    {"Retry-After": "1"},
+                )
+
+            if method == "GET" and if_none_match is not None:
+                response = self.rest(method, path, query, {})
+                if response.status == 200 and etag(response.body) == if_none_match:
+                    with self.__lock:
+                        self.not_modified += 1
+                    _, headers = self.__consume(resource, spend=False)
+                    return Response(304, None, {"ETag": if_none_match, **headers})
+
+            allowed, headers = self.__consume(resource)
+            if not allowed:
+                response = Response(
+                    403, {"message": "API rate limit exceeded for user."}
+                )
+            elif resource == "graphql":
+                response = Response(
+                    200, self.graphql(body["query"], body.get("variables", {}))
+                )
+            else:
+                response = self.rest(method, path, query, body or {})
+                if method == "GET" and response.status == 200:
+                    response.headers["ETag"] = etag(response.body)
+            response.headers.update(headers)
+            return response
+        finally:
+            with self.__lock:
+                self.__in_flight -= 1
+
+    def __consume(
+        self, resource: str, spend: bool = True
+    ) -> Tuple[bool, Dict[str, str]]:
+        """Counts a request against the resource's rate limit, if spend is set.
+
+        Returns if it is allowed, with the rate limit headers to send.
+        """
+        with self.__lock:
+            now = time.time()
+            if now >= self.__resets.get(resource, 0):
+                self.__resets[resource] = now + self.rate_limit_window
+                self.__used[resource] = 0
+            allowed = self.__used[resource] < self.rate_limit
+            if spend and allowed:
+                self.__used[resource] += 1
+            elif spend:
+                self.rate_limited += 1
+            used = self.__used[resource]
+            return allowed, {
+                "X-RateLimit-Limit": str(self.rate_limit),
+                "X-RateLimit-Remaining": str(self.rate_limit - used),
+                "X-RateLimit-Reset": str(math.ceil(self.__resets[resource])),
+                "X-RateLimit-Used": str(used),
+                "X-RateLimit-Resource": resource,
+            }
+
+    def rest(
+        self, method: str, path: str, query: Dict[str, List[str]], body: Dict[str, Any]
+    ) -> Response:
+        if path == "/user" and method == "GET":
+            return Response(200, {"login": self.viewer})
+        if path == "/user/repos" and method == "POST":
+            return self.create(body)
+        if path == "/user/repos" and method == "GET":
+            with self.__lock:
+                owned = [
+                    r for r in self.repositories.values() if r.owner == self.viewer
+                ]
+            return self.paginate(path, owned, query)
+
+        match = re.fullmatch(
+            r"/repos/([^/]+)/([^/]+)(/forks|/git/refs?/heads/(.+))?", path
+        )
+        repository = match and self.repositories.get(f"{match[1]}/{match[2]}")
+        if not match or not repository:
+            return Response(404, {"message": "Not Found"})
+        if match[4] and method == "GET":
+            return self.get_branch(repository, match[4])
+        if match[4] and method == "PATCH":
+            return self.update_branch(repository, match[4], body)
+        if match[4]:
+            return Response(404, {"message": "Not Found"})
+        if match[3] and method == "POST":
+            return self.fork(repository, body)
+        if match[3] and method == "GET":
+            return self.paginate(path, self.forks_of(repository.full_name), query)
+        if method == "GET":
+            return Response(200, repository.rest())
+        if method == "DELETE":
+            self.delete_repository(repository.full_name)
+            return Response(204)
+        return Response(404, {"message": "Not Found"})
+
+    def create(self, body: Dict[str, Any]) -> Response:
+        name = body.get("name") or ""
+        if not name or f"{self.viewer}/{name}" in self.repositories:
+            return Response(422, {"message": "Repository creation failed."})
+        repository = self.add_repository(
+            self.viewer, name, private=bool(body.get("private"))
+        )
+        return Response(201, repository.rest())
+
+    def fork(self, upstream: FakeRepository, body: Dict[str, Any]) -> Response:
+        name = body.get("name") or upstream.name
+        existing = self.repositories.get(f"{self.viewer}/{name}")
+        # Like Github, forking again returns the existing fork
+        if existing is not None:
+            if existing.parent != upstream.full_name:
+                return Response(422, {"message": "Name already exists"})
+            return Response(202, existing.rest())
+        default_branch_only = bool(body.get("default_branch_only"))
+        on_disk = os.path.isdir(self.path(upstream.full_name))
+        repository = self.add_repository(
+            self.viewer,
+            name,
+            parent=upstream.full_name,
+            on_disk=on_disk and not self.fork_delay,
+            default_branch_only=default_branch_only,
+        )
+        if on_disk and self.fork_delay:
+            threading.Timer(
+                self.fork_delay,
+                self.write_repository,
+                (repository, None, default_branch_only),
+            ).start()
+        return Response(202, repository.rest())
+
+    def paginate(
+        self,
+        path: str,
+        repositories: List[FakeRepository],
+        query: Dict[str, List[str]],
+    ) -> Response:
+        """Lists one page of repositories, linking to the next like Github."""
+        per_page = int(query.get("per_page", ["30"])[0])
+        page = int(query.get("page", ["1"])[0])
+        items = repositories[(page - 1) * per_page : page * per_page]
+        headers = {}
+        if page * per_page < len(repositories):
+            headers["Link"] = (
+                f'<{path}?per_page={per_page}&page={page + 1}>; rel="next"'
+            )
+        return Response(200, [r.rest() for r in items], headers)
+
+    def get_branch(self, repository: FakeRepository, branch: str) -> Response:
+        sha = self.__git(repository, "rev-parse", "--verify", f"refs/heads/{branch}")
+        if sha is None:
+            return Response(404, {"message": "Not Found"})
+        return Response(
+            200,
+            {
+                "ref": f"refs/heads/{branch}",
+                "object": {"sha": sha, "type": "commit"},
+            },
+        )
+
+    def update_branch(
+        self, repository: FakeRepository, branch: str, body: Dict[str, Any]
+    ) -> Response:
+        """Points a branch at a commit of the repository or its parent."""
+        sha = body.get("sha") or ""
+        if repository.parent is not None and os.path.isdir(
+            self.path(repository.parent)
+        ):
+            self.__git(
+                repository, "fetch", "--quiet", self.path(repository.parent), sha
+            )
+        if self.__git(repository, "cat-file", "-e", f"{sha}^{{commit}}") is None:
+            return Response(422, {"message": "Object does not exist"})
+        current = self.__git(
+            repository, "rev-parse", "--verify", f"refs/heads/{branch}"
+        )
+        if (
+            current is not None
+            and not body.get("force")
+            and self.__git(repository, "merge-base", "--is-ancestor", current, sha)
+            is None
+        ):
+            return Response(422, {"message": "Update is not a fast forward"})
+        self.__git(repository, "update-ref", f"refs/heads/{branch}", sha)
+        return self.get_branch(repository, branch)
+
+    def __git(self, repository: FakeRepository, *command: str) -> Optional[str]:
+        """Runs git in the bare repository, returning its output if it succeeded."""
+        result = subprocess.run(
+            ["git", "-C", self.path(repository.full_name), *command],
+            capture_output=True,
+            text=True,
+        )
+        return result.stdout.strip() if result.returncode == 0 else None
+
+    def graphql(self, query: str, variables: Dict[str, Any]) -> Dict[str, Any]:
+        """Answers the repository state and user forks queries of github_cli."""
+        if "viewer" in query:
+            full_name = f"{variables['owner']}/{variables['name']}"
+            repository = self.repositories.get(full_name)
+            viewer = {"login": self.viewer}
+            if repository is None:
+                return {
+                    "data": {"viewer": viewer, "repository": None},
+                    "errors": [
+                        {
+                            "type": "NOT_FOUND",
+                            "message": "Could not resolve to a Repository with "
+                            f"the name '{full_name}'.",
+                        }
+                    ],
+                }
+            owned = [f for f in self.forks_of(full_name) if f.owner == self.viewer]
+            return {
+                "data": {
+                    "viewer": viewer,
+                    "repository": {
+                        "isFork": repository.parent is not None,
+                        "parent": {"nameWithOwner": repository.parent}
+                        if repository.parent
+                        else None,
+                        "forks": {
+                            "nodes": [
+                                {"name": f.name, "owner": {"login": f.owner}}
+                                for f in owned[:1]
+                            ]
+                        },
+                    },
+                }
+            }
+
+        with self.__lock:
+            owned = [
+                r
+                for r in self.repositories.values()
+                if r.owner == variables["username"] and r.parent is not None
+            ]
+        start = int(variables.get("endCursor") or 0)
+        nodes = owned[start : start + 100]
+        return {
+            "data": {
+                "user": {
+                    "repositories": {
+                        "nodes": [
+                            {"name": r.name, "parent": {"nameWithOwner": r.parent}}
+                            for r in nodes
+                        ],
+                        "pageInfo": {
+                            "hasNextPage": start + 100 < len(owned),
+                            "endCursor": str(start + 100),
+                        },
+                    }
+                }
+            }
+        }
+
+
+def etag(body: Any) -> str:
+    """Returns the strong ETag of a response body."""
+    data = json.dumps(body, sort_keys=True).encode()
+    return f'"{hashlib.sha256(data).hexdigest()}"'
+
+
+def serve(
+    github: FakeGithub, host: str = "127.0.0.1", port: int = 0
+) -> ThreadingHTTPServer:
+    """Serves the fake on a background thread, on a free port unless given."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            self.dispatch()
+
+        def do_POST(self) -> None:
+            self.dispatch()
+
+        def do_PATCH(self) -> None:
+            self.dispatch()
+
+        def do_DELETE(self) -> None:
+            self.dispatch()
+
+        def dispatch(self) -> None:
+            url = urlparse(self.path)
+            length = int(self.headers.get("Content-Length") or 0)
+            body = json.loads(self.rfile.read(length)) if length else None
+            response = github.handle(
+                self.command,
+                url.path,
+                parse_qs(url.query),
+                body,
+                self.headers.get("Authorization"),
+                self.headers.get("If-None-Match"),
+            )
+            data = (
+                json.dumps(response.body).encode()
+                if response.status not in (204, 304)
+                else b""
+            )
+            self.send_response(response.status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in response.headers.items():
+                if name == "Link":
+                    value = value.replace("<", f"<http://{self.headers['Host']}", 1)
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format: str, *args: Any) -> None:
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def fake_github_env(url: str, root: str, bin_directory: str) -> Dict[str, str]:
+    """Returns the environment pointing gh and git at the fake served at url.
+
+    Writes a gh wrapper running fake_gh into bin_directory, which is put first
+    on PATH, rewrites Github URLs to the bare repositories under root through
+    GIT_CONFIG_* entries, added after any already set, and points the http
+    Github backend at the fake.
+    """
+    os.makedirs(bin_directory, exist_ok=True)
+    path = os.path.join(bin_directory, "gh")
+    shim = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_gh.py")
+    with open(path, "w") as shim_file:
+        shim_file.write(
+            f'#!/bin/sh\nexec {shlex.quote(sys.executable)} {shlex.quote(shim)} "$@"\n'
+        )
+    os.chmod(path, os.stat(path).st_mode | stat.S_IEXEC)
+
+    count = int(os.environ.get("GIT_CONFIG_COUNT") or 0)
+    root_url = "file://" + os.path.abspath(root).rstrip("/") + "/"
+    return {
+        "PATH": bin_directory + os.pathsep + os.environ.get("PATH", ""),
+        FAKE_GITHUB_URL_ENV_VAR: url,
+        GITHUB_API_URL_ENV_VAR: url,
+        "GIT_CONFIG_COUNT": str(count + 1),
+        f"GIT_CONFIG_KEY_{count}": f"url.{root_url}.insteadOf",
+        f"GIT_CONFIG_VALUE_{count}": GITHUB_URL,
+    }
+
+
+@contextmanager
+def running_fake_github(github: FakeGithub, bin_directory: str) -> Iterator[FakeGithub]:
+    """Serves the fake and points gh and git at it within the context."""
+    server = serve(github)
+    env = fake_github_env(
+        f"http://127.0.0.1:{server.server_port}", github.root, bin_directory
+    )
+    env[FAKE_GITHUB_TOKEN_ENV_VAR] = github.token
+    previous = {name: os.environ.get(name) for name in env}
+    os.environ.update(env)
+    try:
+        yield github
+    finally:
+        server.shutdown()
+        server.server_close()
+        for name, value in previous.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("root", help="folder keeping the bare repositories")
+    parser.add_argument(
+        "--seed",
+        action="append",
+        default=[],
+        metavar="OWNER/NAME=SOURCE",
+        help="repository to copy from a local path or URL before serving",
+    )
+    parser.add_argument("--viewer", default=DEFAULT_VIEWER)
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument(
+        "--latency", type=float, default=0, help="seconds added to every request"
+    )
+    parser.add_argument(
+        "--rate-limit",
+        type=int,
+        default=DEFAULT_RATE_LIMIT,
+        help="requests allowed per resource and window",
+    )
+    parser.add_argument(
+        "--rate-limit-window",
+        type=float,
+        default=DEFAULT_RATE_LIMIT_WINDOW,
+        help="seconds before the rate limits reset",
+    )
+    parser.add_argument(
+        "--max-concurrent-requests",
+        type=int,
+        help="concurrent requests allowed before a secondary rate limit",
+    )
+    parser.add_argument(
+        "--fork-delay",
+        type=float,
+        default=0,
+        help="seconds before new forks can be cloned",
+    )
+    args = parser.parse_args()
+
+    github = FakeGithub(
+        args.root,
+        args.viewer,
+        latency=args.latency,
+        fork_delay=args.fork_delay,
+        rate_limit=args.rate_limit,
+        rate_limit_window=args.rate_limit_window,
+        max_concurrent_requests=args.max_concurrent_requests,
+    )
+    for seed in args.seed:
+        full_name, _, source = seed.partition("=")
+        owner, _, name = full_name.partition("/")
+        github.add_repository(owner, name, source=source or None)
+
+    server = serve(github, port=args.port)
+    env = fake_github_env(
+        f"http://127.0.0.1:{server.server_port}",
+        github.root,
+        os.path.join(github.root, "bin"),
+    )
+    env[FAKE_GITHUB_TOKEN_ENV_VAR] = github.token
+    for name, value in env.items():
+        print(f"export {name}={shlex.quote(value)}")
+    sys.stdout.flush()
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()